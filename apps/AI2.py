@@ -18,6 +18,15 @@ from typing import Optional, Dict, Any, List
 import numpy as np
 import calendar
 
+from utils.diagnostics import chronometre
+
+
+def _get_info(objet, etape: str):
+    """getInfo chronométré : chaque appel est un aller-retour vers les serveurs Earth Engine"""
+    with chronometre(f"gee.getInfo.{etape}"):
+        return objet.getInfo()
+
+
 def run():
     st.title("🛰️ Monitoring de phase construction en utilisant la télédétection")
 
@@ -46,7 +55,7 @@ def run():
         def check_existing_auth(self) -> bool:
             """Check if GEE is already authenticated"""
             try:
-                test_result = ee.Number(1).getInfo()
+                test_result = _get_info(ee.Number(1), "authentification")
                 if test_result == 1:
                     st.success("✅ Google Earth Engine already authenticated!")
                     self.authenticated = True
@@ -122,7 +131,7 @@ def run():
                     ee.Initialize(credentials)
                     
                     # Test authentication
-                    test_result = ee.Number(42).getInfo()
+                    test_result = _get_info(ee.Number(42), "authentification")
                     
                     if test_result == 42:
                         st.success("✅ Authentication successful!")
@@ -161,7 +170,7 @@ def run():
                 return False
             
             try:
-                ee.Number(1).getInfo()
+                _get_info(ee.Number(1), "authentification")
                 return True
             except:
                 self.authenticated = False
@@ -232,7 +241,7 @@ def run():
                     .filter(ee.Filter.eq('orbitProperties_pass', 'DESCENDING'))  # Use only descending passes for consistency
                 
                 # Check if we have data
-                size = monthly_collection.size().getInfo()
+                size = _get_info(monthly_collection.size(), "taille_mensuelle")
                 if size == 0:
                     return None, None
                 
@@ -244,12 +253,12 @@ def run():
                 delta = monthly_median.subtract(reference_img).rename(f'delta_VV_{year}_{month:02d}')
                 
                 # Calculate local statistics for adaptive visualization
-                local_stats = delta.reduceRegion(
+                local_stats = _get_info(delta.reduceRegion(
                     reducer=ee.Reducer.percentile([5, 25, 50, 75, 95]),
                     geometry=roi,
                     scale=10,
                     maxPixels=1e9
-                ).getInfo()
+                ), "percentiles_locaux")
                 
                 delta_with_props = delta.set({
                     'year': year, 
@@ -280,7 +289,7 @@ def run():
                     .filter(ee.Filter.listContains('transmitterReceiverPolarisation', 'VV')) \
                     .filter(ee.Filter.eq('orbitProperties_pass', 'DESCENDING'))
                 
-                size = ref_collection.size().getInfo()
+                size = _get_info(ref_collection.size(), "taille_reference")
                 if size == 0:
                     st.error(f"❌ No Sentinel-1 images found for reference period")
                     return None
@@ -399,7 +408,7 @@ def run():
                             
                             if delta_img is not None and local_stats is not None:
                                 # Calculate comprehensive statistics
-                                stats = delta_img.reduceRegion(
+                                stats = _get_info(delta_img.reduceRegion(
                                     reducer=ee.Reducer.mean().combine(
                                         ee.Reducer.stdDev(), sharedInputs=True
                                     ).combine(
@@ -410,7 +419,7 @@ def run():
                                     geometry=roi,
                                     scale=10,
                                     maxPixels=1e9
-                                ).getInfo()
+                                ), "statistiques_mensuelles")
                                 
                                 if stats:
                                     delta_key = f'delta_VV_{year}_{month:02d}'
@@ -428,7 +437,7 @@ def run():
                                         'p50': stats.get(f'{delta_key}_p50', 0),
                                         'p75': stats.get(f'{delta_key}_p75', 0),
                                         'p90': stats.get(f'{delta_key}_p90', 0),
-                                        'image_count': delta_img.get('image_count').getInfo()
+                                        'image_count': _get_info(delta_img.get('image_count'), "nb_images")
                                     })
                                     
                                     # Get adaptive visualization parameters
@@ -466,7 +475,7 @@ def run():
                 
                 # Get ROI coordinates for centering
                 try:
-                    roi_coords = roi.coordinates().getInfo()
+                    roi_coords = _get_info(roi.coordinates(), "coordonnees_roi")
                     if roi_coords and len(roi_coords) > 0 and len(roi_coords[0]) > 0:
                         coords = roi_coords[0]
                         center_lat = (coords[0][1] + coords[2][1]) / 2
@@ -1,185 +1,538 @@
+import os
+
 import streamlit as st
-import pandas as pd
-from utils.utils1 import evaluer_importance, get_color
-import html
+from utils.depot import ConflitEnregistrement, DepotProjets
+from utils.diagnostics import chronometre
+from utils.diff_matrice import comparer_matrices, resume_diff, tableau_diff_html
+from utils.grilles import charger_grilles, ecrire_grille_csv, lire_grille
+from utils.modeles import charger_modeles, ecrire_modeles_json, instancier, lire_modeles, modeles_depuis_projet
+from utils.projet import Impact, Project
+from utils.matrice import ORDRE_COMPOSANTES, ORDRE_PHASES, calculer_fusion, pages_matrice, tableau_html, trier_matrice
+from utils.export_matrice import FORMATS_EXPORT, exporter
+from utils.import_matrice import importer_matrice
+from utils.synthese_matrice import figures_synthese, synthese_matrice
+
+# Polyfill for Streamlit’s rerun (newer vs older versions)
+_rerun = getattr(st, "rerun", None) or st.experimental_rerun
+
+# Fragments (st.fragment, experimental_fragment avant 1.37) : une interaction dans un
+# sous-arbre de l'éditeur ne réexécute que ce sous-arbre. Sans support, rendu normal.
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda f: f)
+
+ACTIVITES_PAR_PAGE = 5
+DEPOT_PROJETS = os.environ.get("LEOPOLD_DEPOT", "projets_leopold.sqlite")
+PREFIXES_EDITEUR = ("comp_", "name_", "nat_", "desc_", "int_", "et_", "dur_", "att_", "new_act_", "page_act_", "grille_choix")
+
+
+@st.cache_resource
+def _depot():
+    """Dépôt SQLite partagé par toutes les sessions du serveur"""
+    return DepotProjets(DEPOT_PROJETS)
 
-def run():
-    st.title("🌍 Générateur de Matrice d'Impact Environnemental par Phase")
 
-    # Polyfill for Streamlit’s rerun (newer vs older versions)
+@st.cache_resource(ttl=60)
+def _grilles():
+    """Grilles d'importance disponibles (Standard et fichiers du répertoire des grilles)"""
+    return charger_grilles()
+
+
+@st.cache_resource(ttl=60)
+def _modeles():
+    """Bibliothèque d'activités types (modèles intégrés et fichiers du répertoire des modèles)"""
+    return charger_modeles()
+
+
+def _enregistrer(nom, remplacer=False):
+    """Enregistre le projet de la session ; un conflit est signalé dans le panneau des projets"""
     try:
-        _rerun = st.experimental_rerun
-    except AttributeError:
-        from streamlit.runtime.scriptrunner import RerunException
-        def _rerun():
-            raise RerunException("Rerun requested")
-
-    class Impact:
-        def __init__(self, composante, milieu, nature, impact_apprehende, intensite=None, etendue=None, duree=None, attenuation=None):
-            self.composante = composante
-            self.milieu = milieu
-            self.nature = nature
-            self.impact_apprehende = impact_apprehende
-            self.intensite = intensite
-            self.etendue = etendue
-            self.duree = duree
-            self.attenuation = attenuation
-            self.importance = self.calculate_importance()
-
-        def calculate_importance(self):
-            if self.nature == 'risque impact':
-                return 'risque impact'
-            return evaluer_importance(self.intensite or '', self.etendue or '', self.duree or '')
-
-    class Activity:
-        def __init__(self, name):
-            self.name = name
-            self.impacts = []
-
-    class Phase:
-        def __init__(self, name):
-            self.name = name
-            self.activities = []
-
-    class Project:
-        def __init__(self):
-            self.phases = []
-
-        def add_phase(self, phase_name):
-            if phase_name not in [phase.name for phase in self.phases]:
-                self.phases.append(Phase(phase_name))
-
-        def get_phase(self, phase_name):
-            for phase in self.phases:
-                if phase.name == phase_name:
-                    return phase
-            return None
-
-
-        def to_dataframe(self):
-            data = []
-            for phase in self.phases:
-                for idx_activite, activity in enumerate(phase.activities):
-                    for impact in activity.impacts:
-                        data.append({
-                            "Phase": phase.name,
-                            "OrdreActivité": idx_activite,        
-                            "Activité": activity.name,
-                            "Composante": impact.composante,
-                            "Milieu": impact.milieu,
-                            "Nature impact": impact.nature,
-                            "Importance": impact.importance,
-                            "Impact appréhendé": impact.impact_apprehende,
-                            "Mesure atténuation": impact.attenuation 
-                                            if (impact.nature in ('négatif', 'risque impact')) 
-                                            else ''
-                        })
-            return pd.DataFrame(data)
-
-
-
-    def tableau_html_fusion(df):
-        df = df[[
-            "Phase", "OrdreActivité", "Activité",  
-            "Composante", "Milieu",
-            "Nature impact", "Importance", "Impact appréhendé", "Mesure atténuation"
-        ]]
-        
-        
-        ordre_phases = ["Préconstruction", "Construction", "Exploitation/Entretien", "Démantèlement"]
-        df["Phase"] = pd.Categorical(df["Phase"], categories=ordre_phases, ordered=True)
+        _depot().enregistrer(nom, st.session_state.project, remplacer)
+    except ConflitEnregistrement as e:
+        st.session_state.depot_conflit = str(e)
+        return False
+    st.session_state.pop("depot_conflit", None)
+    return True
+
+
+def _sauvegarde_auto():
+    """Enregistre les modifications du projet ouvert (sans effet si rien n'a changé)"""
+    nom = st.session_state.get("projet_nom")
+    if nom:
+        _enregistrer(nom)
+
+
+def _changer_projet(project, nom=None):
+    """Remplace le projet de la session : état des widgets effacé, phases repliées (chargement paresseux)"""
+    for key in [k for k in st.session_state if isinstance(k, str) and k.startswith(PREFIXES_EDITEUR)]:
+        del st.session_state[key]
+    st.session_state.project = project
+    st.session_state.projet_nom = nom
+    st.session_state.pop("depot_conflit", None)
+    st.session_state.collapsed = {f"phase_{phase.name}": False for phase in project.phases}
+    st.session_state.milieu_count = {}
+    st.session_state.milieu_noms = {}
+    st.session_state.editeur_initialise = set()
+
+
+def _ouvrir_projet():
+    nom = st.session_state.get("depot_projet")
+    if nom:
+        _changer_projet(_depot().ouvrir(nom), nom)
+
+
+def _signaler_conflit(emplacement):
+    """Affiche le conflit d'enregistrement de la session, s'il y en a un, dans ``emplacement``"""
+    message = st.session_state.get("depot_conflit")
+    if message is None:
+        emplacement.empty()
+        return
+    with emplacement.container():
+        st.warning(f"⚠️ {message} : les modifications de cette session ne sont plus enregistrées. "
+                   "Rechargez la version enregistrée ou enregistrez sous un autre nom.")
+        st.button("🔄 Recharger la version enregistrée", key="depot_recharger", on_click=_recharger_projet)
+
+
+def _recharger_projet():
+    """Abandonne la copie en conflit et rouvre la version enregistrée"""
+    nom = st.session_state.get("projet_nom")
+    if nom:
+        _changer_projet(_depot().ouvrir(nom), nom)
+
+
+def _enregistrer_projet():
+    nom = st.session_state.get("depot_nom", "").strip()
+    if nom and _enregistrer(nom, remplacer=True):
+        st.session_state.projet_nom = nom
+
+
+def _etat_initial(key, value):
+    """Pré-remplit un widget avec la valeur du modèle s'il n'a pas encore d'état dans la session"""
+    if key not in st.session_state and value is not None:
+        st.session_state[key] = value
+
+
+def _initialiser_activite(phase, activity):
+    """Aligne l'état des widgets d'une activité sur le modèle, au premier rendu de l'activité"""
+    par_composante = {}
+    for impact in activity.impacts:
+        par_composante.setdefault(impact.composante, []).append(impact)
+    st.session_state[f"comp_{phase.name}_{activity.name}"] = list(par_composante)
+    for comp, impacts in par_composante.items():
+        comp_key = f"comp_{phase.name}_{activity.name}_{comp}"
+        st.session_state.milieu_count[comp_key] = len(impacts)
+        for i, impact in enumerate(impacts, start=1):
+            milieu_key = f"{comp_key}_milieu_{i}"
+            st.session_state[f"name_{milieu_key}"] = impact.milieu
+            st.session_state.milieu_noms[milieu_key] = impact.milieu
+            st.session_state[f"nat_{milieu_key}"] = impact.nature
+            st.session_state[f"desc_{milieu_key}"] = impact.impact_apprehende or ""
+            if impact.nature != 'risque impact':
+                st.session_state[f"int_{milieu_key}"] = impact.intensite
+                st.session_state[f"et_{milieu_key}"] = impact.etendue
+                st.session_state[f"dur_{milieu_key}"] = impact.duree
+            st.session_state[f"att_{phase.name}_{activity.name}_{comp}_{i}"] = impact.attenuation or ""
+    st.session_state.editeur_initialise.add((phase.name, activity.name))
+
+
+def _deplie(key, defaut=False):
+    """Vrai si le sous-arbre ``key`` est déplié (collapsed[key] vrai) ; sans état, ``defaut``
+
+    Activités et composantes sont repliées tant qu'elles n'ont pas été ouvertes : un rerun
+    complet ne rend que les milieux des sous-arbres dépliés.
+    """
+    return st.session_state.collapsed.get(key, defaut)
+
+
+def _basculer(key, defaut=False):
+    st.session_state.collapsed[key] = not _deplie(key, defaut)
+
+
+def _oublier_activite(phase, activity):
+    """Efface l'état d'éditeur d'une activité supprimée (widgets, milieux, dépliage)
+
+    Une activité recréée sous le même nom repart ainsi du modèle et non des composantes
+    et milieux de l'ancienne.
+    """
+    base = f"{phase.name}_{activity.name}"
+    composantes = [f"comp_{base}_{comp}" for comp in ORDRE_COMPOSANTES]
+    exactes = {f"comp_{base}", f"activity_{base}", *composantes}
+    racines = tuple(f"{prefixe}{comp}_" for prefixe in ("",) + PREFIXES_EDITEUR for comp in composantes) \
+        + tuple(f"att_{base}_{comp}_" for comp in ORDRE_COMPOSANTES)
+    concerne = lambda key: isinstance(key, str) and (key in exactes or key.startswith(racines))
+    for key in [k for k in st.session_state if concerne(k)]:
+        del st.session_state[key]
+    for etat in (st.session_state.milieu_count, st.session_state.milieu_noms, st.session_state.collapsed):
+        for key in [k for k in etat if concerne(k)]:
+            del etat[key]
+    st.session_state.editeur_initialise.discard((phase.name, activity.name))
+
+
+def _supprimer_milieu(activity, comp, milieu_key):
+    """Supprime l'impact du milieu et vide son nom (callback : exécuté avant le rendu des widgets)"""
+    activity.remove_impact(comp, st.session_state.get(f"name_{milieu_key}", "").strip())
+    st.session_state[f"name_{milieu_key}"] = ""
+    st.session_state.milieu_noms.pop(milieu_key, None)
+    # Le rerun complet est demandé par le fragment du milieu (sans effet dans un callback)
+    st.session_state.matrice_perimee = True
+    _sauvegarde_auto()
+
+
+@_fragment
+def _editeur_phase(phase):
+    """Activités d'une phase, paginées ; seules celles de la page courante sont rendues"""
+    st.markdown('<div class="section">', unsafe_allow_html=True)
+
+    # Ajout d'activités
+    col1, col2 = st.columns([0.7, 0.3])
+    with col1:
+        new_activity = st.text_input(
+            "Nom de la nouvelle activité",
+            key=f"new_act_{phase.name}",
+            placeholder="Entrez le nom d'une activité"
+        )
+    with col2:
+        st.write("")
+        st.write("")
+        if st.button("➕ Ajouter activité", key=f"add_act_{phase.name}"):
+            if new_activity:
+                phase.add_activity(new_activity)
+                # Activité ajoutée dépliée, prête à être renseignée
+                st.session_state.collapsed[f"activity_{phase.name}_{new_activity}"] = True
+
+    # Activités existantes, par pages de ACTIVITES_PAR_PAGE
+    activities = phase.activities
+    debut = 0
+    if len(activities) > ACTIVITES_PAR_PAGE:
+        nb_pages = -(-len(activities) // ACTIVITES_PAR_PAGE)
+        page_key = f"page_act_{phase.name}"
+        if st.session_state.get(page_key, 1) > nb_pages:
+            st.session_state[page_key] = nb_pages
+        page = st.number_input(
+            f"Page d'activités ({len(activities)} activités)",
+            min_value=1, max_value=nb_pages, step=1, key=page_key
+        )
+        debut = (page - 1) * ACTIVITES_PAR_PAGE
+
+    for activity in activities[debut:debut + ACTIVITES_PAR_PAGE]:
+        activity_key = f"activity_{phase.name}_{activity.name}"
+
+        # Header d'activité avec flèche et bouton de suppression
+        st.markdown('<div class="subsection">', unsafe_allow_html=True)
+        col1, col2, col3 = st.columns([0.05, 0.85, 0.1])
+        with col1:
+            arrow = "▼" if _deplie(activity_key) else "▶"
+            st.button(arrow, key=f"btn_{activity_key}", on_click=_basculer, args=(activity_key,))
+        with col2:
+            st.markdown(f"**Activité:** {activity.name}")
+        with col3:
+            if st.button("🗑️", key=f"del_act_{activity_key}"):
+                phase.remove_activity(activity.name)
+                _oublier_activite(phase, activity)
+                _rerun()
+
+        # Les sous-arbres repliés ne créent aucun widget
+        if _deplie(activity_key):
+            _editeur_activite(phase, activity)
+        st.markdown('</div>', unsafe_allow_html=True)  # Fin subsection
+    st.markdown('</div>', unsafe_allow_html=True)  # Fin section
+    _sauvegarde_auto()
+
+
+@_fragment
+def _editeur_activite(phase, activity):
+    """Composantes et milieux d'une activité"""
+    if (phase.name, activity.name) not in st.session_state.editeur_initialise:
+        _initialiser_activite(phase, activity)
+    st.markdown('<div class="subsubsection">', unsafe_allow_html=True)
+
+    # Composantes environnementales (restaurées depuis le modèle après un repli)
+    options = ORDRE_COMPOSANTES
+    avec_impacts = {impact.composante for impact in activity.impacts}
+    _etat_initial(f"comp_{phase.name}_{activity.name}", [
+        comp for comp in options
+        if comp in avec_impacts or st.session_state.milieu_count.get(f"comp_{phase.name}_{activity.name}_{comp}")
+    ])
+    composantes = st.multiselect(
+        "Composantes environnementales concernées",
+        options,
+        key=f"comp_{phase.name}_{activity.name}",
+        help="Sélectionnez les composantes impactées par cette activité"
+    )
+
+    for comp in composantes:
+        comp_key = f"comp_{phase.name}_{activity.name}_{comp}"
+        # Une composante sans milieu ne coûte rien à rendre : dépliée par défaut
+        sans_milieu = not st.session_state.milieu_count.get(comp_key)
+
+        # Header de composante avec flèche
+        col1, col2 = st.columns([0.05, 0.95])
+        with col1:
+            arrow = "▼" if _deplie(comp_key, sans_milieu) else "▶"
+            st.button(arrow, key=f"btn_{comp_key}", on_click=_basculer, args=(comp_key, sans_milieu))
+        with col2:
+            st.markdown(f"**Composante:** {comp}")
+
+        if not _deplie(comp_key, sans_milieu):
+            continue
+
+        # Gestion des milieux
+        milieu_count = st.session_state.milieu_count.get(comp_key, 0)
+        if st.button("➕ Ajouter un milieu", key=f"add_mil_{comp_key}"):
+            milieu_count += 1
+            st.session_state.milieu_count[comp_key] = milieu_count
+            st.session_state.collapsed[comp_key] = True
+
+        for i in range(1, milieu_count + 1):
+            _editeur_milieu(phase, activity, comp, i)
+    st.markdown('</div>', unsafe_allow_html=True)  # Fin subsubsection
+    _sauvegarde_auto()
+
+
+@_fragment
+def _editeur_milieu(phase, activity, comp, i):
+    """Paramètres de l'impact d'un milieu ; modifier un champ ne rerend que ce milieu"""
+    milieu_key = f"comp_{phase.name}_{activity.name}_{comp}_milieu_{i}"
+
+    # Un impact a été supprimé : la matrice, hors des fragments, perd une ligne
+    if st.session_state.pop("matrice_perimee", False):
+        _rerun()
+
+    # Les widgets d'un sous-arbre replié perdent leur état : il est restauré depuis le modèle
+    _etat_initial(f"name_{milieu_key}", st.session_state.milieu_noms.get(milieu_key))
+    col1, col2 = st.columns([0.9, 0.1])
+    with col1:
+        raw_milieu = st.text_input(
+            f"Milieu {i}",
+            key=f"name_{milieu_key}",
+            placeholder="Nom du milieu (ex: Eau, Air, Sol...)"
+        )
+        milieu_name = raw_milieu.strip()
+    with col2:
+        st.write("")
+        st.write("")
+        st.button("🗑️", key=f"del_{milieu_key}", on_click=_supprimer_milieu, args=(activity, comp, milieu_key))
+
+    if not milieu_name:
+        return
+    st.session_state.milieu_noms[milieu_key] = milieu_name
+
+    # Vérifier s'il existe déjà un impact pour ce milieu
+    existing_impact = activity.get_impact(comp, milieu_name)
+
+    # Paramètres d'impact
+    _etat_initial(f"nat_{milieu_key}", existing_impact and existing_impact.nature)
+    nature = st.selectbox(
+        "Nature de l'impact",
+        ["négatif", "positif", "risque impact"],
+        key=f"nat_{milieu_key}"
+    )
+
+    # Description de l'impact
+    _etat_initial(f"desc_{milieu_key}", existing_impact and existing_impact.impact_apprehende)
+    impact_apprehende = st.text_area(
+        "Description de l'impact",
+        key=f"desc_{milieu_key}",
+        height=100
+    )
+
+    # Paramètres supplémentaires pour impacts non risque
+    intensite = etendue = duree = attenuation = None
+    cols = st.columns(3)
+    if nature != 'risque impact':
+        # Valeurs du modèle (impact existant ou importé), sinon valeurs par défaut
+        _etat_initial(f"int_{milieu_key}", existing_impact and existing_impact.intensite or "très forte")
+        _etat_initial(f"et_{milieu_key}", existing_impact and existing_impact.etendue or "locale")
+        _etat_initial(f"dur_{milieu_key}", existing_impact and existing_impact.duree or "court terme")
+        with cols[0]:
+            intensite = st.selectbox(
+                "Intensité",
+                ["très forte", "forte", "moyenne", "faible"],
+                key=f"int_{milieu_key}"
+            )
+        with cols[1]:
+            etendue = st.selectbox(
+                "Étendue",
+                ["régionale", "locale", "ponctuelle"],
+                key=f"et_{milieu_key}"
+            )
+        with cols[2]:
+            duree = st.selectbox(
+                "Durée",
+                ["long terme", "moyen terme", "court terme"],
+                key=f"dur_{milieu_key}"
+            )
 
-        df["Composante"] = pd.Categorical(
-            df["Composante"],
-            categories=["Physique", "Biologique", "Humain"],
-            ordered=True
+    if nature == 'négatif' or nature == 'risque impact':
+        # use the stable loop index `i` in the key rather than the text itself
+        att_key = f"att_{phase.name}_{activity.name}_{comp}_{i}"
+        _etat_initial(att_key, existing_impact and existing_impact.attenuation)
+        attenuation = st.text_area(
+            "Mesures d'atténuation",
+            key=att_key,
+            height=100
         )
 
-        df = df.sort_values(
-            by=["Phase", "OrdreActivité", "Composante", "Milieu"],
-            ascending=[True, True, True, True]
-        ).reset_index(drop=True)
-        
-        df = df.drop(columns=["OrdreActivité"])
-        
-        
-        # Calcul des rowspans
-        rowspan_data = {}
-        hierarchy_cols = ["Phase", "Activité", "Composante"]
-        for col in hierarchy_cols:
-            rowspan_data[col] = {}
-            current_group = None
-            count = 0
-            start_idx = 0
-            for i in range(len(df)):
-                group_cols = hierarchy_cols[:hierarchy_cols.index(col) + 1]
-                group_id = tuple(df.loc[i, group_cols].values)
-                if group_id != current_group:
-                    if current_group is not None:
-                        rowspan_data[col][start_idx] = count
-                    current_group = group_id
-                    count = 1
-                    start_idx = i
-                else:
-                    count += 1
-            rowspan_data[col][start_idx] = count
+    # Créer/mettre à jour l'objet Impact (remplace l'ancien s'il existe), évalué avec la grille du projet
+    activity.upsert_impact(Impact(
+        comp, milieu_name, nature, impact_apprehende,
+        intensite, etendue, duree, attenuation,
+        st.session_state.project.evaluer(nature, intensite, etendue, duree)
+    ))
+    _sauvegarde_auto()
+    if existing_impact is None:
+        # Nouvel impact : rerun complet pour ajouter sa ligne à la matrice
+        _rerun()
+
+
+LIMITE_RECHERCHE = 1000
+
+
+@_fragment
+def _recherche_espace():
+    """Filtres croisés sur tous les projets du dépôt ; rerun limité à ce fragment"""
+    # La recherche porte sur la base : le projet de la session y est d'abord enregistré
+    _sauvegarde_auto()
+    depot = _depot()
+    criteres = {}
+    cols = st.columns(5)
+    for col, (critere, libelle) in zip(cols, [
+        ("projets", "Projets"), ("phases", "Phases"), ("natures", "Nature"),
+        ("importances", "Importance"), ("milieux", "Milieux"),
+    ]):
+        with col:
+            criteres[critere] = st.multiselect(libelle, depot.valeurs(critere), key=f"recherche_{critere}")
+    total = depot.compter(**criteres)
+    st.caption(f"{total} impacts trouvés" + (f" ({LIMITE_RECHERCHE} premiers affichés)" if total > LIMITE_RECHERCHE else ""))
+    st.dataframe(depot.rechercher(limite=LIMITE_RECHERCHE, **criteres), use_container_width=True, hide_index=True)
+
+
+@_fragment
+def _comparaison(project):
+    """Différences entre une version de référence (projet enregistré ou fichier) et le projet courant"""
+    col1, col2 = st.columns([0.5, 0.5])
+    with col1:
+        nom = st.selectbox("Version de référence", [""] + _depot().lister(), key="diff_reference")
+    with col2:
+        fichier = st.file_uploader("ou matrice de référence (CSV/Excel)", type=["csv", "xlsx"], key="diff_fichier")
+    if fichier is not None:
+        cle = ("diff", "fichier", fichier.name, fichier.size)
+        reference = lambda: importer_matrice(fichier)[0]
+        etiquette = fichier.name
+    elif nom:
+        # Copie ouverte seulement si la révision enregistrée n'a pas encore été comparée
+        cle = ("diff", "depot", nom, _depot().revision(nom))
+        reference = lambda: _depot().ouvrir(nom)
+        etiquette = nom
+    else:
+        return
 
-        # Génération du tableau HTML
-        html_table = """
-        <style>
-        table { border-collapse: collapse; width: 100%; margin-top: 20px; font-family: Arial, sans-serif; }
-        th, td { border: 1px solid #ddd; padding: 10px; text-align: left; vertical-align: top; }
-        th { background-color: #f2f2f2; font-weight: bold; }
-        .hier-number { font-weight: bold; margin-right: 5px; }
-        </style>
-        <table>
-        <thead>
-            <tr>
-            <th>Phase</th><th>Activité</th><th>Composante</th><th>Milieu</th>
-            <th>Nature impact</th><th>Importance</th><th>Impact appréhendé</th><th>Mesure atténuation</th>
-            </tr>
-        </thead>
-        <tbody>
-        """
-
-        # Numérotation hiérarchique
-        current_numbers = {col: 0 for col in hierarchy_cols}
-        last_values = {col: None for col in hierarchy_cols}
-
-        for i, row in df.iterrows():
-            for col in hierarchy_cols:
-                if row[col] != last_values[col]:
-                    current_numbers[col] += 1
-                    for sub_col in hierarchy_cols[hierarchy_cols.index(col)+1:]:
-                        current_numbers[sub_col] = 0
-                    last_values[col] = row[col]
-
-            html_table += "<tr>"
-            for col in hierarchy_cols:
-                if i in rowspan_data[col]:
-                    span = rowspan_data[col][i]
-                    prefix = ".".join(str(current_numbers[c]) for c in hierarchy_cols[:hierarchy_cols.index(col)+1]) + "."
-                    text = html.escape(str(row[col]))
-                    html_table += f'<td rowspan="{span}"><span class="hier-number">{prefix}</span>{text}</td>'
-
-            # Cellules avec préservation des retours à la ligne via <br>
-            milieu = html.escape(str(row['Milieu']))
-            nature = html.escape(str(row['Nature impact']))
-            importance = html.escape(str(row['Importance']))
-            impact_desc = html.escape(str(row['Impact appréhendé'])).replace('\n', '<br/>')
-            attenuation = html.escape(str(row['Mesure atténuation'])).replace('\n', '<br/>')
-
-            html_table += f"<td>{milieu}</td>"
-            html_table += f"<td>{nature}</td>"
-            html_table += f'<td style="{get_color(row["Importance"], row["Nature impact"])}">{importance}</td>'
-            html_table += f'<td>{impact_desc}</td>'
-            html_table += f'<td>{attenuation}</td>'
-            html_table += "</tr>"
-
-        html_table += "</tbody></table>"
-        return html_table
+    try:
+        diff = project.memoize(cle, lambda: comparer_matrices(reference(), project))
+    except ValueError as e:
+        st.error(f"❌ Comparaison impossible : {e}")
+        return
+    if diff.identiques:
+        st.info(f"Aucune différence avec « {etiquette} »")
+        return
+    cols = st.columns(4)
+    for col, (libelle, compteur) in zip(cols, [
+        ("Ajoutés", "ajouté"), ("Supprimés", "supprimé"), ("Modifiés", "modifié"), ("Importances changées", "importance"),
+    ]):
+        col.metric(libelle, diff.compteurs[compteur])
+    st.caption(resume_diff(diff, etiquette, "projet courant"))
+    if diff.compteurs["importance"]:
+        st.dataframe(diff.transitions_importance(), use_container_width=True, hide_index=True)
+    inclure = st.checkbox("Afficher aussi les impacts inchangés", key="diff_inchanges")
+    st.markdown(tableau_diff_html(diff, inclure), unsafe_allow_html=True)
+
+
+def _grille_importance(project):
+    """Choix de la grille d'importance, application au projet ou à tout l'espace de travail"""
+    grilles, rejets = _grilles()
+    grilles = {**grilles, **st.session_state.setdefault("grilles_importees", {})}
+    if project.grille.nom not in grilles:
+        grilles[project.grille.nom] = project.grille
+    st.caption(f"Grille du projet : « {project.grille.nom} »")
+    for fichier, motif in rejets:
+        st.warning(f"⚠️ {fichier} ignoré : {motif}")
+
+    fichier = st.file_uploader("Charger une grille (CSV ou JSON)", type=["csv", "json"], key="grille_fichier")
+    if fichier is not None:
+        try:
+            grille = lire_grille(fichier)
+        except ValueError as e:
+            st.error(f"❌ {e}")
+        else:
+            st.session_state.grilles_importees[grille.nom] = grilles[grille.nom] = grille
+
+    _etat_initial("grille_choix", project.grille.nom)
+    nom = st.selectbox("Grille", list(grilles), key="grille_choix")
+    grille = grilles[nom]
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("Appliquer au projet", key="grille_projet"):
+            modifies = project.changer_grille(grille)
+            _sauvegarde_auto()
+            st.success(f"✅ Grille « {nom} » appliquée : {modifies} importance(s) modifiée(s)")
+    with col2:
+        if st.button("Appliquer à tous les projets enregistrés", key="grille_espace"):
+            try:
+                modifies = _depot().reevaluer(grille, ouverts=[project])
+            except ConflitEnregistrement as e:
+                st.session_state.depot_conflit = str(e)
+                st.error(f"❌ {e} : rechargez le projet avant d'appliquer la grille à l'espace de travail")
+            else:
+                if not st.session_state.get("projet_nom"):
+                    modifies += project.changer_grille(grille)
+                st.success(f"✅ Grille « {nom} » appliquée à l'espace de travail : {modifies} importance(s) modifiée(s)")
+    with col3:
+        st.download_button("📄 Modèle CSV", ecrire_grille_csv(grille), f"grille_{nom}.csv", "text/csv",
+                           key="grille_modele")
+
+
+def _bibliotheque_activites(project):
+    """Ajout d'activités types avec tous leurs impacts, en une seule opération"""
+    bibliotheque, rejets = _modeles()
+    for fichier, motif in rejets:
+        st.warning(f"⚠️ {fichier} ignoré : {motif}")
+    importes = st.session_state.setdefault("modeles_importes", {})
+    fichier = st.file_uploader("Charger des modèles (JSON)", type=["json"], key="modeles_fichier")
+    if fichier is not None:
+        try:
+            for modele in lire_modeles(fichier):
+                importes[modele.nom] = modele
+        except (ValueError, AttributeError, TypeError) as e:
+            st.error(f"❌ {e}")
+    modeles = {**bibliotheque.modeles, **importes}
+
+    # Formulaire : les sélections ne déclenchent aucun rerun avant la validation
+    with st.form("modeles_formulaire"):
+        noms = st.multiselect(
+            "Activités types", list(modeles), key="modeles_choix",
+            format_func=lambda nom: f"{nom} ({len(modeles[nom].impacts)} impacts)",
+        )
+        cible = st.selectbox("Phase", ["Phases suggérées"] + ORDRE_PHASES, key="modeles_phase")
+        ajouter = st.form_submit_button("➕ Ajouter au projet")
+    if ajouter and noms:
+        resultats = instancier(project, [modeles[nom] for nom in noms], None if cible == "Phases suggérées" else cible)
+        # Les activités complétées seront réinitialisées depuis le modèle à leur prochain rendu
+        for phase_name, activity_name, _ in resultats:
+            st.session_state.editeur_initialise.discard((phase_name, activity_name))
+        _sauvegarde_auto()
+        st.success(f"✅ {len(resultats)} activité(s) ajoutée(s), {sum(r[2] for r in resultats)} impact(s) créé(s)")
+
+    # Export produit uniquement à la demande (il charge toutes les phases), conservé jusqu'à la prochaine modification
+    if project.phases:
+        if st.button("⚙️ Préparer l'export des activités comme modèles", key="modeles_preparer"):
+            project.memoize("export_modeles", lambda: ecrire_modeles_json(modeles_depuis_projet(project)))
+        donnees = project.cached("export_modeles")
+        if donnees is not None:
+            st.download_button("📄 Télécharger les modèles (JSON)", donnees, "modeles_activites.json",
+                               "application/json", key="modeles_export")
 
 
+def run():
+    st.title("🌍 Générateur de Matrice d'Impact Environnemental par Phase")
+
     def main():
         
         
@@ -225,9 +578,67 @@ def run():
             st.session_state.project = Project()
             st.session_state.collapsed = {}
             st.session_state.milieu_count = {}
+        st.session_state.setdefault("milieu_noms", {})
+        st.session_state.setdefault("editeur_initialise", set())
             
         project = st.session_state.project
 
+        # Projets enregistrés : chaque session modifie sa propre copie, enregistrée automatiquement
+        with st.expander("💾 Projets enregistrés", expanded="depot_conflit" in st.session_state):
+            # Rempli après l'enregistrement automatique de fin de script (voir _signaler_conflit)
+            conflit = st.empty()
+            col1, col2 = st.columns([0.7, 0.3])
+            with col1:
+                st.selectbox("Projet enregistré", _depot().lister(), key="depot_projet")
+            with col2:
+                st.write("")
+                st.write("")
+                st.button("📂 Ouvrir", key="depot_ouvrir", on_click=_ouvrir_projet)
+            col1, col2 = st.columns([0.7, 0.3])
+            with col1:
+                st.text_input("Enregistrer le projet courant sous", key="depot_nom")
+            with col2:
+                st.write("")
+                st.write("")
+                st.button("💾 Enregistrer", key="depot_enregistrer", on_click=_enregistrer_projet)
+            if st.session_state.get("projet_nom"):
+                st.caption(f"Projet « {st.session_state.projet_nom} » : enregistrement automatique activé")
+
+        with st.expander("🔎 Recherche dans tous les projets enregistrés"):
+            _recherche_espace()
+
+        with st.expander("🧩 Bibliothèque d'activités types"):
+            _bibliotheque_activites(project)
+
+        with st.expander("📐 Grille d'importance"):
+            _grille_importance(project)
+
+        with st.expander("🔀 Comparer avec une autre version"):
+            _comparaison(project)
+
+        # Import d'une matrice existante (export CSV de cette application ou classeur Excel)
+        with st.expander("📥 Importer une matrice (CSV/Excel)"):
+            fichier = st.file_uploader("Fichier de matrice", type=["csv", "xlsx"], key="import_fichier")
+            if fichier is not None and st.button("Importer", key="import_btn"):
+                try:
+                    _, rapport = importer_matrice(fichier, projet=project)
+                except ValueError as e:
+                    st.error(f"❌ Import impossible : {e}")
+                else:
+                    # Les activités importées seront réinitialisées depuis le modèle à leur prochain rendu
+                    st.session_state.editeur_initialise = set()
+                    st.session_state.import_rapport = rapport
+                    _rerun()
+            rapport = st.session_state.get("import_rapport")
+            if rapport is not None:
+                st.success(f"✅ {rapport.impacts} impacts importés ({rapport.remplaces} remplacés)")
+                if rapport.erreurs:
+                    st.warning(f"⚠️ {len(rapport.erreurs)} lignes ignorées")
+                    st.dataframe(
+                        [{"Ligne": ligne, "Motif": motif} for ligne, motif in rapport.erreurs[:200]],
+                        use_container_width=True
+                    )
+
         # Gestion des phases
         selected_phases = st.multiselect(
             "Phases du projet",
@@ -236,224 +647,109 @@ def run():
         )
         
         # Synchronisation des phases
-        current_phases = [p.name for p in project.phases]
-        project.phases = [p for p in project.phases if p.name in selected_phases]
-        for phase_name in selected_phases:
-            if phase_name not in current_phases:
-                project.add_phase(phase_name)
+        project.sync_phases(selected_phases)
 
-        # Affichage hiérarchique
+        # Affichage hiérarchique : en-têtes de phase ici, contenu rendu par fragments
         for phase in project.phases:
             phase_key = f"phase_{phase.name}"
             
             # Header avec flèche interactive
             col1, col2 = st.columns([0.05, 0.95])
             with col1:
-                arrow = "▼" if st.session_state.collapsed.get(phase_key, True) else "▶"
-                if st.button(arrow, key=f"btn_{phase_key}"):
-                    st.session_state.collapsed[phase_key] = not st.session_state.collapsed.get(phase_key, True)
+                arrow = "▼" if _deplie(phase_key, True) else "▶"
+                st.button(arrow, key=f"btn_{phase_key}", on_click=_basculer, args=(phase_key, True))
             with col2:
                 st.subheader(f"Phase: {phase.name}")
             
-            if not st.session_state.collapsed.get(phase_key, True):
-                continue
-                
-            with st.container():
-                st.markdown('<div class="section">', unsafe_allow_html=True)
-                
-                # Ajout d'activités
-                col1, col2 = st.columns([0.7, 0.3])
-                with col1:
-                    new_activity = st.text_input(
-                        "Nom de la nouvelle activité",
-                        key=f"new_act_{phase.name}",
-                        placeholder="Entrez le nom d'une activité"
-                    )
-                with col2:
-                    st.write("")
-                    st.write("")
-                    if st.button("➕ Ajouter activité", key=f"add_act_{phase.name}"):
-                        if new_activity:
-                            phase.activities.append(Activity(new_activity))
-                
-                # Activités existantes
-                for activity in phase.activities[:]:
-                    activity_key = f"activity_{phase.name}_{activity.name}"
-                    
-                    # Header d'activité avec flèche et bouton de suppression
-                    st.markdown('<div class="subsection">', unsafe_allow_html=True)
-                    col1, col2, col3 = st.columns([0.05, 0.85, 0.1])
-                    with col1:
-                        arrow = "▼" if st.session_state.collapsed.get(activity_key, True) else "▶"
-                        if st.button(arrow, key=f"btn_{activity_key}"):
-                            st.session_state.collapsed[activity_key] = not st.session_state.collapsed.get(activity_key, True)
-                    with col2:
-                        st.markdown(f"**Activité:** {activity.name}")
-                    with col3:
-                        if st.button("🗑️", key=f"del_act_{activity_key}"):
-                            phase.activities.remove(activity)
-                            _rerun()
-                    
-                    if not st.session_state.collapsed.get(activity_key, True):
-                        st.markdown('</div>', unsafe_allow_html=True)
-                        continue
-                    
-                    with st.container():
-                        st.markdown('<div class="subsubsection">', unsafe_allow_html=True)
-                        
-                        # Composantes environnementales
-                        composantes = st.multiselect(
-                            "Composantes environnementales concernées",
-                            ["Physique", "Biologique", "Humain"],
-                            key=f"comp_{phase.name}_{activity.name}",
-                            help="Sélectionnez les composantes impactées par cette activité"
-                        )
-                        
-                        for comp in composantes:
-                            comp_key = f"comp_{phase.name}_{activity.name}_{comp}"
-                            
-                            # Header de composante avec flèche
-                            col1, col2 = st.columns([0.05, 0.95])
-                            with col1:
-                                arrow = "▼" if st.session_state.collapsed.get(comp_key, True) else "▶"
-                                if st.button(arrow, key=f"btn_{comp_key}"):
-                                    st.session_state.collapsed[comp_key] = not st.session_state.collapsed.get(comp_key, True)
-                            with col2:
-                                st.markdown(f"**Composante:** {comp}")
-                            
-                            if not st.session_state.collapsed.get(comp_key, True):
-                                continue
-                                
-                            with st.container():
-                                # Gestion des milieux
-                                milieu_count = st.session_state.milieu_count.get(comp_key, 0)
-                                
-                                # Ajout de milieux
-                                if st.button("➕ Ajouter un milieu", key=f"add_mil_{comp_key}"):
-                                    milieu_count += 1
-                                    st.session_state.milieu_count[comp_key] = milieu_count
-                                
-                                # Milieux existants
-                                for i in range(1, milieu_count + 1):
-                                    milieu_key = f"{comp_key}_milieu_{i}"
-                                    
-                                    # Suppression de milieu
-                                    col1, col2 = st.columns([0.9, 0.1])
-                                    with col1:
-                                        raw_milieu = st.text_input(
-                                            f"Milieu {i}",
-                                            key=f"name_{milieu_key}",
-                                            placeholder="Nom du milieu (ex: Eau, Air, Sol...)"
-                                        )
-                                        milieu_name = raw_milieu.strip()
-
-                                    with col2:
-                                        st.write("")
-                                        st.write("")
-                                        if st.button("🗑️", key=f"del_{milieu_key}"):
-                                            # Supprimer l'impact correspondant
-                                            activity.impacts = [imp for imp in activity.impacts 
-                                                            if not (imp.composante == comp and imp.milieu == milieu_name)]
-                                            _rerun()
-                                    
-                                    if not milieu_name:
-                                        continue
-                                    
-                                    # Paramètres d'impact
-                                    nature = st.selectbox(
-                                        "Nature de l'impact",
-                                        ["négatif", "positif", "risque impact"],
-                                        index=0,
-                                        key=f"nat_{milieu_key}"
-                                    )
-                                    
-                                    # Vérifier s'il existe déjà un impact pour ce milieu
-                                    existing_impact = next(
-                                        (imp for imp in activity.impacts 
-                                        if imp.composante == comp and imp.milieu == milieu_name), 
-                                        None
-                                    )
-                                    
-                                    # Description de l'impact
-                                    impact_apprehende = st.text_area(
-                                        "Description de l'impact",
-                                        value=existing_impact.impact_apprehende  if existing_impact else "",
-                                        key=f"desc_{milieu_key}",
-                                        height=100
-                                    )
-                                    
-                                    # Paramètres supplémentaires pour impacts non 
-                                    intensite = etendue = duree = attenuation = None
-                                    cols = st.columns(3)
-                                    if nature != 'risque impact':
-                                        with cols[0]:
-                                            intensite = st.selectbox(
-                                                "Intensité",
-                                                ["très forte", "forte", "moyenne", "faible"],
-                                                index=0,
-                                                key=f"int_{milieu_key}"
-                                            )
-                                        with cols[1]:
-                                            etendue = st.selectbox(
-                                                "Étendue",
-                                                ["régionale", "locale", "ponctuelle"],
-                                                index=1,
-                                                key=f"et_{milieu_key}"
-                                            )
-                                        with cols[2]:
-                                            duree = st.selectbox(
-                                                "Durée",
-                                                ["long terme", "moyen terme", "court terme"],
-                                                index=2,
-                                                key=f"dur_{milieu_key}"
-                                        )
-                                    
-                                    if nature == 'négatif' or nature == 'risque impact':
-                                        # use the stable loop index `i` in the key rather than the text itself
-                                        attenuation = st.text_area(
-                                            "Mesures d'atténuation",
-                                            value=existing_impact.attenuation if existing_impact else "",
-                                            key=f"att_{phase.name}_{activity.name}_{comp}_{i}",
-                                            height=100
-                                        )                                        
-                                    
-                                    # Créer/mettre à jour l'objet Impact
-                                    new_impact = Impact(
-                                        comp, milieu_name, nature, impact_apprehende,
-                                        intensite, etendue, duree, attenuation
-                                    )
-                                    
-                                    # Supprimer l'ancien impact s'il existe
-                                    if existing_impact:
-                                        activity.impacts.remove(existing_impact)
-                                    
-                                    # Ajouter le nouvel impact
-                                    activity.impacts.append(new_impact)
-                                
-                                st.markdown('</div>', unsafe_allow_html=True)  # Fin subsubsection
-                            st.markdown('</div>', unsafe_allow_html=True)  # Fin subsubsection container
-                        st.markdown('</div>', unsafe_allow_html=True)  # Fin subsection
-                    st.markdown('</div>', unsafe_allow_html=True)  # Fin section
-                st.markdown('</div>', unsafe_allow_html=True)  # Fin section container
+            if _deplie(phase_key, True):
+                _editeur_phase(phase)
+        _sauvegarde_auto()
+        _signaler_conflit(conflit)
 
         # Affichage de la matrice finale
         df = project.to_dataframe()
         if not df.empty:
             st.markdown("## 📊 Matrice des impacts environnementaux")
             st.markdown("### Synthèse complète des impacts par phase, activité et composante")
+
+            # Ajouter ou supprimer un impact relance toute l'application ; les autres
+            # modifications de l'éditeur ne réexécutent que leur fragment et la matrice
+            # n'est recalculée qu'au prochain rerun complet
+            st.button("🔄 Actualiser la matrice", key="matrice_actualiser")
             
-            # Export CSV
-            csv = df.to_csv(index=False, sep=';').encode('utf-8')
-            st.download_button(
-                "💾 Exporter en CSV", 
-                csv, 
-                "matrice_impacts.csv", 
-                "text/csv",
-                key='download-csv'
-            )
-            
-            # Affichage du tableau
-            st.markdown(tableau_html_fusion(df), unsafe_allow_html=True)
+            # Les résultats dérivés sont mis en cache contre la version du projet :
+            # un rerun sans modification ne recalcule ni tri, ni fusion, ni HTML
+            matrice = project.memoize("matrice", lambda: trier_matrice(df))
+            rowspans, numeros = project.memoize("fusion", lambda: calculer_fusion(matrice))
+
+            # Exports produits uniquement à la demande, conservés jusqu'à la prochaine modification
+            col1, col2, col3 = st.columns([0.3, 0.3, 0.4])
+            with col1:
+                format_export = st.selectbox("Format d'export", list(FORMATS_EXPORT), key="export_format")
+            _, nom_fichier, mime = FORMATS_EXPORT[format_export]
+            with col2:
+                st.write("")
+                st.write("")
+                if st.button("⚙️ Préparer l'export", key="export_preparer"):
+                    project.memoize(("export", format_export), lambda: exporter(df, format_export))
+            donnees = project.cached(("export", format_export))
+            if donnees is not None:
+                with col3:
+                    st.write("")
+                    st.write("")
+                    st.download_button(
+                        f"💾 Télécharger ({format_export})",
+                        donnees,
+                        nom_fichier,
+                        mime,
+                        key="download-export"
+                    )
+
+            # Tableau de bord : synthèses et figures recalculées seulement quand le projet change
+            if st.toggle("📈 Tableau de bord", key="matrice_tableau_bord"):
+                synthese = project.memoize("synthese", lambda: synthese_matrice(df))
+                figures = project.memoize("synthese_figures", lambda: figures_synthese(synthese))
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Impacts", synthese.impacts)
+                col2.metric("Impacts à atténuer", synthese.a_attenuer)
+                taux = synthese.taux_attenuation
+                col3.metric("Dotés d'une mesure", "—" if taux is None else f"{taux:.0%}")
+                noms = list(figures)
+                for debut_ligne in range(0, len(noms), 2):
+                    for col, nom in zip(st.columns(2), noms[debut_ligne:debut_ligne + 2]):
+                        with col:
+                            st.plotly_chart(figures[nom], use_container_width=True, key=f"synthese_{nom}")
+
+            # Affichage du tableau page par page ou phase par phase
+            col1, col2, col3 = st.columns([0.4, 0.3, 0.3])
+            with col1:
+                mode = st.radio("Affichage", ["Par page", "Par phase"], horizontal=True, key="matrice_mode")
+            if mode == "Par page":
+                with col2:
+                    taille_page = st.selectbox("Lignes par page", [50, 100, 250, 500], index=1, key="matrice_taille_page")
+                pages = pages_matrice(rowspans, len(matrice), taille_page)
+                if st.session_state.get("matrice_page", 1) > len(pages):
+                    st.session_state.matrice_page = len(pages)
+                with col3:
+                    numero = st.number_input("Page", min_value=1, max_value=len(pages), step=1, key="matrice_page")
+            else:
+                pages = pages_matrice(rowspans, len(matrice))
+                with col2:
+                    numero = st.selectbox(
+                        "Phase",
+                        range(1, len(pages) + 1),
+                        format_func=lambda k: matrice["Phase"].iloc[pages[k - 1][0]],
+                        key="matrice_phase"
+                    )
+
+            debut, fin = pages[numero - 1]
+            st.caption(f"Impacts {debut + 1} à {fin} sur {len(matrice)}")
+            with chronometre("leopold.page_html"):
+                page_html = project.memoize(
+                    ("page", debut, fin),
+                    lambda: tableau_html(matrice, rowspans, numeros, debut, fin)
+                )
+            st.markdown(page_html, unsafe_allow_html=True)
         else:
             st.info("ℹ️ Commencez par ajouter des phases, activités et composantes pour générer la matrice.")
 
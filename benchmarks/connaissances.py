@@ -0,0 +1,105 @@
+"""Benchmark de la base de connaissances de l'assistant AI1 en fonction de sa taille.
+
+Sur des bases synthétiques de 100 à 100 000 impacts (10 impacts par composante),
+mesure :
+
+- ``compilation`` : compilation du JSONL en base SQLite indexée (une fois par version du fichier) ;
+- ``ouverture`` : ouverture d'une base déjà compilée (démarrage de l'assistant) ;
+- ``reponse`` : composantes de 3 thématiques, chargées au premier accès ;
+- ``memoire_ouverture`` / ``memoire_complete`` : mémoire allouée après l'ouverture, puis
+  après le chargement de toutes les composantes (ce que coûtait la base entièrement en mémoire).
+
+Utilisation (depuis la racine du dépôt) :
+
+    python -m benchmarks.connaissances --sortie connaissances.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.executer import _enregistrement, comparer
+from utils.connaissances import MILIEUX, NATURES, BaseConnaissances, compiler_base
+
+TAILLES = [100, 1_000, 10_000, 100_000]
+IMPACTS_PAR_COMPOSANTE = 10
+PERIODES = ["Construction", "Exploitation", "Démantèlement", "Construction/Démantèlement"]
+
+
+def ecrire_base(chemin: str, nb_impacts: int) -> None:
+    with open(chemin, "w", encoding="utf-8") as f:
+        for i in range(max(1, nb_impacts // IMPACTS_PAR_COMPOSANTE)):
+            f.write(json.dumps({"type": "composante", "cle": f"c{i}", "nom": f"Composante {i}",
+                                "milieu": MILIEUX[i % len(MILIEUX)]}, ensure_ascii=False) + "\n")
+            for j in range(IMPACTS_PAR_COMPOSANTE):
+                f.write(json.dumps({
+                    "type": "impact", "composante": f"c{i}", "nom": f"Impact {i}.{j}",
+                    "description": f"Description de l'impact {j} de la composante {i} " * 3,
+                    "nature": NATURES[j % len(NATURES)], "periode": PERIODES[j % len(PERIODES)],
+                    "mesures": [f"Mesure d'atténuation {k} de l'impact {i}.{j}" for k in range(6)],
+                }, ensure_ascii=False) + "\n")
+
+
+def _duree(fonction) -> float:
+    debut = time.perf_counter()
+    fonction()
+    return time.perf_counter() - debut
+
+
+def mesurer(repertoire: str, nb_impacts: int):
+    source = os.path.join(repertoire, f"synthetique_{nb_impacts}.jsonl")
+    ecrire_base(source, nb_impacts)
+    mesures = {"compilation": _duree(lambda: compiler_base(source, os.path.splitext(source)[0] + ".sqlite"))}
+
+    tracemalloc.start()
+    debut = time.perf_counter()
+    base = BaseConnaissances(f"synthetique_{nb_impacts}", repertoire)
+    mesures["ouverture"] = time.perf_counter() - debut
+    mesures["memoire_ouverture"] = tracemalloc.get_traced_memory()[0]
+    mesures["reponse"] = _duree(lambda: base.composantes_thematiques(["c0", "c1", "c2"]))
+    for cle in base.composantes:
+        base.composantes[cle]
+    mesures["memoire_complete"] = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    base._connexion.close()
+    return mesures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sortie", default="bench_connaissances.json")
+    parser.add_argument("--tailles", nargs="*", type=int, default=TAILLES)
+    parser.add_argument("--comparer", help="Fichier de résultats de référence")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    resultats = []
+    with tempfile.TemporaryDirectory() as repertoire:
+        for taille in args.tailles:
+            mesures = mesurer(repertoire, taille)
+            for nom, valeur in mesures.items():
+                memoire = nom.startswith("memoire")
+                resultats.append(_enregistrement("AI1", f"connaissances_{nom}", taille,
+                                                 "memoire" if memoire else "duree", valeur, "octets" if memoire else "s"))
+            print(f"{taille:>7} impacts  compilation {mesures['compilation']:8.3f} s  "
+                  f"ouverture {1e3 * mesures['ouverture']:7.2f} ms  réponse {1e3 * mesures['reponse']:6.2f} ms  "
+                  f"mémoire {mesures['memoire_ouverture'] / 1024:8.1f} Kio (complète {mesures['memoire_complete'] / 1024:9.1f} Kio)")
+
+    with open(args.sortie, "w", encoding="utf-8") as f:
+        json.dump({"resultats": resultats}, f, ensure_ascii=False, indent=2)
+
+    if args.comparer:
+        with open(args.comparer, encoding="utf-8") as f:
+            regressions = comparer(resultats, json.load(f)["resultats"], args.tolerance)
+        for ligne in regressions:
+            print(f"RÉGRESSION {ligne}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
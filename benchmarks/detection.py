@@ -0,0 +1,130 @@
+"""Benchmark de la détection des thématiques et périodes de l'assistant AI1 sur de longs textes.
+
+Compare le détecteur compilé (``utils.detection``, un passage sur le texte) à l'ancienne
+recherche par sous-chaînes (un parcours du texte par mot-clé), sur des chapitres
+d'étude d'impact synthétiques de 10 000 à 1 000 000 de caractères :
+
+- ``chapitre`` : texte d'étude d'impact où les mots-clés apparaissent au fil du texte ;
+- ``sans_mot_cle`` : texte sans aucun mot-clé, parcouru en entier (pire cas) ;
+- ``vocabulaire_<n>`` : chapitre de 100 000 caractères avec une base de n mots-clés
+  (mots-clés réels complétés de mots synthétiques), pour le coût en fonction de la
+  taille de la base de connaissances.
+
+Utilisation (depuis la racine du dépôt) :
+
+    python -m benchmarks.detection --sortie detection.json
+"""
+
+import argparse
+import json
+import random
+import sys
+
+from benchmarks.executer import _enregistrement, comparer
+from benchmarks.fusion import _chronometrer
+from utils.connaissances import DETECTEUR, MOTS_CLES_PERIODES, MOTS_CLES_THEMATIQUES
+from utils.detection import DetecteurMotsCles
+
+TAILLES = [10_000, 100_000, 1_000_000]
+VOCABULAIRES = [300, 3_000]
+TAILLE_VOCABULAIRE = 100_000
+MOTS_CLES = {**MOTS_CLES_THEMATIQUES, **MOTS_CLES_PERIODES}
+
+PARAGRAPHES_ETUDE = [
+    "Le projet s'inscrit dans un contexte géologique marqué par des formations marneuses sensibles "
+    "au ravinement ; les terrassements prévus entraîneront des déblais importants.",
+    "Les relevés acoustiques réalisés de jour comme de nuit montrent des niveaux sonores modérés "
+    "au droit des habitations les plus proches du tracé.",
+    "L'inventaire floristique a mis en évidence trois habitats d'intérêt communautaire et plusieurs "
+    "espèces protégées fréquentant les ripisylves de l'oued.",
+    "En phase d'exploitation, le trafic attendu à l'horizon de mise en service génère des émissions "
+    "de polluants atmosphériques dont les concentrations restent inférieures aux seuils.",
+    "Le réseau d'assainissement longitudinal collecte les eaux de ruissellement de la plate-forme "
+    "vers des bassins de rétention étanches avant rejet au milieu naturel.",
+    "À la fin de la concession, la démolition des ouvrages provisoires et la remise en état des "
+    "emprises seront conduites selon le plan de démantèlement.",
+]
+PARAGRAPHES_NEUTRES = [
+    "Le présent chapitre rappelle le cadre réglementaire applicable et la méthodologie retenue par "
+    "le maître d'ouvrage pour la conduite de la présente analyse.",
+    "Les données mobilisées proviennent des administrations compétentes et des consultations menées "
+    "auprès des services déconcentrés de l'État.",
+]
+
+
+def texte(nb_caracteres: int, paragraphes) -> str:
+    morceaux, longueur, i = [], 0, 0
+    while longueur < nb_caracteres:
+        morceaux.append(paragraphes[i % len(paragraphes)])
+        longueur += len(morceaux[-1]) + 2
+        i += 1
+    return "\n\n".join(morceaux)[:nb_caracteres]
+
+
+def detecter_sous_chaines(texte_utilisateur: str, mots_cles=MOTS_CLES):
+    """Ancienne détection : un test ``mot in texte`` par mot-clé (référence de comparaison)"""
+    texte_lower = texte_utilisateur.lower()
+    return [categorie for categorie, mots in mots_cles.items() if any(mot in texte_lower for mot in mots)]
+
+
+def vocabulaire(nb_mots: int):
+    """Mots-clés réels complétés de mots synthétiques absents du texte, par catégories de 10"""
+    aleatoire = random.Random(0)
+    mots_cles = {categorie: list(mots) for categorie, mots in MOTS_CLES.items()}
+    total = sum(len(mots) for mots in mots_cles.values())
+    while total < nb_mots:
+        mot = "".join(aleatoire.choice("bcdfgjkmpqvwxz") for _ in range(aleatoire.randint(5, 12)))
+        mots_cles.setdefault(f"synthetique_{total // 10}", []).append(mot)
+        total += 1
+    return mots_cles
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sortie", default="bench_detection.json")
+    parser.add_argument("--tailles", nargs="*", type=int, default=TAILLES)
+    parser.add_argument("--vocabulaires", nargs="*", type=int, default=VOCABULAIRES)
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--comparer", help="Fichier de résultats de référence")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    resultats = []
+    for scenario, paragraphes in (("chapitre", PARAGRAPHES_ETUDE), ("sans_mot_cle", PARAGRAPHES_NEUTRES)):
+        for taille in args.tailles:
+            document = texte(taille, paragraphes)
+            mesures = {
+                "compile": _chronometrer(lambda: DETECTEUR.detecter(document), args.repetitions),
+                "sous_chaines": _chronometrer(lambda: detecter_sous_chaines(document), args.repetitions),
+            }
+            for methode, duree in mesures.items():
+                resultats.append(_enregistrement("AI1", f"{scenario}_{methode}", taille, "duree_mediane", duree, "s"))
+                print(f"{scenario:<17} {methode:<13} {taille:>9} car.  {1e3 * duree:9.3f} ms")
+
+    document = texte(TAILLE_VOCABULAIRE, PARAGRAPHES_ETUDE)
+    for nb_mots in args.vocabulaires:
+        mots_cles = vocabulaire(nb_mots)
+        detecteur = DetecteurMotsCles(mots_cles)
+        mesures = {
+            "compile": _chronometrer(lambda: detecteur.detecter(document), args.repetitions),
+            "sous_chaines": _chronometrer(lambda: detecter_sous_chaines(document, mots_cles), args.repetitions),
+        }
+        for methode, duree in mesures.items():
+            scenario = f"vocabulaire_{nb_mots}_{methode}"
+            resultats.append(_enregistrement("AI1", scenario, TAILLE_VOCABULAIRE, "duree_mediane", duree, "s"))
+            print(f"{'vocabulaire ' + str(nb_mots):<17} {methode:<13} {TAILLE_VOCABULAIRE:>9} car.  {1e3 * duree:9.3f} ms")
+
+    with open(args.sortie, "w", encoding="utf-8") as f:
+        json.dump({"resultats": resultats}, f, ensure_ascii=False, indent=2)
+
+    if args.comparer:
+        with open(args.comparer, encoding="utf-8") as f:
+            regressions = comparer(resultats, json.load(f)["resultats"], args.tolerance)
+        for ligne in regressions:
+            print(f"RÉGRESSION {ligne}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
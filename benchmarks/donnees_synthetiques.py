@@ -0,0 +1,78 @@
+"""Générateurs de projets et de conversations synthétiques pour les benchmarks"""
+
+from datetime import datetime, timedelta
+
+from utils.projet import Impact
+
+PHASES = ["Préconstruction", "Construction", "Exploitation/Entretien", "Démantèlement"]
+COMPOSANTES = ["Physique", "Biologique", "Humain"]
+MILIEUX = ["Eau", "Air", "Sol", "Faune", "Flore", "Bruit", "Paysage", "Économie"]
+NATURES = ["négatif", "positif", "risque impact"]
+INTENSITES = ["très forte", "forte", "moyenne", "faible"]
+ETENDUES = ["régionale", "locale", "ponctuelle"]
+DUREES = ["long terme", "moyen terme", "court terme"]
+
+
+def lignes_impacts(activites_par_phase: int, milieux_par_composante: int = 3):
+    """Produit les impacts d'un projet synthétique sous forme de dictionnaires
+
+    Le nombre d'impacts vaut 4 phases × activites_par_phase × 3 composantes × milieux_par_composante.
+    """
+    n = 0
+    for phase in PHASES:
+        for a in range(activites_par_phase):
+            activite = f"Activité {a + 1:04d}"
+            for composante in COMPOSANTES:
+                for m in range(milieux_par_composante):
+                    nature = NATURES[n % len(NATURES)]
+                    intensite = INTENSITES[n % len(INTENSITES)]
+                    etendue = ETENDUES[(n // 4) % len(ETENDUES)]
+                    duree = DUREES[(n // 12) % len(DUREES)]
+                    yield {
+                        "phase": phase,
+                        "activite": activite,
+                        "composante": composante,
+                        "milieu": MILIEUX[m] if m < len(MILIEUX) else f"Milieu {m + 1}",
+                        "nature": nature,
+                        "intensite": intensite,
+                        "etendue": etendue,
+                        "duree": duree,
+                        "impact_apprehende": f"Impact {n} de l'activité {activite}\nsur plusieurs lignes",
+                        "attenuation": f"Mesure d'atténuation {n}" if nature != "positif" else None,
+                    }
+                    n += 1
+
+
+def projet_leopold(projet, activites_par_phase: int, milieux_par_composante: int = 3):
+    """Remplit ``projet`` (utils.projet.Project) avec une hiérarchie synthétique"""
+    for ligne in lignes_impacts(activites_par_phase, milieux_par_composante):
+        activite = projet.add_phase(ligne["phase"]).add_activity(ligne["activite"])
+        activite.upsert_impact(Impact(
+            ligne["composante"], ligne["milieu"], ligne["nature"], ligne["impact_apprehende"],
+            ligne["intensite"], ligne["etendue"], ligne["duree"], ligne["attenuation"],
+        ))
+    return projet
+
+
+QUESTIONS = [
+    "Impact du terrassement sur l'eau et les sols pendant la construction",
+    "Nuisances sonores et vibrations liées au trafic en exploitation",
+    "Mesures pour protéger la faune et la flore lors du défrichement",
+    "Pollution de l'air et poussières sur le chantier",
+    "Aspects économiques et qualité de vie des riverains",
+]
+
+
+def conversation(nb_questions: int):
+    """Historique synthétique alternant questions et longues réponses"""
+    debut = datetime(2024, 1, 1, 8, 0, 0)
+    historique = []
+    for i in range(nb_questions):
+        question = QUESTIONS[i % len(QUESTIONS)]
+        historique.append({'type': 'user', 'contenu': question, 'timestamp': debut + timedelta(minutes=2 * i)})
+        historique.append({
+            'type': 'assistant',
+            'contenu': "\n".join(f"{j}. Réponse synthétique à « {question} »" for j in range(1, 60)),
+            'timestamp': debut + timedelta(minutes=2 * i + 1),
+        })
+    return historique
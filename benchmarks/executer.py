@@ -0,0 +1,276 @@
+"""Suite de benchmarks de démarrage et de rerun pour l'ensemble des applications.
+
+Chaque application est pilotée sans navigateur avec ``streamlit.testing.v1.AppTest`` :
+
+- temps d'import à froid de chaque module, mesuré dans un interpréteur neuf ;
+- temps du premier rendu de ``main.py`` ;
+- durée d'un rerun et pic mémoire par session, sur des projets et des
+  conversations synthétiques de taille croissante ;
+- AI2 s'exécute contre le faux client Earth Engine de ``benchmarks.fake_ee``.
+
+Utilisation (depuis la racine du dépôt) :
+
+    python -m benchmarks.executer --sortie resultats.json
+    python -m benchmarks.executer --rapide --comparer reference.json --tolerance 0.25
+
+Une session qui échoue (exception de l'application, délai AppTest dépassé) est
+enregistrée comme mesure ``erreur`` sans interrompre la suite : le fichier de
+résultats est toujours écrit.
+
+Avec ``--comparer``, le code de sortie vaut 1 si une mesure dépasse la référence
+de plus de la tolérance relative.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RACINE not in sys.path:
+    sys.path.insert(0, RACINE)
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from benchmarks import donnees_synthetiques, fake_ee  # noqa: E402
+
+TAILLES = {
+    "leopold": [5, 25, 100],     # activités par phase (× 4 phases × 3 composantes × 3 milieux)
+    "AI1": [0, 25, 100],         # questions dans l'historique
+    "AI2": [3, 12, 24],          # mois analysés
+}
+TAILLES_RAPIDES = {"leopold": [2, 10], "AI1": [0, 10], "AI2": [3, 6]}
+
+MODULES = [
+    ("leopold", "apps.leopold", False),
+    ("AI1", "apps.AI1", False),
+    ("AI2", "apps.AI2", False),
+    ("AI2", "apps.AI2", True),   # avec ee/geemap factices
+]
+
+DELAI_APPTEST = 120
+
+
+def _enregistrement(app: str, scenario: str, taille, mesure: str, valeur, unite: str) -> Dict:
+    return {"app": app, "scenario": scenario, "taille": taille, "mesure": mesure, "valeur": valeur, "unite": unite}
+
+
+def _sous_processus(code: str) -> float:
+    sortie = subprocess.run([sys.executable, "-c", code], cwd=RACINE, capture_output=True, text=True)
+    if sortie.returncode != 0:
+        raise RuntimeError(sortie.stderr.strip().splitlines()[-1] if sortie.stderr.strip() else "échec")
+    return json.loads(sortie.stdout.strip().splitlines()[-1])
+
+
+def mesurer_imports(repetitions: int) -> List[Dict]:
+    """Temps d'import à froid de chaque module, dans un interpréteur neuf à chaque fois"""
+    resultats = []
+    for app, module, factices in MODULES:
+        scenario = "import_froid_ee_factice" if factices else "import_froid"
+        code = (
+            "import importlib, json, time\n"
+            + ("from benchmarks import fake_ee; fake_ee.installer()\n" if factices else "")
+            + "debut = time.perf_counter()\n"
+            f"importlib.import_module({module!r})\n"
+            "print(json.dumps(time.perf_counter() - debut))\n"
+        )
+        try:
+            durees = [_sous_processus(code) for _ in range(repetitions)]
+            resultats.append(_enregistrement(app, scenario, None, "duree_mediane", statistics.median(durees), "s"))
+        except RuntimeError as e:
+            resultats.append(_enregistrement(app, scenario, None, "erreur", str(e), ""))
+    return resultats
+
+
+def mesurer_premier_rendu(repetitions: int) -> List[Dict]:
+    """Temps jusqu'au premier rendu complet de main.py (application par défaut)"""
+    code = (
+        "import json, time\n"
+        "from streamlit.testing.v1 import AppTest\n"
+        "debut = time.perf_counter()\n"
+        f"at = AppTest.from_file({os.path.join(RACINE, 'main.py')!r}, default_timeout={DELAI_APPTEST}).run()\n"
+        "assert not at.exception, at.exception\n"
+        "print(json.dumps(time.perf_counter() - debut))\n"
+    )
+    try:
+        durees = [_sous_processus(code) for _ in range(repetitions)]
+        return [_enregistrement("main", "premier_rendu", None, "duree_mediane", statistics.median(durees), "s")]
+    except RuntimeError as e:
+        return [_enregistrement("main", "premier_rendu", None, "erreur", str(e), "")]
+
+
+def _verifier(at):
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+
+
+def _session(app: str, taille, creer: Callable, preparer: Callable, nb_reruns: int, memoire: bool) -> List[Dict]:
+    """Exécute une session : préparation, puis reruns chronométrés ; pic mémoire en option"""
+    if not memoire:
+        return _reruns(app, taille, creer, preparer, nb_reruns)
+    tracemalloc.start()
+    try:
+        resultats = _reruns(app, taille, creer, preparer, nb_reruns)
+        _, pic = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    resultats.append(_enregistrement(app, "session", taille, "pic_memoire", pic, "octets"))
+    return resultats
+
+
+def _reruns(app: str, taille, creer: Callable, preparer: Callable, nb_reruns: int) -> List[Dict]:
+    at = creer()
+    at.run()
+    _verifier(at)
+    extra = preparer(at) or []
+    durees = []
+    for _ in range(nb_reruns):
+        debut = time.perf_counter()
+        at.run()
+        durees.append(time.perf_counter() - debut)
+        _verifier(at)
+    resultats = [_enregistrement(app, "rerun", taille, nom, valeur, unite) for nom, valeur, unite in extra]
+    resultats.append(_enregistrement(app, "rerun", taille, "duree_mediane", statistics.median(durees), "s"))
+    resultats.append(_enregistrement(app, "rerun", taille, "duree_max", max(durees), "s"))
+    return resultats
+
+
+def _app(script: str):
+    return lambda: AppTest.from_string(script, default_timeout=DELAI_APPTEST)
+
+
+def session_leopold(activites_par_phase: int, nb_reruns: int, memoire: bool) -> List[Dict]:
+    def preparer(at):
+        donnees_synthetiques.projet_leopold(at.session_state.project, activites_par_phase)
+        debut = time.perf_counter()
+        at.run()
+        _verifier(at)
+        return [("premier_rendu_projet", time.perf_counter() - debut, "s")]
+
+    return _session("leopold", activites_par_phase, _app("from apps import leopold\nleopold.run()\n"),
+                    preparer, nb_reruns, memoire)
+
+
+def session_ai1(nb_questions: int, nb_reruns: int, memoire: bool) -> List[Dict]:
+    def preparer(at):
+        at.session_state.conversation_history = donnees_synthetiques.conversation(nb_questions)
+        at.text_area(key="user_input").input(donnees_synthetiques.QUESTIONS[0])
+        soumettre = next(b for b in at.button if b.label == "🚀 Analyser")
+        debut = time.perf_counter()
+        soumettre.click().run()
+        _verifier(at)
+        return [("soumission_question", time.perf_counter() - debut, "s")]
+
+    return _session("AI1", nb_questions, _app("from apps import AI1\nAI1.run()\n"), preparer, nb_reruns, memoire)
+
+
+def session_ai2(nb_mois: int, nb_reruns: int, memoire: bool) -> List[Dict]:
+    def preparer(at):
+        annee_debut = 2024 - (nb_mois - 1) // 12
+        mois_debut = 12 - (nb_mois - 1) % 12
+        next(n for n in at.number_input if n.label == "Start Year").set_value(annee_debut)
+        next(n for n in at.number_input if n.label == "End Year").set_value(2024)
+        next(s for s in at.selectbox if s.label == "Start Month").set_value(mois_debut)
+        next(s for s in at.selectbox if s.label == "End Month").set_value(12)
+        lancer = next(b for b in at.button if b.label == "🚀 Launch Enhanced Delta VV Analysis")
+        appels_avant = fake_ee.APPELS_GETINFO["total"]
+        debut = time.perf_counter()
+        lancer.click().run()
+        _verifier(at)
+        return [("analyse", time.perf_counter() - debut, "s"),
+                ("appels_getinfo_analyse", fake_ee.APPELS_GETINFO["total"] - appels_avant, "appels")]
+
+    return _session("AI2", nb_mois, _app("from apps import AI2\nAI2.run()\n"), preparer, nb_reruns, memoire)
+
+
+SESSIONS = {"leopold": session_leopold, "AI1": session_ai1, "AI2": session_ai2}
+
+
+def executer_session(app: str, taille, nb_reruns: int, memoire: bool) -> List[Dict]:
+    """Mesures d'une session ; un échec est enregistré comme mesure ``erreur`` sans interrompre la suite"""
+    try:
+        resultats = SESSIONS[app](taille, nb_reruns, memoire)
+    except Exception as e:
+        scenario = "session" if memoire else "rerun"
+        return [_enregistrement(app, scenario, taille, "erreur", f"{type(e).__name__}: {e}", "")]
+    return [r for r in resultats if r["mesure"] == "pic_memoire"] if memoire else resultats
+
+
+def comparer(resultats: List[Dict], reference: List[Dict], tolerance: float) -> List[str]:
+    """Liste les mesures numériques qui se dégradent au-delà de la tolérance relative"""
+    cle = lambda r: (r["app"], r["scenario"], r["taille"], r["mesure"])
+    anciens = {cle(r): r["valeur"] for r in reference if isinstance(r["valeur"], (int, float))}
+    regressions = []
+    for r in resultats:
+        ancien = anciens.get(cle(r))
+        if ancien and isinstance(r["valeur"], (int, float)) and r["valeur"] > ancien * (1 + tolerance):
+            regressions.append(f"{' / '.join(str(c) for c in cle(r))} : {ancien:.4g} → {r['valeur']:.4g} {r['unite']}")
+    return regressions
+
+
+def _commit_git() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RACINE,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sortie", default="bench_resultats.json", help="Fichier JSON de résultats")
+    parser.add_argument("--apps", nargs="*", default=list(SESSIONS), choices=list(SESSIONS))
+    parser.add_argument("--reruns", type=int, default=5, help="Reruns chronométrés par session")
+    parser.add_argument("--repetitions", type=int, default=3, help="Répétitions des mesures à froid")
+    parser.add_argument("--rapide", action="store_true", help="Tailles réduites")
+    parser.add_argument("--sans-memoire", action="store_true", help="Ne pas mesurer le pic mémoire")
+    parser.add_argument("--comparer", help="Fichier de résultats de référence")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    fake_ee.installer()
+    tailles = TAILLES_RAPIDES if args.rapide else TAILLES
+
+    resultats = mesurer_imports(args.repetitions) + mesurer_premier_rendu(args.repetitions)
+    for app in args.apps:
+        for taille in tailles[app]:
+            print(f"… {app} (taille {taille})", file=sys.stderr)
+            resultats += executer_session(app, taille, args.reruns, memoire=False)
+            if not args.sans_memoire:
+                resultats += executer_session(app, taille, 1, memoire=True)
+
+    document = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "commit": _commit_git(),
+            "python": platform.python_version(),
+            "plateforme": platform.platform(),
+            "rapide": args.rapide,
+            "reruns": args.reruns,
+        },
+        "resultats": resultats,
+    }
+    with open(args.sortie, "w", encoding="utf-8") as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+
+    for r in resultats:
+        valeur = f"{r['valeur']:.4f}" if isinstance(r["valeur"], float) else r["valeur"]
+        print(f"{r['app']:<8} {r['scenario']:<24} {str(r['taille']):<6} {r['mesure']:<24} {valeur} {r['unite']}")
+
+    if args.comparer:
+        with open(args.comparer, encoding="utf-8") as f:
+            regressions = comparer(resultats, json.load(f)["resultats"], args.tolerance)
+        for ligne in regressions:
+            print(f"RÉGRESSION {ligne}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
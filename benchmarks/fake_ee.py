@@ -0,0 +1,175 @@
+"""Faux client Google Earth Engine (et carte geemap) pour exécuter AI2 hors ligne.
+
+Seules les opérations utilisées par ``apps.AI2`` sont modélisées ; toute autre
+méthode renvoie l'objet lui-même afin que les chaînes d'appels restent valides.
+Les résultats de ``getInfo`` sont déterministes et chaque appel est compté.
+"""
+
+import random
+import sys
+import types
+from typing import Dict, List
+
+APPELS_GETINFO = {"total": 0}
+
+
+class _Calcul:
+    """Objet calculé générique : méthodes inconnues chaînables, getInfo compté"""
+
+    _valeur = None
+
+    def __getattr__(self, nom):
+        if nom.startswith("_"):
+            raise AttributeError(nom)
+        return lambda *args, **kwargs: self
+
+    def getInfo(self):
+        APPELS_GETINFO["total"] += 1
+        return self._valeur
+
+
+class _Valeur(_Calcul):
+    def __init__(self, valeur):
+        self._valeur = valeur
+
+
+class Number(_Valeur):
+    pass
+
+
+class Dictionary(_Valeur):
+    pass
+
+
+class Date(_Valeur):
+    pass
+
+
+class Filter(_Calcul):
+    @staticmethod
+    def eq(*args, **kwargs):
+        return Filter()
+
+    @staticmethod
+    def listContains(*args, **kwargs):
+        return Filter()
+
+
+class Reducer(_Calcul):
+    def __init__(self, sorties: List[str]):
+        self.sorties = sorties
+
+    @staticmethod
+    def percentile(percentiles):
+        return Reducer([f"p{p}" for p in percentiles])
+
+    @staticmethod
+    def mean():
+        return Reducer(["mean"])
+
+    @staticmethod
+    def stdDev():
+        return Reducer(["stdDev"])
+
+    @staticmethod
+    def minMax():
+        return Reducer(["min", "max"])
+
+    def combine(self, autre, sharedInputs=False):
+        return Reducer(self.sorties + autre.sorties)
+
+
+class Geometry(_Calcul):
+    def __init__(self, coordonnees):
+        self._coordonnees = coordonnees
+
+    @staticmethod
+    def Rectangle(coords):
+        lon_min, lat_min, lon_max, lat_max = coords
+        anneau = [[lon_min, lat_min], [lon_max, lat_min], [lon_max, lat_max], [lon_min, lat_max], [lon_min, lat_min]]
+        return Geometry([anneau])
+
+    def coordinates(self):
+        return _Valeur(self._coordonnees)
+
+
+class Image(_Calcul):
+    def __init__(self, bande: str = "VV", proprietes: Dict = None):
+        self.bande = bande
+        self.proprietes = proprietes or {}
+
+    def rename(self, nom):
+        return Image(nom, self.proprietes)
+
+    def set(self, proprietes):
+        return Image(self.bande, {**self.proprietes, **proprietes})
+
+    def get(self, cle):
+        return Number(self.proprietes.get(cle))
+
+    def copyProperties(self, *args, **kwargs):
+        return self
+
+    def reduceRegion(self, reducer=None, **kwargs):
+        alea = random.Random(self.bande)
+        return Dictionary({f"{self.bande}_{sortie}": alea.uniform(-0.03, 0.03) for sortie in reducer.sorties})
+
+
+class ImageCollection(_Calcul):
+    images_par_mois = 4
+
+    def __init__(self, identifiant):
+        self.identifiant = identifiant
+
+    def size(self):
+        return Number(self.images_par_mois)
+
+    def map(self, fonction):
+        # Exécute le prétraitement une fois pour que son coût Python soit mesuré
+        fonction(Image())
+        return self
+
+    def median(self):
+        return Image()
+
+
+def Initialize(*args, **kwargs):
+    return None
+
+
+class Map:
+    """Carte geemap factice : enregistre les couches sans télécharger de tuiles"""
+
+    def __init__(self, center=None, zoom=None, height=None, **kwargs):
+        self.couches = []
+
+    def add_basemap(self, nom):
+        pass
+
+    def addLayer(self, image, vis_params, nom, visible=True, opacite=1.0):
+        self.couches.append(nom)
+
+    def add_layer_control(self):
+        pass
+
+    def add_legend(self, **kwargs):
+        pass
+
+    def to_streamlit(self, height=None, **kwargs):
+        import streamlit as st
+        st.caption(f"Carte factice : {len(self.couches)} couche(s)")
+
+
+def installer():
+    """Enregistre les modules factices ``ee``, ``geemap`` et ``geemap.foliumap`` dans sys.modules"""
+    ee = types.ModuleType("ee")
+    for nom in ("Number", "Dictionary", "Date", "Filter", "Reducer", "Geometry",
+                "Image", "ImageCollection", "Initialize"):
+        setattr(ee, nom, globals()[nom])
+    foliumap = types.ModuleType("geemap.foliumap")
+    foliumap.Map = Map
+    geemap = types.ModuleType("geemap")
+    geemap.foliumap = foliumap
+    sys.modules["ee"] = ee
+    sys.modules["geemap"] = geemap
+    sys.modules["geemap.foliumap"] = foliumap
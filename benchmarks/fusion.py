@@ -0,0 +1,76 @@
+"""Benchmark de mise à l'échelle du rendu de la matrice (tri, fusion des cellules, HTML).
+
+Mesure ``trier_matrice``, ``calculer_fusion`` et ``tableau_html_fusion`` sur des
+matrices synthétiques de 1 000 à 100 000 impacts et rapporte le coût par ligne :
+un rendu linéaire garde ce coût à peu près constant quand la taille est multipliée par 10.
+
+Utilisation (depuis la racine du dépôt) :
+
+    python -m benchmarks.fusion --sortie fusion.json
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from benchmarks.donnees_synthetiques import projet_leopold
+from benchmarks.executer import _enregistrement, comparer
+from utils.matrice import calculer_fusion, tableau_html_fusion, trier_matrice
+from utils.projet import Project
+
+# projet_leopold produit 36 impacts par unité d'activites_par_phase (4 phases × 3 composantes × 3 milieux)
+TAILLES = [1_000, 10_000, 100_000]
+
+
+def matrice(nb_lignes: int):
+    return projet_leopold(Project(), max(1, round(nb_lignes / 36))).to_dataframe()
+
+
+def _chronometrer(fonction, repetitions: int) -> float:
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        durees.append(time.perf_counter() - debut)
+    return statistics.median(durees)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sortie", default="bench_fusion.json")
+    parser.add_argument("--tailles", nargs="*", type=int, default=TAILLES)
+    parser.add_argument("--repetitions", type=int, default=3)
+    parser.add_argument("--comparer", help="Fichier de résultats de référence")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    resultats = []
+    for taille in args.tailles:
+        df = matrice(taille)
+        trie = trier_matrice(df)
+        mesures = {
+            "tri": _chronometrer(lambda: trier_matrice(df), args.repetitions),
+            "fusion": _chronometrer(lambda: calculer_fusion(trie), args.repetitions),
+            "rendu_html": _chronometrer(lambda: tableau_html_fusion(df), args.repetitions),
+        }
+        for nom, duree in mesures.items():
+            resultats.append(_enregistrement("matrice", nom, len(df), "duree_mediane", duree, "s"))
+            resultats.append(_enregistrement("matrice", nom, len(df), "duree_par_ligne", duree / len(df), "s"))
+            print(f"{nom:<12} {len(df):>8} lignes  {duree:9.4f} s  {1e6 * duree / len(df):7.2f} µs/ligne")
+
+    with open(args.sortie, "w", encoding="utf-8") as f:
+        json.dump({"resultats": resultats}, f, ensure_ascii=False, indent=2)
+
+    if args.comparer:
+        with open(args.comparer, encoding="utf-8") as f:
+            regressions = comparer(resultats, json.load(f)["resultats"], args.tolerance)
+        for ligne in regressions:
+            print(f"RÉGRESSION {ligne}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
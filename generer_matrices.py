@@ -0,0 +1,203 @@
+"""Génération en lot des matrices d'impacts, sans Streamlit.
+
+Chaque projet (matrice CSV/Excel au format de l'export leopold, ou projet d'un
+dépôt SQLite) est relu, son importance réévaluée avec la grille courante, puis
+rendu en HTML et exporté en CSV/Excel. Les projets sont répartis sur plusieurs
+processus.
+
+Utilisation (depuis la racine du dépôt) :
+
+    python generer_matrices.py projets/*.csv --sortie matrices
+    python generer_matrices.py projets/ --formats HTML Excel --processus 8
+    python generer_matrices.py --depot projets_leopold.sqlite --sortie matrices
+    python generer_matrices.py projets/ --grille grilles/regulateur.json
+
+Un répertoire passé en argument est parcouru à la recherche de fichiers .csv,
+.xlsx et .xlsm. Avec ``--grille``, l'importance est réévaluée avec la grille lue
+dans ce fichier (voir utils/grilles.py) au lieu de la grille du projet. Le code de
+sortie vaut 1 si au moins un projet a échoué.
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+RACINE = os.path.dirname(os.path.abspath(__file__))
+if RACINE not in sys.path:
+    sys.path.insert(0, RACINE)
+
+from utils.export_matrice import FORMATS_EXPORT, ecrire_html  # noqa: E402
+
+EXTENSIONS = (".csv", ".xlsx", ".xlsm")
+FORMATS_PAR_DEFAUT = ["HTML", "CSV", "Excel"]
+DEBUT_HTML = '<!DOCTYPE html>\n<html lang="fr">\n<head><meta charset="utf-8"><title>{titre}</title></head>\n<body>\n'
+FIN_HTML = "\n</body>\n</html>\n"
+
+# Travail élémentaire : (fichier ou dépôt, nom du projet dans le dépôt ou None, nom de sortie)
+Tache = Tuple[str, Optional[str], str]
+
+
+def _nom_sortie(nom: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", nom).strip("._") or "projet"
+
+
+def lister_taches(chemins: List[str], depot: Optional[str] = None, projets: Optional[List[str]] = None) -> List[Tache]:
+    """Construit la liste des projets à générer, avec des noms de sortie uniques"""
+    sources: List[Tuple[str, Optional[str], str]] = []
+    for chemin in chemins:
+        if os.path.isdir(chemin):
+            for racine, _, fichiers in os.walk(chemin):
+                for fichier in sorted(fichiers):
+                    if fichier.lower().endswith(EXTENSIONS):
+                        sources.append((os.path.join(racine, fichier), None, os.path.splitext(fichier)[0]))
+        else:
+            sources.append((chemin, None, os.path.splitext(os.path.basename(chemin))[0]))
+    if depot:
+        from utils.depot import DepotProjets
+
+        base = DepotProjets(depot)
+        try:
+            noms = projets or base.lister()
+        finally:
+            base.fermer()
+        sources.extend((depot, nom, nom) for nom in noms)
+
+    taches, utilises = [], set()
+    for source, projet, nom in sources:
+        nom = candidat = _nom_sortie(nom)
+        suffixe = 2
+        while candidat in utilises:
+            candidat = f"{nom}_{suffixe}"
+            suffixe += 1
+        utilises.add(candidat)
+        taches.append((source, projet, candidat))
+    return taches
+
+
+def _charger(source: str, projet: Optional[str], sep: str, grille=None):
+    """Retourne (DataFrame de la matrice, nombre de lignes rejetées)"""
+    if projet is None:
+        from utils.import_matrice import importer_matrice
+        from utils.projet import Project
+
+        # L'importance est recalculée à l'import depuis les colonnes Intensité/Étendue/Durée
+        project, rapport = importer_matrice(source, Project(grille) if grille else None, sep=sep)
+        return project.to_dataframe(), len(rapport.erreurs)
+
+    from utils.depot import DepotProjets
+
+    depot = DepotProjets(source)
+    try:
+        if projet not in depot.lister():
+            raise ValueError(f"Projet « {projet} » absent du dépôt")
+        project = depot.ouvrir(projet)
+        if grille is not None:
+            project.grille = grille
+        project.recompute_importance()
+        return project.to_dataframe(), 0
+    finally:
+        depot.fermer()
+
+
+def generer(tache: Tache, sortie: str, formats: List[str], sep: str = ";", grille=None) -> Dict[str, object]:
+    """Génère les fichiers d'un projet ; exécuté dans un processus du pool"""
+    source, projet, nom = tache
+    debut = time.perf_counter()
+    resultat = {"source": source, "projet": projet, "nom": nom, "fichiers": [], "erreur": None}
+    try:
+        df, rejets = _charger(source, projet, sep, grille)
+        resultat.update(impacts=len(df), rejets=rejets)
+        if df.empty:
+            raise ValueError("Aucun impact")
+        for format_export in formats:
+            ecrire, nom_fichier, _ = FORMATS_EXPORT[format_export]
+            chemin = os.path.join(sortie, nom + os.path.splitext(nom_fichier)[1])
+            with open(chemin, "wb") as fichier:
+                if format_export == "HTML":
+                    fichier.write(DEBUT_HTML.format(titre=nom).encode("utf-8"))
+                    ecrire_html(df, fichier)
+                    fichier.write(FIN_HTML.encode("utf-8"))
+                else:
+                    ecrire(df, fichier)
+            resultat["fichiers"].append(chemin)
+    except Exception as e:  # un projet invalide ne doit pas interrompre le lot
+        resultat["erreur"] = f"{type(e).__name__}: {e}"
+    resultat["duree"] = time.perf_counter() - debut
+    return resultat
+
+
+def generer_lot(taches: List[Tache], sortie: str, formats: List[str], processus: Optional[int] = None,
+                sep: str = ";", rapporter=None, grille=None) -> List[Dict[str, object]]:
+    """Génère tous les projets, en parallèle sur ``processus`` processus (1 : dans le processus courant)"""
+    os.makedirs(sortie, exist_ok=True)
+    processus = processus or os.cpu_count() or 1
+    resultats = []
+    if processus == 1 or len(taches) <= 1:
+        for tache in taches:
+            resultats.append(generer(tache, sortie, formats, sep, grille))
+            if rapporter:
+                rapporter(resultats[-1])
+        return resultats
+
+    with ProcessPoolExecutor(max_workers=min(processus, len(taches))) as pool:
+        futures = [pool.submit(generer, tache, sortie, formats, sep, grille) for tache in taches]
+        for future in as_completed(futures):
+            resultats.append(future.result())
+            if rapporter:
+                rapporter(resultats[-1])
+    # Résultats dans l'ordre des arguments, quel que soit l'ordre de fin
+    ordre = {tache[2]: i for i, tache in enumerate(taches)}
+    return sorted(resultats, key=lambda r: ordre[r["nom"]])
+
+
+def _afficher(resultat):
+    libelle = resultat["source"] if resultat["projet"] is None else f"{resultat['source']}:{resultat['projet']}"
+    if resultat["erreur"]:
+        print(f"✗ {libelle} — {resultat['erreur']}", file=sys.stderr)
+    else:
+        rejets = f", {resultat['rejets']} ligne(s) rejetée(s)" if resultat["rejets"] else ""
+        print(f"✓ {libelle} — {resultat['impacts']} impacts{rejets}, {resultat['duree']:.2f} s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère en lot les matrices d'impacts (HTML, CSV, Excel).")
+    parser.add_argument("chemins", nargs="*", help="Matrices CSV/Excel ou répertoires à parcourir")
+    parser.add_argument("--depot", help="Dépôt SQLite de projets leopold")
+    parser.add_argument("--projets", nargs="+", help="Projets du dépôt à générer (tous par défaut)")
+    parser.add_argument("--sortie", default="matrices", help="Répertoire des fichiers générés")
+    parser.add_argument("--formats", nargs="+", choices=list(FORMATS_EXPORT), default=FORMATS_PAR_DEFAUT)
+    parser.add_argument("--processus", type=int, default=None, help="Nombre de processus (défaut : nombre de cœurs)")
+    parser.add_argument("--sep", default=";", help="Séparateur des fichiers CSV lus")
+    parser.add_argument("--grille", help="Grille d'importance à appliquer (CSV ou JSON)")
+    args = parser.parse_args(argv)
+
+    if not args.chemins and not args.depot:
+        parser.error("indiquer au moins un fichier, un répertoire ou --depot")
+    grille = None
+    if args.grille:
+        from utils.grilles import lire_grille
+
+        try:
+            grille = lire_grille(args.grille)
+        except (ValueError, OSError) as e:
+            parser.error(str(e))
+
+    taches = lister_taches(args.chemins, args.depot, args.projets)
+    if not taches:
+        print("Aucun projet à générer.", file=sys.stderr)
+        return 1
+    debut = time.perf_counter()
+    resultats = generer_lot(taches, args.sortie, args.formats, args.processus, args.sep,
+                            rapporter=_afficher, grille=grille)
+    echecs = sum(1 for r in resultats if r["erreur"])
+    print(f"{len(resultats) - echecs}/{len(resultats)} projet(s) générés dans {args.sortie} "
+          f"en {time.perf_counter() - debut:.1f} s")
+    return 1 if echecs else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
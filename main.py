@@ -1,43 +1,134 @@
-import streamlit as st
-from apps import leopold, AI1, AI2
-
-# Configuration
-st.set_page_config(
-    page_title="Suite d'Applications Environnementales", 
-    page_icon="🌍",
-    layout="wide"
-)
-
-APPLICATIONS = {
-    "🌍 Générateur de Matrice": {
-        "module": leopold,
-        "description": "Générateur de matrice d'impact environnemental"
-    },
-    "🛣️ Assistant IA - Évaluation Environnementale Autoroutière": {
-        "module": AI1,
-        "description": "IA pour impacts et mesures d'atténuation"
-    },
-    "🛰️ Monitoring Télédétection": {
-        "module": AI2,
-        "description": "Analyse satellite avec Sentinel-1 et GEEMAP"
-    }
-}
-
-# Navigation sidebar
-st.sidebar.title("🌍 Navigation")
-st.sidebar.markdown("---")
-
-selected_app = st.sidebar.selectbox(
-    "Choisir une application:",
-    list(APPLICATIONS.keys())
-)
-
-# Affichage sécurisé
-if selected_app in APPLICATIONS:
-    st.sidebar.info(APPLICATIONS[selected_app]["description"])
-    st.sidebar.markdown("---")
-    
-    # CORRECTION : Accéder au module via la clé "module"
-    APPLICATIONS[selected_app]["module"].run()
-
-    #                         ^^^^^^^^^^
+import importlib
+import uuid
+from importlib.metadata import entry_points
+
+import streamlit as st
+
+from utils import diagnostics
+
+# Configuration
+st.set_page_config(
+    page_title="Suite d'Applications Environnementales",
+    page_icon="🌍",
+    layout="wide"
+)
+
+# Les modules sont référencés par leur chemin et importés à la première sélection :
+# ouvrir le générateur de matrice ne charge ni ee, ni geemap, ni plotly.
+APPLICATIONS = {
+    "🌍 Générateur de Matrice": {
+        "module": "apps.leopold",
+        "description": "Générateur de matrice d'impact environnemental"
+    },
+    "🛣️ Assistant IA - Évaluation Environnementale Autoroutière": {
+        "module": "apps.AI1",
+        "description": "IA pour impacts et mesures d'atténuation"
+    },
+    "🛰️ Monitoring Télédétection": {
+        "module": "apps.AI2",
+        "description": "Analyse satellite avec Sentinel-1 et GEEMAP"
+    }
+}
+
+# Groupe d'entry points permettant à un paquet installé d'ajouter une application,
+# par exemple dans son pyproject.toml :
+#   [project.entry-points."suite_environnementale.apps"]
+#   "🚆 Matrice ferroviaire" = "mon_paquet.ferroviaire"
+PLUGIN_GROUP = "suite_environnementale.apps"
+
+
+@st.cache_resource
+def decouvrir_plugins():
+    """Lit les entry points déclarés sans importer les modules correspondants"""
+    plugins = {}
+    for ep in entry_points(group=PLUGIN_GROUP):
+        plugins[ep.name] = {
+            "module": ep.module,
+            "attribut": ep.attr or "run",
+            "description": f"Application externe ({ep.dist.name if ep.dist else ep.module})"
+        }
+    return plugins
+
+
+def charger_application(app):
+    """Importe le module de l'application (une seule fois par processus) et retourne son point d'entrée"""
+    module = importlib.import_module(app["module"])
+    return getattr(module, app.get("attribut", "run"))
+
+
+def diagnostics_demandes():
+    """Le panneau de diagnostics n'apparaît qu'avec ?diagnostics=1 dans l'URL"""
+    if hasattr(st, "query_params"):
+        return st.query_params.get("diagnostics") == "1"
+    return st.experimental_get_query_params().get("diagnostics") == ["1"]
+
+
+def afficher_diagnostics(ligne, historique):
+    """Panneau de la sidebar : mesures du rerun courant et cumul de la session"""
+    import pandas as pd
+
+    with st.sidebar.expander("🩺 Diagnostics", expanded=False):
+        st.caption(f"Session {ligne['session']} · rerun n°{ligne['rerun']} · {1000 * ligne['duree']:.0f} ms")
+        cumul = {}
+        for rerun in historique:
+            for nom, mesure in rerun["mesures"].items():
+                total = cumul.setdefault(nom, {"appels": 0, "total": 0.0, "max": 0.0})
+                total["appels"] += mesure["appels"]
+                total["total"] += mesure["total"]
+                total["max"] = max(total["max"], mesure["max"])
+        for titre, mesures in (("Ce rerun", ligne["mesures"]), (f"Session ({len(historique)} reruns)", cumul)):
+            st.markdown(f"**{titre}**")
+            st.dataframe(pd.DataFrame(
+                [{"Mesure": nom, "Appels": m["appels"], "Total (ms)": round(1000 * m["total"], 1),
+                  "Max (ms)": round(1000 * m["max"], 1)} for nom, m in sorted(mesures.items())],
+                columns=["Mesure", "Appels", "Total (ms)", "Max (ms)"]
+            ), hide_index=True, use_container_width=True)
+        statistiques = diagnostics.caches()
+        if statistiques:
+            st.markdown("**Caches du processus**")
+            st.dataframe(pd.DataFrame(
+                [{"Cache": nom, "Succès": s["succes"], "Échecs": s["echecs"], "Évictions": s["evictions"],
+                  "Entrées": f"{s['entrees']}/{s['capacite']}",
+                  "Taux de succès": f"{s['succes'] / max(1, s['succes'] + s['echecs']):.0%}"}
+                 for nom, s in sorted(statistiques.items())]
+            ), hide_index=True, use_container_width=True)
+        st.markdown("**Durée des derniers reruns (ms)**")
+        st.bar_chart(pd.Series([1000 * r["duree"] for r in historique], index=[r["rerun"] for r in historique]))
+
+
+applications = {**APPLICATIONS}
+for nom, app in decouvrir_plugins().items():
+    applications.setdefault(nom, app)
+
+# Navigation sidebar
+st.sidebar.title("🌍 Navigation")
+st.sidebar.markdown("---")
+
+selected_app = st.sidebar.selectbox(
+    "Choisir une application:",
+    list(applications.keys())
+)
+
+# Affichage sécurisé
+if selected_app in applications:
+    st.sidebar.info(applications[selected_app]["description"])
+    st.sidebar.markdown("---")
+
+    # Chaque rerun est chronométré et journalisé ; les reruns limités à un fragment ne passent pas ici
+    if "diagnostics_session" not in st.session_state:
+        st.session_state.diagnostics_session = uuid.uuid4().hex[:12]
+        st.session_state.diagnostics_reruns = 0
+        st.session_state.diagnostics_historique = []
+    st.session_state.diagnostics_reruns += 1
+    rerun = diagnostics.demarrer_rerun(
+        st.session_state.diagnostics_session, st.session_state.diagnostics_reruns, selected_app
+    )
+    try:
+        with diagnostics.chronometre("main.dispatch"):
+            charger_application(applications[selected_app])()
+    finally:
+        ligne = diagnostics.terminer_rerun(rerun)
+        st.session_state.diagnostics_historique = (st.session_state.diagnostics_historique + [ligne])[-50:]
+
+    if diagnostics_demandes():
+        afficher_diagnostics(ligne, st.session_state.diagnostics_historique)
@@ -0,0 +1,67 @@
+# test_import_matrice.py
+# Aller-retour export → import de la matrice de leopold, et fichiers illisibles.
+#
+#     python -m pytest -q tests
+
+import io
+
+import pytest
+
+from benchmarks.donnees_synthetiques import projet_leopold
+from utils.export_matrice import exporter
+from utils.import_matrice import COLONNES_GRILLE, importer_matrice
+from utils.matrice import trier_matrice
+from utils.projet import Project
+
+
+def _fichier(contenu: bytes, nom: str) -> io.BytesIO:
+    fichier = io.BytesIO(contenu)
+    fichier.name = nom
+    return fichier
+
+
+@pytest.fixture(scope="module")
+def matrice():
+    df = projet_leopold(Project(), 3).to_dataframe()
+    # Comme dans l'éditeur, un risque d'impact n'est pas évalué sur la grille
+    df.loc[df["Nature impact"] == "risque impact", COLONNES_GRILLE] = None
+    return df
+
+
+# L'export Excel ne garde pas la grille : l'importance y est reprise telle quelle
+@pytest.mark.parametrize("format_export, nom, grille", [
+    ("CSV", "matrice.csv", COLONNES_GRILLE),
+    ("Excel", "matrice.xlsx", ()),
+])
+def test_aller_retour(matrice, format_export, nom, grille):
+    projet, rapport = importer_matrice(_fichier(exporter(matrice, format_export), nom))
+
+    assert rapport.erreurs == []
+    assert rapport.impacts == len(matrice)
+    attendue = trier_matrice(matrice, grille).fillna("")
+    assert trier_matrice(projet.to_dataframe(), grille).fillna("").equals(attendue)
+
+
+@pytest.mark.parametrize("contenu, nom", [
+    (b"PK\x03\x04tronque", "matrice.xlsx"),
+    (b"pas un classeur", "matrice.xlsx"),
+    (b"\xff\xfe\x00", "matrice.csv"),
+])
+def test_fichier_illisible(contenu, nom):
+    with pytest.raises(ValueError):
+        importer_matrice(_fichier(contenu, nom))
+
+
+def test_echec_en_cours_de_lecture_sans_import_partiel():
+    # Dernière ligne illisible (un champ de trop), au-delà du tampon de lecture du premier bloc
+    lignes = exporter(projet_leopold(Project(), 20).to_dataframe(), "CSV").decode("utf-8-sig").splitlines()
+    contenu = "\n".join(lignes[:-1] + [lignes[-1] + ";en trop"])
+    projet = Project()
+    with pytest.raises(ValueError):
+        importer_matrice(_fichier(contenu.encode("utf-8"), "matrice.csv"), projet, taille_bloc=100)
+    assert projet.to_dataframe().empty
+
+
+def test_classeur_xls_refuse():
+    with pytest.raises(ValueError, match="xlsx"):
+        importer_matrice(_fichier(b"", "matrice.xls"))
@@ -0,0 +1,447 @@
+# connaissances.py
+# Base de connaissances de l'assistant AI1 (apps/AI1.py) : composantes environnementales,
+# impacts types par type de projet et mesures d'atténuation, mots-clés de détection.
+#
+# Les données sont des fichiers JSON lines, un par domaine (connaissances/autoroute.jsonl,
+# puis rail, ports, carrières...) : une ligne par composante puis une ligne par impact.
+# Chaque fichier est compilé une fois en base SQLite indexée par thématique, milieu,
+# période et nature (fichier .sqlite voisin, recompilé quand le JSONL change). À
+# l'ouverture, seules les clés des composantes sont lues ; une composante est chargée
+# à son premier accès, si bien que le démarrage ne dépend pas de la taille de la base.
+#
+# La base d'un domaine est ouverte une seule fois par processus (base_connaissances) et
+# partagée par toutes les sessions : ses objets sont immuables (collections en tuples et
+# MappingProxyType, affectation d'attribut refusée). L'état d'une session se limite
+# à sa conversation.
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from collections.abc import Mapping
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from utils.detection import DetecteurMotsCles
+
+REPERTOIRE_CONNAISSANCES = os.environ.get(
+    "SUITE_CONNAISSANCES", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "connaissances")
+)
+DOMAINE_PAR_DEFAUT = "autoroute"
+NATURES = ("Positif", "Négatif", "Risque")
+MILIEUX = ("PHYSIQUE", "BIOLOGIQUE", "HUMAIN")
+# « Construction/Démantèlement » : l'impact concerne les deux périodes
+SEPARATEUR_PERIODES = "/"
+# Incrémentée à chaque changement de SCHEMA : les bases compilées plus anciennes sont refaites
+VERSION_SCHEMA = 1
+
+SCHEMA = f"""
+PRAGMA user_version = {VERSION_SCHEMA};
+CREATE TABLE source (taille INTEGER NOT NULL, modifie INTEGER NOT NULL);
+CREATE TABLE composantes (
+    id INTEGER PRIMARY KEY,
+    cle TEXT NOT NULL UNIQUE,
+    nom TEXT NOT NULL,
+    milieu TEXT NOT NULL
+);
+CREATE TABLE thematiques (
+    thematique TEXT NOT NULL,
+    composante_id INTEGER NOT NULL REFERENCES composantes(id),
+    PRIMARY KEY (thematique, composante_id)
+) WITHOUT ROWID;
+CREATE TABLE impacts (
+    id INTEGER PRIMARY KEY,
+    composante_id INTEGER NOT NULL REFERENCES composantes(id),
+    rang INTEGER NOT NULL,
+    nom TEXT NOT NULL,
+    description TEXT NOT NULL,
+    nature TEXT NOT NULL,
+    periode TEXT NOT NULL,
+    mesures TEXT NOT NULL
+);
+CREATE TABLE periodes_impacts (
+    periode TEXT NOT NULL,
+    impact_id INTEGER NOT NULL REFERENCES impacts(id),
+    PRIMARY KEY (periode, impact_id)
+) WITHOUT ROWID;
+CREATE INDEX idx_composantes_milieu ON composantes (milieu);
+CREATE INDEX idx_impacts_composante ON impacts (composante_id, rang);
+CREATE INDEX idx_impacts_nature ON impacts (nature, composante_id);
+"""
+
+MOTS_CLES_THEMATIQUES = {
+    "air": ["air", "poussière", "émission", "gaz", "co2", "odeur", "volatil", "pollution atmosphérique", "particules"],
+    "eau": ["eau", "nappe", "oued", "cours d'eau", "ruissellement", "assainissement", "pollution hydrique", "hydrocarbure"],
+    "sol": ["sol", "terrain", "topographie", "terrassement", "érosion", "contamination", "déblai", "remblai"],
+    "bruit": ["bruit", "sonore", "vibration", "nuisance", "décibel", "acoustique"],
+    "faune_flore": ["faune", "flore", "biodiversité", "habitat", "écosystème", "espèce", "végétation"],
+    "paysage": ["paysage", "visuel", "esthétique", "intégration paysagère"],
+    "construction": ["construction", "chantier", "travaux", "terrassement", "défrichement"],
+    "exploitation": ["exploitation", "trafic", "circulation", "maintenance", "entretien"],
+    "démantèlement": ["démantèlement", "démolition", "remise en état"]
+}
+MOTS_CLES_PERIODES = {
+    "Construction": ["construction", "chantier", "travaux", "terrassement"],
+    "Exploitation": ["exploitation", "fonctionnement", "circulation", "trafic"],
+    "Démantèlement": ["démantèlement", "démolition", "remise en état"],
+}
+PERIODES_PAR_DEFAUT = ["Construction", "Exploitation"]
+
+# Thématiques et périodes reconnues en un seul passage sur le texte, compilé une fois par processus
+DETECTEUR = DetecteurMotsCles({
+    **{("thematique", thematique): mots for thematique, mots in MOTS_CLES_THEMATIQUES.items()},
+    **{("periode", periode): mots for periode, mots in MOTS_CLES_PERIODES.items()},
+})
+
+
+def _periodes(periode: str) -> List[str]:
+    """Périodes d'un impact, en minuscules (clés des index par période)"""
+    return [p.strip().lower() for p in periode.split(SEPARATEUR_PERIODES) if p.strip()]
+
+
+class _LectureSeule:
+    """Objets partagés entre sessions : attributs fixés une fois pour toutes à la construction"""
+
+    __slots__ = ()
+
+    def _fixer(self, **attributs):
+        for nom, valeur in attributs.items():
+            object.__setattr__(self, nom, valeur)
+
+    def __setattr__(self, nom, valeur):
+        raise AttributeError(f"{type(self).__name__} est partagé en lecture seule")
+
+    def __delattr__(self, nom):
+        raise AttributeError(f"{type(self).__name__} est partagé en lecture seule")
+
+
+class ImpactEnvironnemental(_LectureSeule):
+    """Classe représentant un impact environnemental avec ses mesures d'atténuation"""
+    
+    __slots__ = ("nom", "description", "nature", "mesures", "periode")
+    
+    def __init__(self, nom: str, description: str, nature: str, mesures: Sequence[str], periode: str = ""):
+        self._fixer(
+            nom=nom,
+            description=description,
+            nature=nature,  # Positif, Négatif, Risque
+            mesures=tuple(mesures),
+            periode=periode,
+        )
+    
+    def to_dict(self) -> Dict:
+        return {
+            "nom": self.nom,
+            "description": self.description,
+            "nature": self.nature,
+            "mesures": list(self.mesures),
+            "periode": self.periode
+        }
+
+
+class ComposanteEnvironnementale(_LectureSeule):
+    """Classe représentant une composante environnementale (Air, Eau, Sol, etc.)"""
+    
+    __slots__ = ("nom", "milieu", "impacts", "_index")
+    
+    def __init__(self, nom: str, milieu: str, impacts: Sequence[ImpactEnvironnemental]):
+        impacts = tuple(impacts)
+        # Index inversé (période, nature) -> rangs croissants des impacts dans ``impacts``,
+        # période ou nature None pour « toutes » ; les périodes sont en minuscules
+        index: Dict[Tuple[Optional[str], Optional[str]], List[int]] = {}
+        for rang, impact in enumerate(impacts):
+            for periode in [None] + _periodes(impact.periode):
+                for nature in (None, impact.nature):
+                    rangs = index.setdefault((periode, nature), [])
+                    if not rangs or rangs[-1] != rang:
+                        rangs.append(rang)
+        self._fixer(
+            nom=nom,
+            milieu=milieu,  # PHYSIQUE, BIOLOGIQUE, HUMAIN
+            impacts=impacts,
+            _index=MappingProxyType({cle: tuple(rangs) for cle, rangs in index.items()}),
+        )
+    
+    def get_impacts(self, periodes: Optional[Iterable[str]] = None,
+                    natures: Optional[Iterable[str]] = None) -> List[ImpactEnvironnemental]:
+        """Impacts de l'une des périodes et de l'une des natures (None : toutes), sans doublon
+
+        Réunion des listes de l'index : les impacts sont rendus période par période,
+        dans l'ordre des périodes demandées, puis dans l'ordre de la composante.
+        """
+        periodes = [None] if periodes is None else [periode.lower() for periode in periodes]
+        natures = [None] if natures is None else list(natures)
+        retenus: Dict[int, None] = {}
+        for periode in periodes:
+            if len(natures) == 1:
+                retenus.update(dict.fromkeys(self._index.get((periode, natures[0]), ())))
+            else:
+                retenus.update(dict.fromkeys(sorted(set().union(
+                    *(self._index.get((periode, nature), ()) for nature in natures)))))
+        return [self.impacts[rang] for rang in retenus]
+    
+    def get_impacts_par_nature(self, nature: str) -> List[ImpactEnvironnemental]:
+        """Retourne les impacts d'une nature donnée (Positif, Négatif, Risque)"""
+        return self.get_impacts(natures=[nature])
+    
+    def get_impacts_par_periode(self, periode: str) -> List[ImpactEnvironnemental]:
+        """Retourne les impacts d'une période donnée (Construction, Exploitation, Démantèlement)"""
+        return self.get_impacts(periodes=[periode])
+
+
+def lire_jsonl(chemin) -> Iterator[dict]:
+    """Enregistrements validés d'un fichier de connaissances ; ValueError (fichier, ligne) sinon
+
+    Une composante (``{"type": "composante", "cle", "nom", "milieu"}``, avec
+    éventuellement ``"thematiques"``, par défaut ``[cle]``) précède ses impacts
+    (``{"type": "impact", "composante", "nom", "description", "nature", "periode",
+    "mesures"}``).
+    """
+    nom_fichier = os.path.basename(str(chemin))
+    cles = set()
+    with open(chemin, encoding="utf-8") as f:
+        for numero, ligne in enumerate(f, start=1):
+            if not ligne.strip():
+                continue
+            try:
+                enregistrement = json.loads(ligne)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{nom_fichier}, ligne {numero} : JSON invalide ({e})") from e
+            genre = enregistrement.get("type") if isinstance(enregistrement, dict) else None
+            if genre == "composante":
+                attendus, erreur = ("cle", "nom", "milieu"), None
+                if enregistrement.get("milieu") not in MILIEUX:
+                    erreur = f"milieu inconnu : {enregistrement.get('milieu')!r}"
+                elif enregistrement.get("cle") in cles:
+                    erreur = f"composante « {enregistrement['cle']} » déjà définie"
+            elif genre == "impact":
+                attendus, erreur = ("composante", "nom", "description", "nature", "periode", "mesures"), None
+                if enregistrement.get("nature") not in NATURES:
+                    erreur = f"nature inconnue : {enregistrement.get('nature')!r}"
+                elif enregistrement.get("composante") not in cles:
+                    erreur = f"composante « {enregistrement.get('composante')} » non déclarée avant l'impact"
+                elif not isinstance(enregistrement.get("mesures"), list):
+                    erreur = "mesures : liste attendue"
+            else:
+                raise ValueError(f"{nom_fichier}, ligne {numero} : type attendu « composante » ou « impact »")
+            manquants = [champ for champ in attendus if not isinstance(enregistrement.get(champ), (str, list))]
+            if manquants:
+                erreur = f"champ(s) absent(s) : {', '.join(manquants)}"
+            if erreur:
+                raise ValueError(f"{nom_fichier}, ligne {numero} : {erreur}")
+            if genre == "composante":
+                cles.add(enregistrement["cle"])
+            yield enregistrement
+
+
+def _signature(chemin) -> Tuple[int, int]:
+    etat = os.stat(chemin)
+    return etat.st_size, etat.st_mtime_ns
+
+
+def _remplir(connexion: sqlite3.Connection, source) -> None:
+    """Compile le fichier ``source`` dans une base vide"""
+    connexion.executescript(SCHEMA)
+    connexion.execute("INSERT INTO source VALUES (?, ?)", _signature(source))
+    ids: Dict[str, int] = {}
+    rangs: Dict[str, int] = {}
+    for enregistrement in lire_jsonl(source):
+        if enregistrement["type"] == "composante":
+            cle = enregistrement["cle"]
+            ids[cle] = connexion.execute(
+                "INSERT INTO composantes (cle, nom, milieu) VALUES (?, ?, ?)",
+                (cle, enregistrement["nom"], enregistrement["milieu"])).lastrowid
+            rangs[cle] = 0
+            connexion.executemany("INSERT OR IGNORE INTO thematiques VALUES (?, ?)",
+                                  [(t, ids[cle]) for t in enregistrement.get("thematiques", [cle])])
+        else:
+            cle = enregistrement["composante"]
+            impact_id = connexion.execute(
+                "INSERT INTO impacts (composante_id, rang, nom, description, nature, periode, mesures)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (ids[cle], rangs[cle], enregistrement["nom"], enregistrement["description"],
+                 enregistrement["nature"], enregistrement["periode"],
+                 json.dumps(enregistrement["mesures"], ensure_ascii=False))).lastrowid
+            rangs[cle] += 1
+            connexion.executemany("INSERT OR IGNORE INTO periodes_impacts VALUES (?, ?)",
+                                  [(p, impact_id) for p in _periodes(enregistrement["periode"])])
+    connexion.commit()
+
+
+def _a_jour(chemin_base, source) -> bool:
+    if not os.path.exists(chemin_base):
+        return False
+    try:
+        connexion = sqlite3.connect(chemin_base)
+        try:
+            version = connexion.execute("PRAGMA user_version").fetchone()[0]
+            signature = connexion.execute("SELECT taille, modifie FROM source").fetchone()
+        finally:
+            connexion.close()
+    except sqlite3.DatabaseError:
+        return False
+    return version == VERSION_SCHEMA and signature == _signature(source)
+
+
+def compiler_base(source, chemin_base) -> None:
+    """Compile le fichier JSONL ``source`` en base SQLite ``chemin_base`` (remplacée d'un coup)"""
+    descripteur, temporaire = tempfile.mkstemp(suffix=".sqlite", dir=os.path.dirname(os.path.abspath(chemin_base)))
+    os.close(descripteur)
+    try:
+        connexion = sqlite3.connect(temporaire)
+        try:
+            _remplir(connexion, source)
+        finally:
+            connexion.close()
+        os.replace(temporaire, chemin_base)
+    except BaseException:
+        if os.path.exists(temporaire):
+            os.remove(temporaire)
+        raise
+
+
+def ouvrir_base(source) -> sqlite3.Connection:
+    """Connexion en lecture seule à la base compilée de ``source``, compilée si besoin
+
+    Si le répertoire n'est pas accessible en écriture, la base est compilée en mémoire.
+    """
+    chemin_base = os.path.splitext(source)[0] + ".sqlite"
+    try:
+        if not _a_jour(chemin_base, source):
+            compiler_base(source, chemin_base)
+        return sqlite3.connect(Path(chemin_base).resolve().as_uri() + "?mode=ro", uri=True, check_same_thread=False)
+    except (OSError, sqlite3.OperationalError):
+        connexion = sqlite3.connect(":memory:", check_same_thread=False)
+        _remplir(connexion, source)
+        return connexion
+
+
+class _ComposantesParesseuses(Mapping):
+    """Composantes par clé, lues en base à leur premier accès puis conservées"""
+
+    __slots__ = ("_base", "_ids", "_chargees")
+
+    def __init__(self, base: "BaseConnaissances", ids: Dict[str, int]):
+        self._base = base
+        self._ids = ids
+        self._chargees: Dict[str, ComposanteEnvironnementale] = {}
+
+    def __getitem__(self, cle: str) -> ComposanteEnvironnementale:
+        composante = self._chargees.get(cle)
+        if composante is None:
+            composante_id = self._ids[cle]
+            # Deux sessions peuvent charger la même composante : la première conservée l'emporte
+            composante = self._chargees.setdefault(cle, self._base._charger_composante(composante_id))
+        return composante
+
+    def __contains__(self, cle) -> bool:
+        return cle in self._ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def chargees(self) -> int:
+        """Nombre de composantes déjà chargées en mémoire"""
+        return len(self._chargees)
+
+
+class BaseConnaissances(_LectureSeule):
+    """Base de connaissances d'un domaine (partagée en lecture seule), composantes chargées à la demande"""
+
+    __slots__ = ("domaine", "composantes", "mots_cles", "_connexion", "_verrou")
+
+    def __init__(self, domaine: str = DOMAINE_PAR_DEFAUT, repertoire: str = REPERTOIRE_CONNAISSANCES):
+        connexion = ouvrir_base(os.path.join(repertoire, f"{domaine}.jsonl"))
+        ids = dict(connexion.execute("SELECT cle, id FROM composantes ORDER BY id"))
+        self._fixer(
+            domaine=domaine,
+            _connexion=connexion,
+            _verrou=threading.Lock(),
+            composantes=_ComposantesParesseuses(self, ids),
+            mots_cles=MappingProxyType({thematique: tuple(mots) for thematique, mots in MOTS_CLES_THEMATIQUES.items()}),
+        )
+
+    def _lire(self, requete, parametres=()):
+        with self._verrou:
+            return self._connexion.execute(requete, parametres).fetchall()
+
+    def _charger_composante(self, composante_id: int) -> ComposanteEnvironnementale:
+        (nom, milieu), = self._lire("SELECT nom, milieu FROM composantes WHERE id = ?", (composante_id,))
+        impacts = [
+            ImpactEnvironnemental(nom_impact, description, nature, json.loads(mesures), periode)
+            for nom_impact, description, nature, mesures, periode in self._lire(
+                "SELECT nom, description, nature, mesures, periode FROM impacts"
+                " WHERE composante_id = ? ORDER BY rang", (composante_id,))
+        ]
+        return ComposanteEnvironnementale(nom, milieu, impacts)
+
+    def detecter(self, texte: str) -> Tuple[List[str], List[str]]:
+        """Détecte thématiques et périodes en un seul passage sur le texte"""
+        categories = DETECTEUR.detecter(texte)
+        thematiques = [nom for genre, nom in categories if genre == "thematique"]
+        periodes = [nom for genre, nom in categories if genre == "periode"]
+        return thematiques, periodes or list(PERIODES_PAR_DEFAUT)
+
+    def detecter_thematiques(self, texte: str) -> List[str]:
+        """Détecte les thématiques environnementales dans le texte"""
+        return self.detecter(texte)[0]
+
+    def detecter_periode(self, texte: str) -> List[str]:
+        """Détecte la période du projet (construction, exploitation, démantèlement)"""
+        return self.detecter(texte)[1]
+
+    def get_composante(self, nom: str) -> Optional[ComposanteEnvironnementale]:
+        """Retourne une composante par son nom"""
+        return self.composantes.get(nom)
+
+    def composantes_thematiques(self, thematiques: Iterable[str]) -> List[ComposanteEnvironnementale]:
+        """Composantes rattachées aux thématiques (index thematiques), sans doublon, dans leur ordre"""
+        thematiques = list(thematiques)
+        if not thematiques:
+            return []
+        lignes = self._lire(
+            "SELECT t.thematique, c.cle FROM thematiques AS t JOIN composantes AS c ON c.id = t.composante_id"
+            f" WHERE t.thematique IN ({', '.join('?' for _ in thematiques)}) ORDER BY c.id", thematiques)
+        cles: Dict[str, List[str]] = {}
+        for thematique, cle in lignes:
+            cles.setdefault(thematique, []).append(cle)
+        return [self.composantes[cle] for cle in dict.fromkeys(cle for t in thematiques for cle in cles.get(t, []))]
+
+    def composantes_milieu(self, milieu: str) -> List[ComposanteEnvironnementale]:
+        """Composantes d'un milieu (PHYSIQUE, BIOLOGIQUE, HUMAIN)"""
+        return [self.composantes[cle] for (cle,) in self._lire(
+            "SELECT cle FROM composantes WHERE milieu = ? ORDER BY id", (milieu,))]
+
+    def rechercher_impacts(self, thematiques: Optional[Sequence[str]] = None, milieux: Optional[Sequence[str]] = None,
+                           periodes: Optional[Sequence[str]] = None, natures: Optional[Sequence[str]] = None
+                           ) -> List[Tuple[ComposanteEnvironnementale, ImpactEnvironnemental]]:
+        """Impacts satisfaisant tous les critères fournis (None : pas de filtre), résolus par les index
+
+        Seules les composantes qui ont un impact retenu sont chargées.
+        """
+        conditions, parametres = [], []
+        for valeurs, condition in (
+                (thematiques, "i.composante_id IN (SELECT composante_id FROM thematiques WHERE thematique IN ({}))"),
+                (milieux, "c.milieu IN ({})"),
+                (natures, "i.nature IN ({})"),
+                (periodes and [p.lower() for p in periodes],
+                 "i.id IN (SELECT impact_id FROM periodes_impacts WHERE periode IN ({}))")):
+            if valeurs is not None:
+                conditions.append(condition.format(", ".join("?" for _ in valeurs)))
+                parametres.extend(valeurs)
+        lignes = self._lire(
+            "SELECT c.cle, i.rang FROM impacts AS i JOIN composantes AS c ON c.id = i.composante_id"
+            + (" WHERE " + " AND ".join(conditions) if conditions else "") + " ORDER BY c.id, i.rang", parametres)
+        return [(self.composantes[cle], self.composantes[cle].impacts[rang]) for cle, rang in lignes]
+
+
+@lru_cache(maxsize=None)
+def base_connaissances(domaine: str = DOMAINE_PAR_DEFAUT) -> BaseConnaissances:
+    """Base de connaissances du domaine pour le processus, ouverte au premier appel"""
+    return BaseConnaissances(domaine)
@@ -0,0 +1,430 @@
+# depot.py
+# Dépôt SQLite des projets du générateur de matrice (apps/leopold.py).
+#
+# Le dépôt sert aussi d'espace de travail multi-projets : ``rechercher`` filtre les
+# impacts de tous les projets en SQL, sans les charger en mémoire.
+#
+# Chaque ouverture d'un projet rend une copie propre à l'appelant (une par session) : les
+# widgets d'une session ne modifient jamais le projet d'une autre. Les phases d'une copie
+# sont chargées à la demande (la matrice d'une phase non ouverte est lue directement en
+# SQL) et l'enregistrement ne réécrit que les impacts notés modifiés par les activités.
+# Chaque enregistrement incrémente la révision du projet en base : une copie ouverte à une
+# révision dépassée (enregistrée entre-temps par une autre session) est refusée
+# (ConflitEnregistrement) au lieu d'écraser ces modifications.
+# La grille d'importance d'un projet est enregistrée avec lui (définition JSON).
+
+import json
+import sqlite3
+import threading
+import weakref
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from utils.grilles import GrilleImportance
+from utils.projet import Activity, Impact, Phase, Project, matrice_phase
+
+SCHEMA = """
+PRAGMA foreign_keys = ON;
+CREATE TABLE IF NOT EXISTS projets (
+    id INTEGER PRIMARY KEY,
+    nom TEXT NOT NULL UNIQUE,
+    modifie TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    revision INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS phases (
+    projet_id INTEGER NOT NULL REFERENCES projets(id) ON DELETE CASCADE,
+    nom TEXT NOT NULL,
+    ordre INTEGER NOT NULL,
+    PRIMARY KEY (projet_id, nom)
+);
+CREATE TABLE IF NOT EXISTS activites (
+    id INTEGER PRIMARY KEY,
+    projet_id INTEGER NOT NULL REFERENCES projets(id) ON DELETE CASCADE,
+    phase TEXT NOT NULL,
+    nom TEXT NOT NULL,
+    UNIQUE (projet_id, phase, nom)
+);
+CREATE TABLE IF NOT EXISTS impacts (
+    activite_id INTEGER NOT NULL REFERENCES activites(id) ON DELETE CASCADE,
+    projet_id INTEGER NOT NULL,
+    phase TEXT NOT NULL,
+    composante TEXT NOT NULL,
+    milieu TEXT NOT NULL,
+    nature TEXT NOT NULL,
+    impact_apprehende TEXT,
+    intensite TEXT,
+    etendue TEXT,
+    duree TEXT,
+    attenuation TEXT,
+    importance TEXT,
+    PRIMARY KEY (activite_id, composante, milieu)
+);
+CREATE TABLE IF NOT EXISTS grilles_projets (
+    projet_id INTEGER PRIMARY KEY REFERENCES projets(id) ON DELETE CASCADE,
+    definition TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_impacts_phase ON impacts (projet_id, phase);
+CREATE INDEX IF NOT EXISTS idx_impacts_milieu ON impacts (milieu);
+CREATE INDEX IF NOT EXISTS idx_impacts_nature ON impacts (nature);
+CREATE INDEX IF NOT EXISTS idx_impacts_importance ON impacts (importance);
+CREATE INDEX IF NOT EXISTS idx_impacts_critere ON impacts (nature, importance, milieu, phase);
+"""
+
+COLONNES_IMPACT = ("composante", "milieu", "nature", "impact_apprehende",
+                   "intensite", "etendue", "duree", "attenuation", "importance")
+
+# Colonnes SQL -> colonnes de la matrice, dans l'ordre de Phase.to_dataframe
+COLONNES_RECHERCHE = {
+    "composante": "Composante", "milieu": "Milieu", "nature": "Nature impact", "importance": "Importance",
+    "impact_apprehende": "Impact appréhendé", "attenuation": "Mesure atténuation",
+    "intensite": "Intensité", "etendue": "Étendue", "duree": "Durée",
+}
+
+# Activités d'une phase avec leur rang (OrdreActivité) et leurs impacts dans l'ordre d'insertion
+REQUETE_PHASE = f"""
+SELECT a.id, a.nom, a.ordre, {", ".join("i." + col for col in COLONNES_IMPACT)}
+FROM (
+    SELECT id, nom, ROW_NUMBER() OVER (ORDER BY id) - 1 AS ordre
+    FROM activites WHERE projet_id = ? AND phase = ?
+) AS a
+LEFT JOIN impacts AS i ON i.activite_id = a.id
+ORDER BY a.id, i.rowid
+"""
+
+UPSERT_GRILLE = """
+INSERT INTO grilles_projets (projet_id, definition) VALUES (?, ?)
+ON CONFLICT (projet_id) DO UPDATE SET definition = excluded.definition
+"""
+
+UPSERT_IMPACT = f"""
+INSERT INTO impacts (activite_id, projet_id, phase, {", ".join(COLONNES_IMPACT)})
+VALUES (?, ?, ?, {", ".join("?" for _ in COLONNES_IMPACT)})
+ON CONFLICT (activite_id, composante, milieu) DO UPDATE SET
+{", ".join(f"{col} = excluded.{col}" for col in COLONNES_IMPACT[2:])}
+"""
+
+
+class ConflitEnregistrement(ValueError):
+    """Le projet a été enregistré (ou supprimé) par une autre session depuis son ouverture"""
+
+
+class _Etat:
+    """Ce que le dépôt sait d'une copie ouverte depuis son dernier enregistrement"""
+
+    __slots__ = ("nom", "projet_id", "revision", "version", "phases", "versions_phases", "activites", "grille")
+
+    def __init__(self, nom):
+        self.nom = nom
+        self.projet_id: Optional[int] = None
+        # Révision du projet en base lue ou écrite en dernier par cette copie
+        self.revision = 0
+        self.version = -1
+        self.grille: Optional[GrilleImportance] = None
+        self.phases: List[str] = []
+        self.versions_phases: Dict[str, int] = {}
+        # phase -> nom d'activité -> (id en base, objet Activity enregistré)
+        self.activites: Dict[str, Dict[str, Tuple[int, Activity]]] = {}
+
+
+class _Source:
+    """Chargement paresseux des phases d'un projet ouvert (voir Phase._table)"""
+
+    __slots__ = ("depot", "etat")
+
+    def __init__(self, depot, etat):
+        self.depot = depot
+        self.etat = etat
+
+    def charger_activites(self, phase: Phase) -> Dict[str, Activity]:
+        activities: Dict[str, Activity] = {}
+        enregistrees = self.etat.activites[phase.name] = {}
+        for ligne in self.depot._lire(REQUETE_PHASE, (self.etat.projet_id, phase.name)):
+            activite_id, nom = ligne[0], ligne[1]
+            activity = activities.get(nom)
+            if activity is None:
+                activity = activities[nom] = Activity(nom)
+                activity._parent = phase
+                enregistrees[nom] = (activite_id, activity)
+            if ligne[3] is not None:
+                impact = Impact(*ligne[3:])
+                activity._impacts[impact.key] = impact
+        self.etat.versions_phases[phase.name] = phase.version
+        return activities
+
+    def dataframe(self, phase: Phase) -> pd.DataFrame:
+        lignes = [ligne[1:] for ligne in self.depot._lire(REQUETE_PHASE, (self.etat.projet_id, phase.name))
+                  if ligne[3] is not None]
+        if not lignes:
+            return pd.DataFrame()
+        colonnes = dict(zip(("Activité", "OrdreActivité") + COLONNES_IMPACT, zip(*lignes)))
+        return matrice_phase(phase.name, {
+            COLONNES_RECHERCHE.get(col, col): valeurs for col, valeurs in colonnes.items()
+        })
+
+
+class DepotProjets:
+    """Projets leopold enregistrés dans une base SQLite
+
+    ``ouvrir`` retourne une nouvelle copie du projet à chaque appel ; le dépôt suit
+    l'état de chaque copie (nom, révision, éléments enregistrés) tant qu'elle existe.
+    """
+
+    def __init__(self, chemin):
+        self._connexion = sqlite3.connect(chemin, check_same_thread=False)
+        self._connexion.executescript(SCHEMA)
+        # Dépôt créé avant la détection des conflits
+        if "revision" not in [colonne[1] for colonne in self._connexion.execute("PRAGMA table_info(projets)")]:
+            with self._connexion:
+                self._connexion.execute("ALTER TABLE projets ADD COLUMN revision INTEGER NOT NULL DEFAULT 0")
+        self._verrou = threading.RLock()
+        # Copie ouverte ou enregistrée -> son état ; oubliée quand la session libère la copie
+        self._etats: "weakref.WeakKeyDictionary[Project, _Etat]" = weakref.WeakKeyDictionary()
+
+    def _lire(self, requete, parametres=()):
+        with self._verrou:
+            return self._connexion.execute(requete, parametres).fetchall()
+
+    def lister(self) -> List[str]:
+        return [nom for (nom,) in self._lire("SELECT nom FROM projets ORDER BY modifie DESC, nom")]
+
+    def revision(self, nom) -> Optional[int]:
+        """Révision enregistrée du projet ``nom`` (None s'il n'existe pas)"""
+        lignes = self._lire("SELECT revision FROM projets WHERE nom = ?", (nom,))
+        return lignes[0][0] if lignes else None
+
+    def ouvrir(self, nom) -> Project:
+        """Retourne une copie du projet ``nom`` (vide s'il n'existe pas encore), phases non chargées"""
+        with self._verrou:
+            projet, etat = Project(), _Etat(nom)
+            ligne = self._connexion.execute("SELECT id, revision FROM projets WHERE nom = ?", (nom,)).fetchone()
+            etat.grille = projet.grille
+            if ligne is not None:
+                etat.projet_id, etat.revision = ligne
+                grille = self._connexion.execute(
+                    "SELECT definition FROM grilles_projets WHERE projet_id = ?", (etat.projet_id,)).fetchone()
+                if grille is not None:
+                    projet.grille = etat.grille = GrilleImportance.depuis_dict(json.loads(grille[0]))
+                source = _Source(self, etat)
+                for (nom_phase,) in self._connexion.execute(
+                        "SELECT nom FROM phases WHERE projet_id = ? ORDER BY ordre", (etat.projet_id,)):
+                    phase = projet._phases[nom_phase] = Phase(nom_phase, source)
+                    phase._parent = projet
+                    etat.phases.append(nom_phase)
+            etat.version = projet.version
+            self._etats[projet] = etat
+            return projet
+
+    def enregistrer(self, nom, projet: Project, remplacer: bool = False) -> int:
+        """Enregistre ``projet`` sous le nom ``nom``
+
+        Pour une copie ouverte ou déjà enregistrée sous ``nom``, seules ses modifications
+        sont écrites (rien sans changement de version), et ConflitEnregistrement est levée
+        si le projet a été enregistré ou supprimé par ailleurs depuis. Sinon (« enregistrer
+        sous »), tout le projet est écrit sous ``nom`` et la copie suit désormais ce nom ;
+        un projet ``nom`` existant n'est remplacé qu'avec ``remplacer``.
+        Retourne le nombre d'impacts écrits ou supprimés.
+        """
+        with self._verrou:
+            etat = self._etats.get(projet)
+            if etat is None or etat.nom != nom:
+                if not remplacer and self.revision(nom) is not None:
+                    raise ConflitEnregistrement(f"Un projet « {nom} » existe déjà")
+                # Les phases non chargées sont lues depuis le projet d'origine avant de suivre ``nom``
+                for phase in projet._phases.values():
+                    phase._table()
+                self.supprimer(nom)
+                etat = self._etats[projet] = _Etat(nom)
+            elif projet.version == etat.version:
+                return 0
+
+            ecrits = 0
+            # Premier enregistrement : tout le projet est écrit, y compris les phases non chargées
+            complet = etat.projet_id is None
+            with self._connexion:
+                curseur = self._connexion.cursor()
+                if complet:
+                    if curseur.execute("SELECT 1 FROM projets WHERE nom = ?", (nom,)).fetchone():
+                        raise ConflitEnregistrement(f"Le projet « {nom} » a été créé par une autre session")
+                    curseur.execute("INSERT INTO projets (nom) VALUES (?)", (nom,))
+                    etat.projet_id, etat.revision = curseur.lastrowid, 0
+                else:
+                    ligne = curseur.execute("SELECT revision FROM projets WHERE id = ?", (etat.projet_id,)).fetchone()
+                    if ligne is None or ligne[0] != etat.revision:
+                        raise ConflitEnregistrement(
+                            f"Le projet « {nom} » a été " + ("supprimé" if ligne is None else "enregistré")
+                            + " par une autre session depuis son ouverture")
+                projet_id = etat.projet_id
+
+                noms_phases = list(projet._phases)
+                if noms_phases != etat.phases:
+                    curseur.execute("DELETE FROM phases WHERE projet_id = ?", (projet_id,))
+                    curseur.executemany("INSERT INTO phases (projet_id, nom, ordre) VALUES (?, ?, ?)",
+                                        [(projet_id, nom_phase, ordre) for ordre, nom_phase in enumerate(noms_phases)])
+                    for nom_phase in set(etat.phases) - set(noms_phases):
+                        curseur.execute("DELETE FROM activites WHERE projet_id = ? AND phase = ?", (projet_id, nom_phase))
+                        etat.activites.pop(nom_phase, None)
+                        etat.versions_phases.pop(nom_phase, None)
+                    etat.phases = noms_phases
+
+                for phase in projet._phases.values():
+                    # Phase jamais chargée ou inchangée depuis le dernier enregistrement
+                    if not complet and (not phase.loaded or etat.versions_phases.get(phase.name) == phase.version):
+                        continue
+                    enregistrees = etat.activites.setdefault(phase.name, {})
+                    activities = phase._table()
+                    for nom_activite, (activite_id, activity) in list(enregistrees.items()):
+                        if activities.get(nom_activite) is not activity:
+                            curseur.execute("DELETE FROM activites WHERE id = ?", (activite_id,))
+                            del enregistrees[nom_activite]
+
+                    for activity in activities.values():
+                        if activity.name not in enregistrees:
+                            curseur.execute("INSERT INTO activites (projet_id, phase, nom) VALUES (?, ?, ?)",
+                                            (projet_id, phase.name, activity.name))
+                            enregistrees[activity.name] = (curseur.lastrowid, activity)
+                        if not activity._modifies and not complet:
+                            continue
+                        activite_id = enregistrees[activity.name][0]
+                        # Parcours dans l'ordre du dictionnaire : les rowid suivent l'ordre d'insertion
+                        presents = [impact for cle, impact in activity._impacts.items()
+                                    if complet or cle in activity._modifies]
+                        curseur.executemany(UPSERT_IMPACT, [
+                            (activite_id, projet_id, phase.name) + tuple(getattr(impact, col) for col in COLONNES_IMPACT)
+                            for impact in presents
+                        ])
+                        supprimes = [(activite_id,) + cle for cle in activity._modifies if cle not in activity._impacts]
+                        curseur.executemany(
+                            "DELETE FROM impacts WHERE activite_id = ? AND composante = ? AND milieu = ?", supprimes
+                        )
+                        ecrits += len(presents) + len(supprimes)
+                        activity._modifies.clear()
+                    etat.versions_phases[phase.name] = phase.version
+
+                if projet.grille is not etat.grille:
+                    curseur.execute(UPSERT_GRILLE, (projet_id, projet.grille.en_json()))
+                    etat.grille = projet.grille
+                curseur.execute("UPDATE projets SET modifie = CURRENT_TIMESTAMP, revision = ? WHERE id = ?",
+                                (etat.revision + 1, projet_id))
+            etat.revision += 1
+            etat.version = projet.version
+            return ecrits
+
+    def reevaluer(self, grille: GrilleImportance, projets: Optional[List[str]] = None,
+                  ouverts: Iterable[Project] = ()) -> int:
+        """Applique ``grille`` aux projets (tous par défaut) et réévalue leurs impacts
+
+        Les copies ``ouverts`` de l'appelant sont réévaluées en mémoire puis enregistrées ;
+        les autres projets le sont directement dans la base, en une seule classification
+        vectorisée de leurs impacts (les copies ouvertes ailleurs seront en conflit).
+        Retourne le nombre d'importances modifiées.
+        """
+        with self._verrou:
+            noms = self.lister() if projets is None else list(projets)
+            modifies = 0
+            traites = set()
+            for projet in ouverts:
+                etat = self._etats.get(projet)
+                if etat is not None and etat.nom in noms:
+                    modifies += projet.changer_grille(grille)
+                    self.enregistrer(etat.nom, projet)
+                    traites.add(etat.nom)
+
+            fermes = [nom for nom in noms if nom not in traites]
+            if not fermes:
+                return modifies
+            with self._connexion:
+                ids = [projet_id for (projet_id,) in self._connexion.execute(
+                    f"SELECT id FROM projets WHERE nom IN ({', '.join('?' for _ in fermes)})", fermes)]
+                filtre = f"projet_id IN ({', '.join('?' for _ in ids)})"
+                lignes = self._connexion.execute(
+                    f"SELECT rowid, intensite, etendue, duree, importance FROM impacts "
+                    f"WHERE nature != 'risque impact' AND {filtre}", ids).fetchall()
+                if lignes:
+                    rowids, intensites, etendues, durees, anciennes = zip(*lignes)
+                    nouvelles = grille.evaluer_lot(intensites, etendues, durees).to_numpy(dtype=object)
+                    changements = [(importance, rowid) for rowid, ancienne, importance
+                                   in zip(rowids, anciennes, nouvelles) if importance != ancienne]
+                    self._connexion.executemany("UPDATE impacts SET importance = ? WHERE rowid = ?", changements)
+                    modifies += len(changements)
+                definition = grille.en_json()
+                self._connexion.executemany(UPSERT_GRILLE, [(projet_id, definition) for projet_id in ids])
+                self._connexion.execute(
+                    f"UPDATE projets SET modifie = CURRENT_TIMESTAMP, revision = revision + 1 "
+                    f"WHERE id IN ({', '.join('?' for _ in ids)})", ids)
+            return modifies
+
+    # Critère de recherche -> colonne SQL
+    CRITERES = {
+        "projets": "p.nom",
+        "phases": "i.phase",
+        "activites": "a.nom",
+        "composantes": "i.composante",
+        "milieux": "i.milieu",
+        "natures": "i.nature",
+        "importances": "i.importance",
+    }
+
+    def valeurs(self, critere) -> List[str]:
+        """Valeurs distinctes d'un critère sur tout l'espace de travail (options de filtre)"""
+        if critere == "projets":
+            requete = "SELECT nom FROM projets ORDER BY nom"
+        elif critere == "phases":
+            requete = "SELECT DISTINCT nom FROM phases ORDER BY nom"
+        elif critere == "activites":
+            requete = "SELECT DISTINCT nom FROM activites ORDER BY nom"
+        else:
+            # Colonnes indexées : DISTINCT parcourt l'index sans lire la table
+            requete = f"SELECT DISTINCT {self.CRITERES[critere][2:]} FROM impacts ORDER BY 1"
+        return [valeur for (valeur,) in self._lire(requete)]
+
+    def _filtre(self, criteres) -> Tuple[str, list]:
+        inconnus = set(criteres) - set(self.CRITERES)
+        if inconnus:
+            raise ValueError(f"Critères inconnus : {', '.join(sorted(inconnus))}")
+        conditions, parametres = [], []
+        for critere, valeurs in criteres.items():
+            if valeurs:
+                valeurs = [valeurs] if isinstance(valeurs, str) else list(valeurs)
+                conditions.append(f"{self.CRITERES[critere]} IN ({', '.join('?' for _ in valeurs)})")
+                parametres.extend(valeurs)
+        return ("WHERE " + " AND ".join(conditions) if conditions else ""), parametres
+
+    def compter(self, **criteres) -> int:
+        """Nombre d'impacts de l'espace de travail correspondant aux critères (voir ``rechercher``)"""
+        with self._verrou:
+            where, parametres = self._filtre(criteres)
+            return self._connexion.execute(
+                f"SELECT COUNT(*) FROM impacts AS i JOIN activites AS a ON a.id = i.activite_id "
+                f"JOIN projets AS p ON p.id = i.projet_id {where}", parametres
+            ).fetchone()[0]
+
+    def rechercher(self, limite: Optional[int] = None, **criteres) -> pd.DataFrame:
+        """Impacts de tous les projets correspondant aux critères (listes de valeurs acceptées)
+
+        Exemple : ``rechercher(phases=["Construction"], natures=["négatif"],
+        importances=["Très forte"], milieux=["Eau"])``. Un critère absent ou vide ne
+        filtre pas ; ``limite`` borne le nombre de lignes lues.
+        """
+        with self._verrou:
+            where, parametres = self._filtre(criteres)
+            lignes = self._connexion.execute(f"""
+                SELECT p.nom, i.phase, a.nom, {", ".join("i." + col for col in COLONNES_IMPACT)}
+                FROM impacts AS i
+                JOIN activites AS a ON a.id = i.activite_id
+                JOIN projets AS p ON p.id = i.projet_id
+                {where}
+                ORDER BY p.nom, a.id, i.rowid
+                {"LIMIT " + str(int(limite)) if limite else ""}
+            """, parametres).fetchall()
+
+        df = pd.DataFrame(lignes, columns=("Projet", "Phase", "Activité") + COLONNES_IMPACT)
+        return df.rename(columns=COLONNES_RECHERCHE)[["Projet", "Phase", "Activité", *COLONNES_RECHERCHE.values()]]
+
+    def supprimer(self, nom):
+        with self._verrou, self._connexion:
+            self._connexion.execute("DELETE FROM projets WHERE nom = ?", (nom,))
+
+    def fermer(self):
+        with self._verrou:
+            self._connexion.close()
@@ -0,0 +1,128 @@
+# detection.py
+# Détection de mots-clés en un seul passage sur le texte (assistant AI1).
+#
+# Tous les mots-clés de toutes les catégories sont compilés en une seule expression
+# régulière en forme d'arbre de préfixes : un parcours de finditer trouve toutes les
+# catégories présentes, pour un coût à peu près indépendant du nombre de mots-clés.
+# Les variantes accentuées/non accentuées des mots-clés sont incluses dans l'arbre, si
+# bien que le texte n'a qu'à être mis en minuscules. Les correspondances se font sur
+# des mots entiers (« sol » ne reconnaît pas « solution »), avec les terminaisons de
+# pluriel/féminin usuelles.
+
+import itertools
+import re
+import unicodedata
+from typing import Dict, Hashable, Iterable, List, Set
+
+APOSTROPHES = "'’ʼ"
+# Terminaisons acceptées après un mot-clé : « émission » reconnaît « émissions »
+SUFFIXES_FLEXION = r"(?:es|s|e|x)?"
+# Au-delà, seules la forme accentuée et la forme sans accents d'un mot-clé sont retenues
+VARIANTES_MAX = 64
+
+
+def sans_accents(texte: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFD", texte) if not unicodedata.combining(c))
+
+
+def _forme(mot: str) -> str:
+    """Minuscules, apostrophe droite, espaces simples (accents conservés)"""
+    for apostrophe in APOSTROPHES[1:]:
+        mot = mot.replace(apostrophe, "'")
+    return " ".join(unicodedata.normalize("NFC", mot.lower()).split())
+
+
+def normaliser_mot(mot: str) -> str:
+    """Forme de référence d'un mot-clé : minuscules sans accents, apostrophe droite, espaces simples"""
+    return sans_accents(_forme(mot))
+
+
+def _variantes(mot: str) -> Set[str]:
+    """Toutes les combinaisons accentuées/non accentuées des lettres du mot (« écosystème », « ecosysteme », ...)"""
+    choix = [sorted({c, sans_accents(c)}) for c in mot]
+    nombre = 1
+    for options in choix:
+        nombre *= len(options)
+    if nombre > VARIANTES_MAX:
+        return {mot, sans_accents(mot)}
+    return {"".join(lettres) for lettres in itertools.product(*choix)}
+
+
+def _motif_arbre(mots: Iterable[str]) -> str:
+    """Alternative régulière factorisée par préfixes communs (un seul essai par lettre)"""
+    racine: Dict[str, dict] = {}
+    for mot in mots:
+        noeud = racine
+        for lettre in mot:
+            noeud = noeud.setdefault(lettre, {})
+        noeud[""] = {}
+
+    def motif(noeud) -> str:
+        branches = []
+        for lettre, suite in sorted(noeud.items()):
+            if not lettre:
+                continue
+            if lettre == " ":
+                debut = r"\s+"
+            elif lettre == "'":
+                debut = f"[{APOSTROPHES}]"
+            else:
+                debut = re.escape(lettre)
+            branches.append(debut + motif(suite))
+        if not branches:
+            return ""
+        corps = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{corps})?" if "" in noeud else corps
+
+    return motif(racine)
+
+
+class DetecteurMotsCles:
+    """Détecteur compilé : catégorie -> mots-clés ; ``detecter`` rend les catégories présentes
+
+    Les catégories sont rendues dans l'ordre de déclaration. Un mot-clé composé qui
+    contient un autre mot-clé (« cours d'eau » / « eau ») compte pour les deux catégories.
+    """
+
+    __slots__ = ("categories", "_motif", "_categories_par_mot", "_categories_par_variante")
+
+    def __init__(self, mots_cles: Dict[Hashable, Iterable[str]], suffixes: str = SUFFIXES_FLEXION):
+        self.categories = list(mots_cles)
+        par_mot: Dict[str, List[Hashable]] = {}
+        for categorie, mots in mots_cles.items():
+            for mot in mots:
+                mot = normaliser_mot(mot)
+                if mot and categorie not in par_mot.setdefault(mot, []):
+                    par_mot[mot].append(categorie)
+        # L'expression ne rend que la correspondance la plus longue à une position donnée ;
+        # seul un mot-clé de plusieurs mots peut en contenir un autre
+        for mot, categories in par_mot.items():
+            if not re.search(r"\W", mot):
+                continue
+            for autre, categories_autre in par_mot.items():
+                if autre != mot and re.search(rf"\b{re.escape(autre)}\b", mot):
+                    categories.extend(c for c in categories_autre if c not in categories)
+        self._categories_par_mot = par_mot
+        # Variantes calculées sur la forme déclarée, accentuée
+        self._categories_par_variante: Dict[str, List[Hashable]] = {}
+        for mots in mots_cles.values():
+            for mot in mots:
+                for variante in _variantes(_forme(mot)):
+                    self._categories_par_variante[variante] = par_mot[normaliser_mot(variante)]
+        self._motif = (re.compile(rf"\b({_motif_arbre(self._categories_par_variante)}){suffixes}\b")
+                       if par_mot else None)
+
+    def detecter(self, texte: str) -> List[Hashable]:
+        """Catégories dont au moins un mot-clé apparaît dans ``texte``, en un passage"""
+        if self._motif is None or not texte:
+            return []
+        if not unicodedata.is_normalized("NFC", texte):
+            texte = unicodedata.normalize("NFC", texte)
+        trouvees = set()
+        # Chaque forme distincte rencontrée n'est résolue qu'une fois
+        for mot in set(self._motif.findall(texte.lower())):
+            categories = self._categories_par_variante.get(mot)
+            if categories is None:  # espaces ou apostrophe typographique dans un mot-clé composé
+                categories = self._categories_par_mot[normaliser_mot(mot)]
+            trouvees.update(categories)
+        return [categorie for categorie in self.categories if categorie in trouvees]
@@ -0,0 +1,141 @@
+# diagnostics.py
+# Chronométrage des chemins critiques, agrégé par rerun Streamlit.
+#
+# main.py ouvre un rerun (demarrer_rerun) et le clôt (terminer_rerun) ; entre les deux,
+# chaque fonction décorée par @mesure ou bloc ``with chronometre(...)`` ajoute son
+# nombre d'appels et sa durée au rerun courant. Hors rerun (CLI, benchmarks) les
+# mesures ne coûtent qu'une lecture de ContextVar. Sur option, chaque rerun terminé
+# est ajouté en une ligne à un journal JSONL : SUITE_DIAGNOSTICS_JOURNAL désigne le
+# fichier (aucun journal par défaut) ; au-delà de SUITE_DIAGNOSTICS_JOURNAL_MAX octets,
+# il est renommé en <journal>.1, qui remplace le précédent, et repart de zéro.
+# Les caches partagés par le processus s'y enregistrent (enregistrer_cache) pour que le
+# panneau de diagnostics affiche leurs succès, échecs et évictions.
+# Ce module n'importe pas streamlit : utils/projet.py et utils/matrice.py l'utilisent.
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+JOURNAL = os.environ.get("SUITE_DIAGNOSTICS_JOURNAL") or None
+TAILLE_MAX_JOURNAL = int(os.environ.get("SUITE_DIAGNOSTICS_JOURNAL_MAX", 5 * 1024 * 1024))
+
+_rerun_courant: ContextVar[Optional["Rerun"]] = ContextVar("rerun_courant", default=None)
+_verrou_journal = threading.Lock()
+# nom -> fonction rendant les statistiques courantes du cache (compteurs cumulés sur le processus)
+_caches: Dict[str, Callable[[], dict]] = {}
+
+
+class Rerun:
+    """Mesures d'une exécution du script : nom -> [appels, durée totale, durée max]"""
+
+    __slots__ = ("session", "numero", "app", "debut", "duree", "mesures", "_jeton")
+
+    def __init__(self, session, numero, app=None):
+        self.session = session
+        self.numero = numero
+        self.app = app
+        self.debut = time.time()
+        self.duree = None
+        self.mesures: Dict[str, List[float]] = {}
+        self._jeton = None
+
+    def ajouter(self, nom, duree):
+        mesure = self.mesures.get(nom)
+        if mesure is None:
+            self.mesures[nom] = [1, duree, duree]
+        else:
+            mesure[0] += 1
+            mesure[1] += duree
+            if duree > mesure[2]:
+                mesure[2] = duree
+
+    def en_dict(self) -> dict:
+        return {
+            "session": self.session,
+            "rerun": self.numero,
+            "app": self.app,
+            "debut": self.debut,
+            "duree": self.duree,
+            "mesures": {
+                nom: {"appels": appels, "total": total, "max": maximum}
+                for nom, (appels, total, maximum) in self.mesures.items()
+            },
+        }
+
+
+def demarrer_rerun(session, numero, app=None) -> Rerun:
+    rerun = Rerun(session, numero, app)
+    rerun._jeton = _rerun_courant.set(rerun)
+    return rerun
+
+
+def _ecrire_journal(journal: str, ligne: dict):
+    try:
+        if os.path.getsize(journal) >= TAILLE_MAX_JOURNAL:
+            os.replace(journal, journal + ".1")
+    except FileNotFoundError:
+        pass
+    with open(journal, "a", encoding="utf-8") as f:
+        f.write(json.dumps(ligne, ensure_ascii=False) + "\n")
+
+
+def terminer_rerun(rerun: Rerun, journal: Optional[str] = JOURNAL) -> dict:
+    """Clôt le rerun, l'ajoute au journal JSONL s'il y en a un et retourne ses mesures"""
+    rerun.duree = time.time() - rerun.debut
+    if rerun._jeton is not None:
+        _rerun_courant.reset(rerun._jeton)
+        rerun._jeton = None
+    ligne = rerun.en_dict()
+    if journal:
+        with _verrou_journal:
+            _ecrire_journal(journal, ligne)
+    return ligne
+
+
+def rerun_courant() -> Optional[Rerun]:
+    return _rerun_courant.get()
+
+
+@contextmanager
+def chronometre(nom):
+    rerun = _rerun_courant.get()
+    if rerun is None:
+        yield
+        return
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        rerun.ajouter(nom, time.perf_counter() - debut)
+
+
+def mesure(nom):
+    """Décorateur : chronomètre chaque appel de la fonction dans le rerun courant"""
+    def decorateur(fonction):
+        @functools.wraps(fonction)
+        def enveloppe(*args, **kwargs):
+            rerun = _rerun_courant.get()
+            if rerun is None:
+                return fonction(*args, **kwargs)
+            debut = time.perf_counter()
+            try:
+                return fonction(*args, **kwargs)
+            finally:
+                rerun.ajouter(nom, time.perf_counter() - debut)
+        return enveloppe
+    return decorateur
+
+
+def enregistrer_cache(nom, statistiques: Callable[[], dict]):
+    """Déclare un cache du processus ; ``statistiques`` est appelée à chaque affichage du panneau"""
+    _caches[nom] = statistiques
+
+
+def caches() -> Dict[str, dict]:
+    """Statistiques courantes de tous les caches enregistrés"""
+    return {nom: statistiques() for nom, statistiques in _caches.items()}
@@ -0,0 +1,184 @@
+# diff_matrice.py
+# Différences structurelles entre deux versions d'une matrice d'impacts.
+#
+# Un impact est identifié par (phase, activité, composante, milieu). Les deux versions
+# sont jointes par hachage sur cette clé ; chaque ligne est résumée par une empreinte
+# de ses colonnes de valeur, si bien que seules les lignes d'empreintes différentes
+# sont comparées colonne par colonne.
+
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.diagnostics import mesure
+from utils.matrice import calculer_fusion, iter_tableau_html, trier_matrice
+from utils.projet import Project
+
+CLES = ["Phase", "Activité", "Composante", "Milieu"]
+VALEURS = ["Nature impact", "Importance", "Impact appréhendé", "Mesure atténuation", "Intensité", "Étendue", "Durée"]
+STATUTS = ("ajouté", "supprimé", "modifié", "inchangé")
+CLASSES_STATUT = {"ajouté": "diff-ajoute", "supprimé": "diff-supprime", "modifié": "diff-modifie", "inchangé": ""}
+SUFFIXE_AVANT = " avant"
+
+STYLE_DIFF = """
+    <style>
+    tr.diff-ajoute td:not([rowspan]) { background-color: #e6ffed; }
+    tr.diff-supprime td:not([rowspan]) { background-color: #ffeef0; color: #6a737d; }
+    tr.diff-modifie td:not([rowspan]) { background-color: #fff8c5; }
+    del { color: #b31d28; }
+    </style>
+    """
+
+
+class DiffMatrice:
+    """Résultat d'une comparaison : une ligne par impact présent dans l'une ou l'autre version
+
+    ``lignes`` contient les valeurs de la nouvelle version (de l'ancienne pour un impact
+    supprimé), le statut, la liste des colonnes modifiées et, pour chaque colonne de
+    valeur, l'ancienne valeur lorsqu'elle a changé (colonnes « … avant », None sinon).
+    """
+
+    __slots__ = ("lignes", "compteurs")
+
+    def __init__(self, lignes: pd.DataFrame):
+        self.lignes = lignes
+        statuts = lignes["Statut"].value_counts()
+        self.compteurs: Dict[str, int] = {statut: int(statuts.get(statut, 0)) for statut in STATUTS}
+        self.compteurs["importance"] = int(lignes[f"Importance{SUFFIXE_AVANT}"].notna().sum())
+
+    @property
+    def identiques(self) -> bool:
+        return not (self.compteurs["ajouté"] or self.compteurs["supprimé"] or self.compteurs["modifié"])
+
+    def changements(self) -> pd.DataFrame:
+        """Impacts ajoutés, supprimés ou modifiés"""
+        return self.lignes[self.lignes["Statut"] != "inchangé"]
+
+    def transitions_importance(self) -> pd.DataFrame:
+        """Nombre d'impacts modifiés par couple (importance avant, importance après)"""
+        modifies = self.lignes[self.lignes[f"Importance{SUFFIXE_AVANT}"].notna()]
+        return (modifies.groupby([f"Importance{SUFFIXE_AVANT}", "Importance"], sort=False)
+                .size().rename("Impacts").reset_index()
+                .sort_values("Impacts", ascending=False, ignore_index=True))
+
+
+def _matrice(source) -> pd.DataFrame:
+    df = source.to_dataframe() if isinstance(source, Project) else source
+    if df.empty:
+        return pd.DataFrame(columns=CLES + ["OrdreActivité"] + VALEURS)
+    df = df.reindex(columns=CLES + ["OrdreActivité"] + VALEURS)
+    # None, NaN et chaîne vide sont équivalents pour la comparaison
+    for col in VALEURS:
+        serie = df[col]
+        if serie.hasnans:
+            if isinstance(serie.dtype, pd.CategoricalDtype) and "" not in serie.cat.categories:
+                serie = serie.cat.add_categories("")
+            df[col] = serie.fillna("")
+    return df.drop_duplicates(CLES, keep="last")
+
+
+def _ordres(df) -> pd.DataFrame:
+    return df.drop_duplicates(["Phase", "Activité"])[["Phase", "Activité", "OrdreActivité"]]
+
+
+@mesure("diff.comparer_matrices")
+def comparer_matrices(avant, apres) -> DiffMatrice:
+    """Compare deux versions d'une matrice (Project ou DataFrame de ``to_dataframe``)
+
+    Jointure par hachage sur CLES puis comparaison des empreintes de ligne : le coût
+    est linéaire en nombre d'impacts, et seules les lignes d'empreintes différentes
+    sont comparées colonne par colonne.
+    """
+    avant, apres = _matrice(avant), _matrice(apres)
+    empreintes_avant = pd.util.hash_pandas_object(avant[VALEURS], index=False, categorize=False).to_numpy()
+    empreintes_apres = pd.util.hash_pandas_object(apres[VALEURS], index=False, categorize=False).to_numpy()
+
+    # Les clés étant uniques de chaque côté, la jointure à gauche donne une ligne par impact de ``apres``
+    jointure = apres[CLES].merge(
+        avant[CLES].assign(_ligne=np.arange(len(avant))), on=CLES, how="left", sort=False
+    )
+    lignes_avant = jointure["_ligne"].to_numpy(dtype=float, na_value=np.nan)
+    trouve = ~np.isnan(lignes_avant)
+    correspondance = lignes_avant[trouve].astype(np.int64)
+    modifie = np.zeros(len(apres), dtype=bool)
+    modifie[trouve] = empreintes_apres[trouve] != empreintes_avant[correspondance]
+    supprime = np.ones(len(avant), dtype=bool)
+    supprime[correspondance] = False
+
+    lignes = pd.concat([apres, avant[supprime]], ignore_index=True)
+    statuts = np.full(len(lignes), "inchangé", dtype=object)
+    statuts[:len(apres)][~trouve] = "ajouté"
+    statuts[:len(apres)][modifie] = "modifié"
+    statuts[len(apres):] = "supprimé"
+    lignes["Statut"] = statuts
+
+    # Anciennes valeurs des colonnes modifiées, lues uniquement sur les lignes modifiées
+    positions = np.flatnonzero(modifie)
+    positions_avant = lignes_avant[positions].astype(np.int64)
+    modifications = np.full(len(positions), "", dtype=object)
+    anciennes = {}
+    for col in VALEURS:
+        valeurs = apres[col].iloc[positions].to_numpy(dtype=object)
+        precedentes = avant[col].iloc[positions_avant].to_numpy(dtype=object)
+        change = valeurs != precedentes
+        deja = modifications[change]
+        modifications[change] = np.where(deja == "", col, deja + ", " + col)
+        colonne = np.full(len(lignes), None, dtype=object)
+        colonne[positions[change]] = precedentes[change]
+        anciennes[col + SUFFIXE_AVANT] = pd.Series(colonne, dtype=object)
+    colonne_modifications = np.full(len(lignes), "", dtype=object)
+    colonne_modifications[positions] = modifications
+    lignes["Modifications"] = colonne_modifications
+    lignes = lignes.assign(**anciennes)
+
+    # Ordre d'affichage : celui de la nouvelle version ; une activité supprimée se place
+    # juste avant l'activité qui occupe désormais son ancien rang
+    ordres = lignes["OrdreActivité"].to_numpy(dtype=np.int64) * 2 + 1
+    if supprime.any():
+        rangs = avant.loc[supprime, ["Phase", "Activité", "OrdreActivité"]].merge(
+            _ordres(apres), how="left", on=["Phase", "Activité"], suffixes=(SUFFIXE_AVANT, "")
+        )
+        ordres[len(apres):] = np.where(
+            rangs["OrdreActivité"].notna(), rangs["OrdreActivité"] * 2 + 1, rangs[f"OrdreActivité{SUFFIXE_AVANT}"] * 2
+        )
+    lignes["OrdreActivité"] = ordres
+
+    colonnes = CLES + ["OrdreActivité"] + VALEURS + ["Statut", "Modifications"] + list(anciennes)
+    return DiffMatrice(lignes[colonnes])
+
+
+def iter_diff_html(diff: DiffMatrice, inclure_inchanges=False, taille_bloc=500) -> Iterator[str]:
+    """Génère la matrice des différences : lignes colorées selon le statut, anciennes valeurs barrées
+
+    Sans ``inclure_inchanges``, seuls les impacts changés sont affichés ; la numérotation
+    hiérarchique reste celle de la matrice complète.
+    """
+    autres = ["Statut"] + [col + SUFFIXE_AVANT for col in VALEURS]
+    df = trier_matrice(diff.lignes, autres_colonnes=autres)
+    rowspans, numeros = calculer_fusion(df)
+    if not inclure_inchanges:
+        garder = (df["Statut"] != "inchangé").to_numpy()
+        df = df[garder].reset_index(drop=True)
+        numeros = {col: valeurs[garder] for col, valeurs in numeros.items()}
+        rowspans = calculer_fusion(df)[0]
+
+    classes = df["Statut"].map(CLASSES_STATUT).to_numpy()
+    anciennes = {col: df[col + SUFFIXE_AVANT].to_numpy(dtype=object, na_value=None) for col in VALEURS}
+    yield STYLE_DIFF
+    yield from iter_tableau_html(df, rowspans, numeros, taille_bloc=taille_bloc,
+                                 classes_lignes=classes, anciennes=anciennes)
+
+
+def tableau_diff_html(diff: DiffMatrice, inclure_inchanges=False) -> str:
+    return "".join(iter_diff_html(diff, inclure_inchanges))
+
+
+def resume_diff(diff: DiffMatrice, etiquette_avant: Optional[str] = None, etiquette_apres: Optional[str] = None) -> str:
+    """Résumé d'une ligne, p. ex. « v1 → v2 : 3 ajoutés, 1 supprimé, 5 modifiés (dont 2 importances) »"""
+    c = diff.compteurs
+    texte = (f"{c['ajouté']} ajouté(s), {c['supprimé']} supprimé(s), "
+             f"{c['modifié']} modifié(s) (dont {c['importance']} changement(s) d'importance)")
+    if etiquette_avant and etiquette_apres:
+        texte = f"{etiquette_avant} → {etiquette_apres} : {texte}"
+    return texte
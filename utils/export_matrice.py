@@ -0,0 +1,134 @@
+# export_matrice.py
+# Exports de la matrice d'impacts : CSV par blocs, Parquet à colonnes catégorielles et
+# Excel dont les cellules fusionnées reproduisent celles de tableau_html_fusion.
+# Chaque export écrit dans un fichier (chemin ou objet binaire ouvert) bloc par bloc et
+# n'est produit qu'à la demande.
+
+import io
+from typing import Iterator
+
+import pandas as pd
+
+from utils.matrice import HIERARCHIE, ORDRE_COMPOSANTES, ORDRE_PHASES, calculer_fusion, iter_tableau_html, trier_matrice
+from utils.utils1 import COULEURS_IMPORTANCE, categories_completees
+
+TAILLE_BLOC = 5000
+COLONNES_CATEGORIELLES = ["Activité", "Milieu", "Nature impact", "Importance", "Intensité", "Étendue", "Durée"]
+COLONNES_EXCEL = HIERARCHIE + ["Milieu", "Nature impact", "Importance", "Impact appréhendé", "Mesure atténuation"]
+LARGEURS_EXCEL = [22, 30, 18, 20, 14, 14, 50, 50]
+
+
+def iter_csv(df, sep=";", taille_bloc=TAILLE_BLOC) -> Iterator[bytes]:
+    """Génère le CSV encodé en UTF-8 par blocs de ``taille_bloc`` lignes, l'en-tête en premier"""
+    yield df.iloc[:0].to_csv(index=False, sep=sep).encode("utf-8")
+    for debut in range(0, len(df), taille_bloc):
+        yield df.iloc[debut:debut + taille_bloc].to_csv(index=False, header=False, sep=sep).encode("utf-8")
+
+
+def ecrire_csv(df, fichier, sep=";", taille_bloc=TAILLE_BLOC):
+    for morceau in iter_csv(df, sep, taille_bloc):
+        fichier.write(morceau)
+
+
+def ecrire_parquet(df, fichier, taille_bloc=TAILLE_BLOC):
+    """Écrit la matrice en Parquet, un groupe de lignes par bloc, les colonnes répétitives en catégories"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = df.assign(**{
+        col: df[col].astype("category") for col in COLONNES_CATEGORIELLES if col in df.columns
+    })
+    if "Phase" in df.columns:
+        df["Phase"] = pd.Categorical(df["Phase"], categories=categories_completees(df["Phase"], ORDRE_PHASES), ordered=True)
+    if "Composante" in df.columns:
+        df["Composante"] = pd.Categorical(
+            df["Composante"], categories=categories_completees(df["Composante"], ORDRE_COMPOSANTES), ordered=True
+        )
+
+    # Les catégories sont fixées sur toute la matrice : tous les blocs partagent le même schéma
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(fichier, schema) as writer:
+        for debut in range(0, max(len(df), 1), taille_bloc):
+            writer.write_table(pa.Table.from_pandas(
+                df.iloc[debut:debut + taille_bloc], schema=schema, preserve_index=False
+            ))
+
+
+def ecrire_excel(df, fichier):
+    """Écrit la matrice triée dans un classeur Excel en mode mémoire constante
+
+    Les colonnes Phase/Activité/Composante sont fusionnées comme les rowspans du
+    rendu HTML. En mode ``constant_memory`` chaque ligne est vidée sur disque dès
+    qu'on passe à la suivante : la fusion est donc déclarée sur la première ligne
+    du groupe, sans écrire les cellules vides qu'elle recouvre.
+    """
+    import xlsxwriter
+
+    df = trier_matrice(df)
+    rowspans, numeros = calculer_fusion(df)
+
+    classeur = xlsxwriter.Workbook(fichier, {"constant_memory": True})
+    feuille = classeur.add_worksheet("Matrice")
+    style = {"border": 1, "border_color": "#DDDDDD", "valign": "top", "text_wrap": True}
+    format_entete = classeur.add_format({**style, "bold": True, "bg_color": "#F2F2F2"})
+    format_cellule = classeur.add_format(style)
+    format_fusion = classeur.add_format({**style, "bold": True})
+    formats_importance = {
+        (nature, importance): classeur.add_format({**style, "bg_color": couleur})
+        for nature, couleurs in COULEURS_IMPORTANCE.items()
+        for importance, couleur in couleurs.items()
+    }
+
+    for col, largeur in enumerate(LARGEURS_EXCEL):
+        feuille.set_column(col, col, largeur)
+    feuille.freeze_panes(1, 0)
+    feuille.write_row(0, 0, COLONNES_EXCEL, format_entete)
+
+    colonnes = [df[col].to_numpy() for col in COLONNES_EXCEL]
+    prefixes = [numeros[col].astype(str) for col in HIERARCHIE]
+    spans = [rowspans[col] for col in HIERARCHIE]
+    for i in range(len(df)):
+        ligne = i + 1
+        for niveau in range(len(HIERARCHIE)):
+            span = spans[niveau][i]
+            if not span:
+                continue
+            texte = ".".join(prefixes[c][i] for c in range(niveau + 1)) + ". " + str(colonnes[niveau][i])
+            if span > 1:
+                # Sans format, merge_range n'écrit pas les cellules vides des lignes suivantes
+                feuille.merge_range(ligne, niveau, ligne + span - 1, niveau, "")
+            feuille.write_string(ligne, niveau, texte, format_fusion)
+
+        nature, importance = colonnes[4][i], colonnes[5][i]
+        for col in range(len(HIERARCHIE), len(COLONNES_EXCEL)):
+            valeur = colonnes[col][i]
+            texte = "" if valeur is None or pd.isna(valeur) else str(valeur)
+            cellule = formats_importance.get((nature, importance), format_cellule) if col == 5 else format_cellule
+            feuille.write_string(ligne, col, texte, cellule)
+
+    classeur.close()
+
+
+def ecrire_html(df, fichier, taille_bloc=500):
+    """Écrit le tableau HTML fusionné en UTF-8, bloc de lignes par bloc de lignes"""
+    df = trier_matrice(df)
+    rowspans, numeros = calculer_fusion(df)
+    for morceau in iter_tableau_html(df, rowspans, numeros, taille_bloc=taille_bloc):
+        fichier.write(morceau.encode("utf-8"))
+
+
+# Format -> (fonction d'écriture, nom de fichier, type MIME)
+FORMATS_EXPORT = {
+    "CSV": (ecrire_csv, "matrice_impacts.csv", "text/csv"),
+    "Excel": (ecrire_excel, "matrice_impacts.xlsx",
+              "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "Parquet": (ecrire_parquet, "matrice_impacts.parquet", "application/vnd.apache.parquet"),
+    "HTML": (ecrire_html, "matrice_impacts.html", "text/html"),
+}
+
+
+def exporter(df, format_export) -> bytes:
+    """Produit l'export complet en mémoire (pour un bouton de téléchargement)"""
+    tampon = io.BytesIO()
+    FORMATS_EXPORT[format_export][0](df, tampon)
+    return tampon.getvalue()
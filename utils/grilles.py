@@ -0,0 +1,190 @@
+# grilles.py
+# Grilles d'importance interchangeables (intensité × étendue × durée -> importance).
+#
+# Une grille est lue depuis un fichier CSV (colonnes Intensité, Étendue, Durée,
+# Importance) ou JSON ({"nom", "defaut", "grille": {intensité: {étendue: {durée:
+# importance}}}}), validée (les 36 combinaisons définies, libellés connus) puis
+# compilée en tableau dense de codes : un lot d'impacts s'évalue en une indexation.
+# La grille « Standard » (TABLE_IMPORTANCE) est toujours disponible ; les autres sont
+# lues dans REPERTOIRE_GRILLES.
+
+import io
+import json
+import os
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.utils1 import (
+    DUREES, ETENDUES, IMPORTANCE_PAR_DEFAUT, INTENSITES, NIVEAUX_IMPORTANCE, TABLE_IMPORTANCE,
+    compiler_grille, evaluer_importance_lot,
+)
+
+REPERTOIRE_GRILLES = os.environ.get(
+    "SUITE_GRILLES", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "grilles")
+)
+EXTENSIONS_GRILLE = (".csv", ".json")
+COLONNES_GRILLE = ("Intensité", "Étendue", "Durée", "Importance")
+
+
+def _normaliser(texte) -> str:
+    """Minuscules sans accents ni espaces superflus (comparaison des en-têtes et libellés)"""
+    texte = unicodedata.normalize("NFKD", str(texte).strip().lower())
+    return "".join(c for c in texte if not unicodedata.combining(c))
+
+
+_NIVEAUX_NORMALISES = {_normaliser(niveau): niveau for niveau in NIVEAUX_IMPORTANCE}
+
+
+def valider_table(table, defaut=IMPORTANCE_PAR_DEFAUT) -> List[str]:
+    """Liste les problèmes d'une table {(intensité, étendue, durée): importance} (vide si valide)"""
+    erreurs = []
+    if defaut not in NIVEAUX_IMPORTANCE:
+        erreurs.append(f"importance par défaut inconnue : {defaut!r}")
+    for (intensite, etendue, duree), importance in table.items():
+        for valeur, valeurs, libelle in ((intensite, INTENSITES, "intensité"), (etendue, ETENDUES, "étendue"),
+                                         (duree, DUREES, "durée")):
+            if valeur not in valeurs:
+                erreurs.append(f"{libelle} inconnue : {valeur!r}")
+        if importance not in NIVEAUX_IMPORTANCE:
+            erreurs.append(f"importance inconnue pour {(intensite, etendue, duree)} : {importance!r}")
+    manquantes = [
+        (intensite, etendue, duree)
+        for intensite in INTENSITES for etendue in ETENDUES for duree in DUREES
+        if (intensite, etendue, duree) not in table
+    ]
+    if manquantes:
+        exemples = ", ".join(" / ".join(cle) for cle in manquantes[:3])
+        erreurs.append(f"{len(manquantes)} combinaison(s) manquante(s), p. ex. {exemples}")
+    return erreurs
+
+
+class GrilleImportance:
+    """Grille validée et compilée ; ``tableau`` est indexé par les codes d'intensité, d'étendue et de durée"""
+
+    __slots__ = ("nom", "table", "defaut", "tableau")
+
+    def __init__(self, nom, table, defaut=IMPORTANCE_PAR_DEFAUT):
+        erreurs = valider_table(table, defaut)
+        if erreurs:
+            raise ValueError(f"Grille « {nom} » invalide : " + " ; ".join(erreurs))
+        self.nom = nom
+        self.table = dict(table)
+        self.defaut = defaut
+        self.tableau = compiler_grille(self.table, defaut)
+        self.tableau.flags.writeable = False
+
+    def evaluer(self, intensite, etendue, duree) -> str:
+        """Importance d'un impact ; ``defaut`` pour un libellé absent ou inconnu"""
+        cle = ((intensite or "").lower(), (etendue or "").lower(), (duree or "").lower())
+        return self.table.get(cle, self.defaut)
+
+    def evaluer_lot(self, intensites, etendues, durees) -> pd.Series:
+        return evaluer_importance_lot(intensites, etendues, durees, self.tableau)
+
+    def __eq__(self, other):
+        if not isinstance(other, GrilleImportance):
+            return NotImplemented
+        return self.defaut == other.defaut and np.array_equal(self.tableau, other.tableau)
+
+    __hash__ = None
+
+    def en_dict(self) -> dict:
+        grille: Dict[str, Dict[str, Dict[str, str]]] = {}
+        for (intensite, etendue, duree), importance in sorted(
+                self.table.items(),
+                key=lambda item: (INTENSITES.index(item[0][0]), ETENDUES.index(item[0][1]), DUREES.index(item[0][2]))):
+            grille.setdefault(intensite, {}).setdefault(etendue, {})[duree] = importance
+        return {"nom": self.nom, "defaut": self.defaut, "grille": grille}
+
+    def en_json(self) -> str:
+        return json.dumps(self.en_dict(), ensure_ascii=False)
+
+    @classmethod
+    def depuis_dict(cls, donnees: dict, nom: Optional[str] = None) -> "GrilleImportance":
+        nom = donnees.get("nom") or nom or "Grille"
+        table = {}
+        for intensite, etendues in donnees.get("grille", {}).items():
+            for etendue, durees in etendues.items():
+                for duree, importance in durees.items():
+                    table[(intensite.strip().lower(), etendue.strip().lower(), duree.strip().lower())] = \
+                        _NIVEAUX_NORMALISES.get(_normaliser(importance), importance)
+        defaut = donnees.get("defaut", IMPORTANCE_PAR_DEFAUT)
+        return cls(nom, table, _NIVEAUX_NORMALISES.get(_normaliser(defaut), defaut))
+
+
+GRILLE_STANDARD = GrilleImportance("Standard", TABLE_IMPORTANCE)
+
+
+def _lire_csv(source, nom) -> GrilleImportance:
+    df = pd.read_csv(source, sep=None, engine="python", dtype=str, keep_default_na=False, encoding="utf-8-sig")
+    colonnes = {_normaliser(col): col for col in df.columns}
+    manquantes = [col for col in COLONNES_GRILLE if _normaliser(col) not in colonnes]
+    if manquantes:
+        raise ValueError(f"Grille « {nom} » : colonnes absentes : {', '.join(manquantes)}")
+    intensites, etendues, durees, importances = (df[colonnes[_normaliser(col)]] for col in COLONNES_GRILLE)
+
+    table, erreurs = {}, []
+    for ligne, (intensite, etendue, duree, importance) in enumerate(
+            zip(intensites.str.strip().str.lower(), etendues.str.strip().str.lower(),
+                durees.str.strip().str.lower(), importances), start=2):
+        importance = _NIVEAUX_NORMALISES.get(_normaliser(importance), importance)
+        cle = (intensite, etendue, duree)
+        if table.get(cle, importance) != importance:
+            erreurs.append(f"ligne {ligne} : {' / '.join(cle)} déjà défini avec {table[cle]!r}")
+        table[cle] = importance
+    if erreurs:
+        raise ValueError(f"Grille « {nom} » invalide : " + " ; ".join(erreurs))
+    return GrilleImportance(nom, table)
+
+
+def lire_grille(source, nom: Optional[str] = None) -> GrilleImportance:
+    """Lit et valide une grille CSV ou JSON (chemin ou fichier ouvert) ; ValueError si elle est invalide
+
+    Sans nom dans le fichier ni ``nom``, la grille prend le nom du fichier.
+    """
+    chemin = source if isinstance(source, (str, os.PathLike)) else getattr(source, "name", "")
+    nom_fichier, extension = os.path.splitext(os.path.basename(str(chemin)))
+    nom = nom or nom_fichier or "Grille"
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            contenu = f.read()
+    else:
+        contenu = source.read()
+        if isinstance(contenu, str):
+            contenu = contenu.encode("utf-8")
+    # JSON reconnu à son extension ou, sans nom de fichier, à son premier caractère
+    if extension.lower() == ".json" or (not extension and contenu.lstrip()[:1] == b"{"):
+        try:
+            return GrilleImportance.depuis_dict(json.loads(contenu), nom)
+        except (AttributeError, TypeError) as e:
+            raise ValueError(f"Grille « {nom} » : structure JSON inattendue ({e})") from e
+    return _lire_csv(io.BytesIO(contenu), nom)
+
+
+def ecrire_grille_csv(grille: GrilleImportance) -> bytes:
+    """Grille au format CSV (modèle à compléter pour une nouvelle grille)"""
+    lignes = [
+        {"Intensité": intensite, "Étendue": etendue, "Durée": duree, "Importance": grille.table[(intensite, etendue, duree)]}
+        for intensite in INTENSITES for etendue in ETENDUES for duree in DUREES
+    ]
+    return pd.DataFrame(lignes).to_csv(index=False, sep=";").encode("utf-8")
+
+
+def charger_grilles(repertoire: str = REPERTOIRE_GRILLES) -> Tuple[Dict[str, GrilleImportance], List[Tuple[str, str]]]:
+    """Grilles disponibles (Standard puis fichiers du répertoire, par nom) et fichiers rejetés (fichier, motif)"""
+    grilles = {GRILLE_STANDARD.nom: GRILLE_STANDARD}
+    rejets = []
+    if os.path.isdir(repertoire):
+        for fichier in sorted(os.listdir(repertoire)):
+            if not fichier.lower().endswith(EXTENSIONS_GRILLE):
+                continue
+            try:
+                grille = lire_grille(os.path.join(repertoire, fichier))
+            except (ValueError, OSError, json.JSONDecodeError, pd.errors.ParserError) as e:
+                rejets.append((fichier, str(e)))
+                continue
+            grilles[grille.nom] = grille
+    return grilles, rejets
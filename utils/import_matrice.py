@@ -0,0 +1,174 @@
+# import_matrice.py
+# Import en lot d'une matrice d'impacts (export CSV de leopold ou classeur Excel) dans un Project.
+
+import os
+import re
+import zipfile
+from typing import Iterator, List, Optional, Tuple
+from xml.etree.ElementTree import ParseError
+
+import numpy as np
+import pandas as pd
+
+from utils.matrice import HIERARCHIE, ORDRE_COMPOSANTES, ORDRE_PHASES
+from utils.projet import NATURES, Impact, Project
+from utils.utils1 import DUREES, ETENDUES, INTENSITES, NIVEAUX_IMPORTANCE
+
+COLONNES_OBLIGATOIRES = ["Phase", "Activité", "Composante", "Milieu", "Nature impact"]
+COLONNES_GRILLE = ["Intensité", "Étendue", "Durée"]
+TAILLE_BLOC = 2000
+# Erreurs des lecteurs Excel sur un fichier corrompu ou qui n'est pas un classeur xlsx
+ERREURS_CLASSEUR = (zipfile.BadZipFile, KeyError, ParseError)
+
+
+class RapportImport:
+    """Bilan d'un import : impacts retenus et lignes rejetées (numéro de ligne du fichier, motif)"""
+
+    __slots__ = ("impacts", "remplaces", "erreurs")
+
+    def __init__(self):
+        self.impacts = 0
+        self.remplaces = 0
+        self.erreurs: List[Tuple[int, str]] = []
+
+
+def _format(source, format_fichier: Optional[str]) -> str:
+    if format_fichier:
+        return format_fichier.lower().lstrip(".")
+    nom = source if isinstance(source, (str, os.PathLike)) else getattr(source, "name", "")
+    extension = os.path.splitext(str(nom))[1].lower().lstrip(".")
+    if extension == "xls":
+        # Lecture des anciens classeurs par xlrd, absent des dépendances
+        raise ValueError("Classeur .xls non pris en charge : enregistrez-le au format .xlsx")
+    return "xlsx" if extension in ("xlsx", "xlsm") else "csv"
+
+
+def _deplier_hierarchie(df: pd.DataFrame) -> pd.DataFrame:
+    """Défait la mise en forme de l'export Excel de leopold (utils/export_matrice.ecrire_excel)
+
+    Les cellules Phase/Activité/Composante y sont fusionnées : seule la première ligne du
+    groupe est renseignée, les suivantes sont lues vides et reprennent la valeur précédente.
+    Une colonne dont toutes les valeurs portent la numérotation de l'export (« 1.2. Activité »)
+    en est débarrassée.
+    """
+    for niveau, col in enumerate(HIERARCHIE):
+        if col not in df:
+            continue
+        valeurs = df[col].replace("", np.nan).ffill()
+        presentes = valeurs.dropna()
+        numero = re.compile(r"^\d+" + r"\.\d+" * niveau + r"\. ")
+        if not presentes.empty and presentes.str.match(numero).all():
+            valeurs = valeurs.str.replace(numero, "", n=1, regex=True)
+        df[col] = valeurs.fillna("")
+    return df
+
+
+def lire_blocs(source, format_fichier: Optional[str] = None, sep=";", taille_bloc=TAILLE_BLOC) -> Iterator[pd.DataFrame]:
+    """Lit le fichier par blocs de lignes, toutes les valeurs en texte ('' pour une cellule vide)
+
+    Un fichier illisible (classeur corrompu, encodage ou CSV invalide) lève ValueError.
+    """
+    if _format(source, format_fichier) == "csv":
+        # Encodage ou syntaxe invalide : UnicodeDecodeError et pd.errors.ParserError sont des ValueError
+        yield from pd.read_csv(source, sep=sep, dtype=str, keep_default_na=False,
+                               encoding="utf-8-sig", chunksize=taille_bloc)
+    else:
+        # Les classeurs sont lus en entier par pandas, puis traités par blocs comme un CSV
+        try:
+            df = pd.read_excel(source, dtype=str)
+        except ERREURS_CLASSEUR as e:
+            raise ValueError(f"Classeur Excel illisible : {e}") from e
+        df = _deplier_hierarchie(df.fillna(""))
+        for debut in range(0, len(df), taille_bloc):
+            yield df.iloc[debut:debut + taille_bloc]
+
+
+def _valider(bloc: pd.DataFrame, grille: bool) -> pd.Series:
+    """Retourne le motif de rejet de chaque ligne ('' si la ligne est valide)"""
+    motifs = pd.Series("", index=bloc.index)
+
+    def signaler(masque, message):
+        motifs[masque & (motifs == "")] = message
+
+    for col in COLONNES_OBLIGATOIRES:
+        signaler(bloc[col].str.strip() == "", f"{col} manquant(e)")
+    signaler(~bloc["Phase"].isin(ORDRE_PHASES), "Phase inconnue")
+    signaler(~bloc["Composante"].isin(ORDRE_COMPOSANTES), "Composante inconnue")
+    signaler(~bloc["Nature impact"].isin(NATURES), "Nature d'impact inconnue")
+    evalue = bloc["Nature impact"] != "risque impact"
+    if grille:
+        for col, valeurs in zip(COLONNES_GRILLE, (INTENSITES, ETENDUES, DUREES)):
+            signaler(evalue & ~bloc[col].str.lower().isin(valeurs), f"{col} invalide")
+    elif "Importance" in bloc:
+        signaler(evalue & ~bloc["Importance"].isin(NIVEAUX_IMPORTANCE), "Importance invalide")
+    else:
+        signaler(evalue, "Colonnes Intensité/Étendue/Durée ou Importance absentes")
+    return motifs
+
+
+def importer_matrice(source, projet: Optional[Project] = None, format_fichier: Optional[str] = None,
+                     sep=";", taille_bloc=TAILLE_BLOC) -> Tuple[Project, RapportImport]:
+    """Importe une matrice (format de l'export CSV de leopold, ou Excel) dans ``projet``
+
+    La hiérarchie phase/activité est construite dans l'ordre d'apparition des lignes.
+    L'importance est recalculée en lot (grille du projet) à partir des colonnes
+    Intensité/Étendue/Durée lorsqu'elles sont présentes, reprise de la colonne Importance
+    sinon. Les lignes invalides sont ignorées et listées dans le rapport.
+
+    ``projet`` n'est modifié qu'une fois tout le fichier lu : un fichier illisible en cours
+    de lecture lève ValueError sans laisser d'import partiel.
+    """
+    projet = projet if projet is not None else Project()
+    rapport = RapportImport()
+    ligne_fichier = 2  # ligne 1 : en-tête
+    # Impacts lus, regroupés par activité pour une insertion en lot dans les index du projet
+    lots = {}
+
+    for bloc in lire_blocs(source, format_fichier, sep, taille_bloc):
+        manquantes = [col for col in COLONNES_OBLIGATOIRES if col not in bloc.columns]
+        if manquantes:
+            raise ValueError(f"Colonnes obligatoires absentes : {', '.join(manquantes)}")
+        bloc = bloc.reset_index(drop=True)
+        grille = all(col in bloc.columns for col in COLONNES_GRILLE)
+
+        motifs = _valider(bloc, grille)
+        for i in np.flatnonzero(motifs.to_numpy() != ""):
+            rapport.erreurs.append((ligne_fichier + int(i), motifs.iat[i]))
+        ligne_fichier += len(bloc)
+        bloc = bloc[motifs == ""]
+        if bloc.empty:
+            continue
+
+        risque = (bloc["Nature impact"] == "risque impact").to_numpy()
+        if grille:
+            intensites = bloc["Intensité"].str.lower()
+            etendues = bloc["Étendue"].str.lower()
+            durees = bloc["Durée"].str.lower()
+            importances = projet.grille.evaluer_lot(intensites, etendues, durees).astype(object)
+        else:
+            intensites = etendues = durees = pd.Series(None, index=bloc.index, dtype=object)
+            importances = bloc["Importance"].astype(object)
+        importances = np.where(risque, "risque impact", importances.to_numpy())
+        sans_grille = risque | (not grille)
+        colonnes = zip(
+            bloc["Phase"], bloc["Activité"].str.strip(), bloc["Composante"], bloc["Milieu"].str.strip(),
+            bloc["Nature impact"], bloc.get("Impact appréhendé", pd.Series("", index=bloc.index)),
+            np.where(sans_grille, None, intensites), np.where(sans_grille, None, etendues),
+            np.where(sans_grille, None, durees),
+            bloc.get("Mesure atténuation", pd.Series("", index=bloc.index)), importances,
+        )
+
+        for phase, activite, composante, milieu, nature, description, intensite, etendue, duree, attenuation, importance in colonnes:
+            lots.setdefault((phase, activite), []).append(Impact(
+                composante, milieu, nature, description, intensite, etendue, duree,
+                attenuation if nature != "positif" and attenuation else None, importance
+            ))
+
+    for (phase, activite), impacts in lots.items():
+        activity = projet.add_phase(phase).add_activity(activite)
+        avant = len(activity._impacts)
+        activity.upsert_impacts(impacts)
+        rapport.impacts += len(impacts)
+        rapport.remplaces += avant + len(impacts) - len(activity._impacts)
+
+    return projet, rapport
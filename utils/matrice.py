@@ -0,0 +1,210 @@
+# matrice.py
+# Rendu HTML de la matrice d'impacts (cellules fusionnées et numérotation hiérarchique).
+
+import html
+
+import numpy as np
+import pandas as pd
+
+from utils.diagnostics import mesure
+from utils.utils1 import CLASSE_PAR_DEFAUT, CLASSES_IMPORTANCE, STYLE_IMPORTANCE, categories_completees, codes_categories
+
+ORDRE_PHASES = ["Préconstruction", "Construction", "Exploitation/Entretien", "Démantèlement"]
+ORDRE_COMPOSANTES = ["Physique", "Biologique", "Humain"]
+HIERARCHIE = ["Phase", "Activité", "Composante"]
+# Colonnes de détail -> position parmi les cellules qui suivent la hiérarchie
+COLONNES_DETAIL = {"Milieu": 0, "Nature impact": 1, "Importance": 2, "Impact appréhendé": 3, "Mesure atténuation": 4}
+
+
+def _codes_tri(serie, categories=None):
+    """Clés de tri entières d'une colonne : rang dans ``categories``, ou ordre alphabétique des valeurs
+
+    Les valeurs absentes ou hors ``categories`` sont placées en dernier.
+    """
+    if categories is not None:
+        codes = codes_categories(serie, categories).astype(np.int64)
+    else:
+        if not isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype("category")
+        # Rang alphabétique de chaque catégorie, appliqué aux codes
+        rangs = np.argsort(np.argsort(serie.cat.categories.astype(str), kind="stable"))
+        codes = serie.cat.codes.to_numpy().astype(np.int64)
+        codes = np.where(codes >= 0, rangs[np.maximum(codes, 0)], -1)
+    return np.where(codes >= 0, codes, np.iinfo(np.int64).max)
+
+
+def trier_matrice(df, autres_colonnes=()):
+    """Trie les impacts par phase, ordre d'activité, composante et milieu
+
+    Seules les colonnes affichées sont conservées, plus ``autres_colonnes``. L'ordre est
+    calculé sur les codes entiers (np.lexsort, stable) puis appliqué en une seule copie.
+    """
+    colonnes = [
+        "Phase", "Activité",
+        "Composante", "Milieu",
+        "Nature impact", "Importance", "Impact appréhendé", "Mesure atténuation",
+        *autres_colonnes
+    ]
+    ordre = np.lexsort((
+        _codes_tri(df["Milieu"]),
+        _codes_tri(df["Composante"], ORDRE_COMPOSANTES),
+        df["OrdreActivité"].to_numpy(),
+        _codes_tri(df["Phase"], ORDRE_PHASES),
+    ))
+    trie = df[colonnes].take(ordre).reset_index(drop=True)
+    # Phases et composantes hors référentiel gardent leur libellé, rangées après les autres
+    trie["Phase"] = pd.Categorical(trie["Phase"], categories=categories_completees(trie["Phase"], ORDRE_PHASES), ordered=True)
+    trie["Composante"] = pd.Categorical(
+        trie["Composante"], categories=categories_completees(trie["Composante"], ORDRE_COMPOSANTES), ordered=True
+    )
+    return trie
+
+
+def calculer_fusion(df):
+    """Calcule en une passe vectorisée les rowspans et la numérotation 1.2.3 des colonnes hiérarchiques
+
+    ``df`` doit être trié (voir ``trier_matrice``). Pour chaque colonne de HIERARCHIE,
+    retourne un tableau de rowspans (0 hors début de groupe) et un tableau de numéros
+    relatifs au groupe parent.
+    """
+    n = len(df)
+    positions = np.arange(n)
+    debut_parent = np.zeros(n, dtype=bool)
+    debut_parent[:1] = True
+    rowspans, numeros = {}, {}
+    for col in HIERARCHIE:
+        codes = pd.factorize(df[col], use_na_sentinel=True)[0]
+        debut = debut_parent.copy()
+        debut[1:] |= codes[1:] != codes[:-1]
+
+        # Longueur des séquences : distance entre deux débuts de groupe consécutifs
+        indices_debut = np.flatnonzero(debut)
+        span = np.zeros(n, dtype=np.int64)
+        span[indices_debut] = np.diff(np.append(indices_debut, n))
+        rowspans[col] = span
+
+        # Numéro = rang du groupe depuis le dernier début de groupe parent
+        rang = np.cumsum(debut)
+        dernier_parent = np.maximum.accumulate(np.where(debut_parent, positions, 0))
+        numeros[col] = rang - rang[dernier_parent] + 1
+
+        debut_parent = debut
+    return rowspans, numeros
+
+
+ENTETE_HTML = """
+    <style>
+    table { border-collapse: collapse; width: 100%; margin-top: 20px; font-family: Arial, sans-serif; }
+    th, td { border: 1px solid #ddd; padding: 10px; text-align: left; vertical-align: top; }
+    th { background-color: #f2f2f2; font-weight: bold; }
+    .hier-number { font-weight: bold; margin-right: 5px; }
+    .suite { color: #888; font-style: italic; }
+    """ + STYLE_IMPORTANCE + """
+    </style>
+    <table>
+    <thead>
+        <tr>
+        <th>Phase</th><th>Activité</th><th>Composante</th><th>Milieu</th>
+        <th>Nature impact</th><th>Importance</th><th>Impact appréhendé</th><th>Mesure atténuation</th>
+        </tr>
+    </thead>
+    <tbody>
+    """
+PIED_HTML = "</tbody></table>"
+
+
+def pages_matrice(rowspans, nb_lignes, taille_page=None):
+    """Découpe la matrice triée en intervalles [début, fin) : par taille fixe, ou par phase si taille_page est None"""
+    if taille_page is None:
+        debuts = np.flatnonzero(rowspans["Phase"])
+        return [(int(d), int(d + rowspans["Phase"][d])) for d in debuts]
+    return [(d, min(d + taille_page, nb_lignes)) for d in range(0, nb_lignes, taille_page)]
+
+
+def iter_lignes_html(df, rowspans, numeros, debut=0, fin=None, taille_bloc=500,
+                     classes_lignes=None, anciennes=None):
+    """Génère les lignes <tr> de l'intervalle [debut, fin) par blocs de ``taille_bloc`` lignes
+
+    ``df`` est la matrice triée, ``rowspans``/``numeros`` viennent de ``calculer_fusion``.
+    Les rowspans sont tronqués à la fin de l'intervalle ; un groupe commencé avant
+    ``debut`` est répété en tête d'intervalle avec la mention « suite ».
+    ``classes_lignes`` donne la classe CSS de chaque <tr> et ``anciennes`` associe à une
+    colonne de détail le tableau des valeurs précédentes (None si inchangée), affichées barrées.
+    """
+    fin = len(df) if fin is None else min(fin, len(df))
+    colonnes = [df[col].to_numpy() for col in HIERARCHIE]
+    prefixes = [numeros[col].astype(str) for col in HIERARCHIE]
+    spans = [rowspans[col] for col in HIERARCHIE]
+    details = zip(*(df[col].to_numpy()[debut:fin] for col in
+                    ("Milieu", "Nature impact", "Importance", "Impact appréhendé", "Mesure atténuation")))
+    anciennes = {col: valeurs for col, valeurs in (anciennes or {}).items() if col in COLONNES_DETAIL}
+
+    bloc = []
+    for i, (milieu, nature, importance, impact_desc, attenuation) in zip(range(debut, fin), details):
+        bloc.append(f'<tr class="{classes_lignes[i]}">' if classes_lignes is not None else "<tr>")
+        for niveau in range(len(HIERARCHIE)):
+            span = spans[niveau][i]
+            suite = ""
+            if not span and i == debut:
+                # Groupe entamé sur l'intervalle précédent : lignes restantes depuis son début
+                depart = np.flatnonzero(spans[niveau][:i + 1])[-1]
+                span = depart + spans[niveau][depart] - i
+                suite = ' <span class="suite">(suite)</span>'
+            if span:
+                prefix = ".".join(prefixes[c][i] for c in range(niveau + 1)) + "."
+                text = html.escape(str(colonnes[niveau][i]))
+                bloc.append(f'<td rowspan="{min(span, fin - i)}"><span class="hier-number">{prefix}</span>{text}{suite}</td>')
+
+        # Cellules avec préservation des retours à la ligne via <br>
+        classe = CLASSES_IMPORTANCE.get((nature, importance), CLASSE_PAR_DEFAUT)
+        impact_desc = html.escape(str(impact_desc)).replace('\n', '<br/>')
+        attenuation = html.escape(str(attenuation)).replace('\n', '<br/>')
+
+        cellules = [html.escape(str(milieu)), html.escape(str(nature)), html.escape(str(importance)),
+                    impact_desc, attenuation]
+        for col, valeurs in anciennes.items():
+            if valeurs[i] is not None:
+                position = COLONNES_DETAIL[col]
+                ancienne = html.escape(str(valeurs[i])).replace('\n', '<br/>')
+                cellules[position] = f"<del>{ancienne}</del> {cellules[position]}"
+
+        bloc.append(f"<td>{cellules[0]}</td>")
+        bloc.append(f"<td>{cellules[1]}</td>")
+        bloc.append(f'<td class="{classe}">{cellules[2]}</td>')
+        bloc.append(f'<td>{cellules[3]}</td>')
+        bloc.append(f'<td>{cellules[4]}</td>')
+        bloc.append("</tr>")
+
+        if (i - debut + 1) % taille_bloc == 0:
+            yield "".join(bloc)
+            bloc = []
+    if bloc:
+        yield "".join(bloc)
+
+
+def iter_tableau_html(df, rowspans, numeros, debut=0, fin=None, taille_bloc=500,
+                      classes_lignes=None, anciennes=None):
+    """Génère un document <table> complet (en-tête, lignes par blocs, pied) pour l'intervalle [debut, fin)"""
+    yield ENTETE_HTML
+    yield from iter_lignes_html(df, rowspans, numeros, debut, fin, taille_bloc, classes_lignes, anciennes)
+    yield PIED_HTML
+
+
+def ecrire_tableau_html(df, fichier, taille_bloc=500):
+    """Écrit la matrice complète dans un fichier texte ouvert, bloc par bloc"""
+    df = trier_matrice(df)
+    rowspans, numeros = calculer_fusion(df)
+    for morceau in iter_tableau_html(df, rowspans, numeros, taille_bloc=taille_bloc):
+        fichier.write(morceau)
+
+
+@mesure("matrice.tableau_html")
+def tableau_html(df, rowspans, numeros, debut=0, fin=None):
+    """Document <table> de l'intervalle [debut, fin) en une seule chaîne (page de la matrice)"""
+    return "".join(iter_tableau_html(df, rowspans, numeros, debut, fin))
+
+
+def tableau_html_fusion(df):
+    df = trier_matrice(df)
+    rowspans, numeros = calculer_fusion(df)
+    return tableau_html(df, rowspans, numeros)
@@ -0,0 +1,310 @@
+# modeles.py
+# Bibliothèque d'activités types (défrichement, terrassement, bétonnage, ...) avec
+# tous leurs impacts par composante/milieu, instanciables en une opération.
+#
+# Les modèles sont validés une fois au chargement et indexés par nom et par phase.
+# L'importance de leurs impacts est calculée en un lot par grille (et mémorisée) :
+# instancier un modèle ne réévalue rien, les impacts sont insérés d'un bloc dans
+# l'activité (une seule incrémentation de version). Les modèles intégrés sont
+# complétés par les fichiers JSON de REPERTOIRE_MODELES.
+
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utils.grilles import GRILLE_STANDARD, GrilleImportance
+from utils.matrice import ORDRE_COMPOSANTES, ORDRE_PHASES
+from utils.projet import NATURES, NATURES_ATTENUEES, Impact, Project
+from utils.utils1 import DUREES, ETENDUES, INTENSITES
+
+REPERTOIRE_MODELES = os.environ.get(
+    "SUITE_MODELES", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "modeles")
+)
+# Champs d'un impact de modèle, dans l'ordre des arguments de Impact (sans l'importance)
+CHAMPS_IMPACT = ("composante", "milieu", "nature", "impact", "intensite", "etendue", "duree", "attenuation")
+GRILLES_MEMORISEES = 8
+
+
+def _impact(composante, milieu, nature, impact, intensite=None, etendue=None, duree=None, attenuation=None):
+    return {"composante": composante, "milieu": milieu, "nature": nature, "impact": impact,
+            "intensite": intensite, "etendue": etendue, "duree": duree, "attenuation": attenuation}
+
+
+# Activités types d'un projet routier
+MODELES_STANDARD = [
+    {"nom": "Défrichement et déboisement", "phases": ["Préconstruction", "Construction"], "impacts": [
+        _impact("Physique", "Sol", "négatif", "Érosion des sols mis à nu", "forte", "locale", "moyen terme",
+                "Limiter le déboisement à l'emprise ; stabiliser les talus dès le décapage"),
+        _impact("Physique", "Eau", "négatif", "Apport de sédiments aux cours d'eau", "moyenne", "locale", "court terme",
+                "Barrières à sédiments et bassins de décantation"),
+        _impact("Biologique", "Flore", "négatif", "Perte de couvert végétal", "forte", "ponctuelle", "long terme",
+                "Reboisement compensatoire"),
+        _impact("Biologique", "Faune", "négatif", "Perte et fragmentation d'habitats", "forte", "locale", "long terme",
+                "Déboisement hors période de nidification"),
+        _impact("Humain", "Économie locale", "positif", "Valorisation du bois abattu", "faible", "locale", "court terme"),
+    ]},
+    {"nom": "Terrassement", "phases": ["Construction"], "impacts": [
+        _impact("Physique", "Sol", "négatif", "Modification du relief et compactage", "forte", "ponctuelle", "long terme",
+                "Réutiliser les déblais ; régaler la terre végétale"),
+        _impact("Physique", "Air", "négatif", "Émission de poussières", "moyenne", "locale", "court terme",
+                "Arrosage des pistes par temps sec"),
+        _impact("Physique", "Eau", "risque impact", "Déversement accidentel d'hydrocarbures",
+                attenuation="Kits antipollution sur chantier ; ravitaillement sur aire étanche"),
+        _impact("Biologique", "Faune", "négatif", "Dérangement par le bruit et les vibrations", "moyenne", "locale",
+                "court terme", "Horaires de travaux adaptés"),
+        _impact("Humain", "Cadre de vie", "négatif", "Nuisances sonores pour les riverains", "moyenne", "locale",
+                "court terme", "Information des riverains ; écrans temporaires"),
+        _impact("Humain", "Emploi", "positif", "Création d'emplois temporaires", "moyenne", "régionale", "court terme"),
+    ]},
+    {"nom": "Bétonnage des ouvrages", "phases": ["Construction"], "impacts": [
+        _impact("Physique", "Eau", "négatif", "Rejet d'eaux de lavage alcalines", "moyenne", "ponctuelle", "court terme",
+                "Aire de lavage des toupies avec bac de décantation"),
+        _impact("Physique", "Sol", "risque impact", "Contamination par laitance de béton",
+                attenuation="Récupération et évacuation des laitances"),
+        _impact("Physique", "Air", "négatif", "Émissions liées à la production de béton", "faible", "régionale",
+                "court terme", "Approvisionnement en centrale proche"),
+        _impact("Humain", "Santé et sécurité", "risque impact", "Accidents de travail",
+                attenuation="Plan de prévention ; équipements de protection"),
+        _impact("Humain", "Économie locale", "positif", "Achats de matériaux locaux", "moyenne", "régionale", "court terme"),
+    ]},
+    {"nom": "Circulation d'engins", "phases": ["Construction", "Démantèlement"], "impacts": [
+        _impact("Physique", "Air", "négatif", "Émissions de gaz d'échappement et de poussières", "moyenne", "locale",
+                "court terme", "Entretien des engins ; limitation de vitesse sur les pistes"),
+        _impact("Physique", "Sol", "négatif", "Orniérage et compactage", "faible", "ponctuelle", "moyen terme",
+                "Circulation limitée aux pistes balisées"),
+        _impact("Physique", "Eau", "risque impact", "Fuite d'huile ou de carburant",
+                attenuation="Inspection quotidienne des engins ; kits antipollution"),
+        _impact("Biologique", "Faune", "négatif", "Risque de collision et dérangement", "faible", "locale", "court terme",
+                "Sensibilisation des conducteurs"),
+        _impact("Humain", "Circulation routière", "négatif", "Perturbation du trafic local", "moyenne", "locale",
+                "court terme", "Plan de circulation et signalisation temporaire"),
+        _impact("Humain", "Santé et sécurité", "risque impact", "Accidents impliquant des usagers",
+                attenuation="Signaleurs aux accès du chantier"),
+    ]},
+    {"nom": "Trafic routier", "phases": ["Exploitation/Entretien"], "impacts": [
+        _impact("Physique", "Air", "négatif", "Émissions polluantes du trafic", "moyenne", "régionale", "long terme",
+                "Plantations en bordure ; limitation de vitesse"),
+        _impact("Physique", "Eau", "négatif", "Ruissellement chargé en polluants", "moyenne", "locale", "long terme",
+                "Bassins de rétention et fossés enherbés"),
+        _impact("Biologique", "Faune", "négatif", "Mortalité par collision", "forte", "locale", "long terme",
+                "Passages à faune et clôtures"),
+        _impact("Humain", "Cadre de vie", "négatif", "Bruit routier", "moyenne", "locale", "long terme",
+                "Écrans acoustiques"),
+        _impact("Humain", "Mobilité", "positif", "Amélioration de la desserte", "forte", "régionale", "long terme"),
+    ]},
+]
+
+
+def valider_modele(donnees: dict) -> List[str]:
+    """Liste les problèmes d'un modèle au format JSON (vide s'il est valide)"""
+    erreurs = []
+    if not str(donnees.get("nom") or "").strip():
+        erreurs.append("nom manquant")
+    for phase in donnees.get("phases") or ():
+        if phase not in ORDRE_PHASES:
+            erreurs.append(f"phase inconnue : {phase!r}")
+    impacts = donnees.get("impacts") or ()
+    if not impacts:
+        erreurs.append("aucun impact")
+    cles = set()
+    for i, impact in enumerate(impacts, start=1):
+        composante, milieu, nature = impact.get("composante"), str(impact.get("milieu") or "").strip(), impact.get("nature")
+        if composante not in ORDRE_COMPOSANTES:
+            erreurs.append(f"impact {i} : composante inconnue : {composante!r}")
+        if not milieu:
+            erreurs.append(f"impact {i} : milieu manquant")
+        if nature not in NATURES:
+            erreurs.append(f"impact {i} : nature inconnue : {nature!r}")
+        elif nature != "risque impact":
+            for champ, valeurs in (("intensite", INTENSITES), ("etendue", ETENDUES), ("duree", DUREES)):
+                if str(impact.get(champ) or "").strip().lower() not in valeurs:
+                    erreurs.append(f"impact {i} : {champ} invalide : {impact.get(champ)!r}")
+        if (composante, milieu) in cles:
+            erreurs.append(f"impact {i} : {composante} / {milieu} en double")
+        cles.add((composante, milieu))
+    return erreurs
+
+
+class ModeleActivite:
+    """Activité type validée ; ``impacts`` contient les valeurs de CHAMPS_IMPACT, normalisées"""
+
+    __slots__ = ("nom", "phases", "impacts", "_importances")
+
+    def __init__(self, nom, phases: Sequence[str], impacts: Sequence[Tuple]):
+        self.nom = nom
+        self.phases = tuple(phases)
+        self.impacts = tuple(impacts)
+        # Grille -> importances des impacts (calculées une fois par grille)
+        self._importances: List[Tuple[GrilleImportance, Tuple[str, ...]]] = []
+
+    @classmethod
+    def depuis_dict(cls, donnees: dict) -> "ModeleActivite":
+        erreurs = valider_modele(donnees)
+        if erreurs:
+            raise ValueError(f"Modèle « {donnees.get('nom') or '?'} » invalide : " + " ; ".join(erreurs))
+        impacts = []
+        for impact in donnees["impacts"]:
+            nature = impact["nature"]
+            evalue = nature != "risque impact"
+            attenuation = impact.get("attenuation") if nature in NATURES_ATTENUEES else None
+            impacts.append((
+                impact["composante"], impact["milieu"].strip(), nature, impact.get("impact") or "",
+                *(impact[champ].strip().lower() if evalue else None for champ in ("intensite", "etendue", "duree")),
+                attenuation or None,
+            ))
+        return cls(donnees["nom"].strip(), donnees.get("phases") or (), impacts)
+
+    def en_dict(self) -> dict:
+        return {"nom": self.nom, "phases": list(self.phases),
+                "impacts": [dict(zip(CHAMPS_IMPACT, impact)) for impact in self.impacts]}
+
+    def _importances_connues(self, grille: GrilleImportance) -> Optional[Tuple[str, ...]]:
+        for connue, importances in self._importances:
+            if connue is grille or connue == grille:
+                return importances
+        return None
+
+    def importances(self, grille: GrilleImportance = GRILLE_STANDARD) -> Tuple[str, ...]:
+        """Importance de chaque impact selon ``grille`` (calculée au premier appel, voir precalculer)"""
+        importances = self._importances_connues(grille)
+        if importances is None:
+            precalculer([self], grille)
+            importances = self._importances[-1][1]
+        return importances
+
+    def creer_impacts(self, grille: GrilleImportance = GRILLE_STANDARD) -> List[Impact]:
+        """Nouveaux objets Impact (un projet peut les modifier), importance déjà calculée"""
+        return [Impact(*impact, importance) for impact, importance in zip(self.impacts, self.importances(grille))]
+
+
+class BibliothequeModeles:
+    """Modèles indexés par nom et par phase suggérée (ordre de chargement conservé)"""
+
+    __slots__ = ("modeles", "par_phase")
+
+    def __init__(self, modeles: Iterable[ModeleActivite] = ()):
+        self.modeles: Dict[str, ModeleActivite] = {}
+        self.par_phase: Dict[str, List[str]] = {phase: [] for phase in ORDRE_PHASES}
+        for modele in modeles:
+            self.ajouter(modele)
+
+    def ajouter(self, modele: ModeleActivite):
+        """Ajoute ou remplace (même nom) un modèle"""
+        ancien = self.modeles.pop(modele.nom, None)
+        if ancien is not None:
+            for phase in ancien.phases:
+                self.par_phase[phase].remove(ancien.nom)
+        self.modeles[modele.nom] = modele
+        for phase in modele.phases:
+            self.par_phase.setdefault(phase, []).append(modele.nom)
+
+    def __getitem__(self, nom) -> ModeleActivite:
+        return self.modeles[nom]
+
+    def __contains__(self, nom) -> bool:
+        return nom in self.modeles
+
+    def __len__(self):
+        return len(self.modeles)
+
+    @property
+    def noms(self) -> List[str]:
+        return list(self.modeles)
+
+    def pour_phase(self, phase) -> List[ModeleActivite]:
+        return [self.modeles[nom] for nom in self.par_phase.get(phase, ())]
+
+
+def lire_modeles(source) -> List[ModeleActivite]:
+    """Lit un fichier JSON de modèles (chemin ou fichier ouvert) : un modèle, une liste, ou {"modeles": [...]}
+
+    ValueError si un modèle est invalide.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            donnees = json.load(f)
+    else:
+        donnees = json.load(source)
+    if isinstance(donnees, dict):
+        donnees = donnees.get("modeles", [donnees])
+    if not isinstance(donnees, list) or not all(isinstance(modele, dict) for modele in donnees):
+        raise ValueError("Structure JSON inattendue : liste de modèles attendue")
+    return [ModeleActivite.depuis_dict(modele) for modele in donnees]
+
+
+def ecrire_modeles_json(modeles: Iterable[ModeleActivite]) -> bytes:
+    return json.dumps({"modeles": [modele.en_dict() for modele in modeles]}, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def modeles_depuis_projet(project: Project) -> List[ModeleActivite]:
+    """Un modèle par activité du projet (phase d'origine suggérée), pour enrichir la bibliothèque"""
+    modeles: Dict[str, ModeleActivite] = {}
+    for phase in project.phases:
+        for activity in phase.activities:
+            if not activity._impacts:
+                continue
+            modele = modeles.get(activity.name)
+            if modele is None:
+                modeles[activity.name] = ModeleActivite(activity.name, [phase.name], [
+                    (i.composante, i.milieu, i.nature, i.impact_apprehende or "",
+                     i.intensite, i.etendue, i.duree, i.attenuation)
+                    for i in activity._impacts.values()
+                ])
+            elif phase.name not in modele.phases:
+                modele.phases += (phase.name,)
+    return list(modeles.values())
+
+
+def precalculer(modeles: Iterable[ModeleActivite], grille: GrilleImportance = GRILLE_STANDARD):
+    """Évalue en un seul lot les importances des modèles pas encore calculées pour ``grille``"""
+    a_calculer = [modele for modele in modeles if modele._importances_connues(grille) is None]
+    if not a_calculer:
+        return
+    evalues = [impact for modele in a_calculer for impact in modele.impacts if impact[2] != "risque impact"]
+    lot = iter(grille.evaluer_lot([i[4] for i in evalues], [i[5] for i in evalues], [i[6] for i in evalues]))
+    for modele in a_calculer:
+        importances = tuple("risque impact" if impact[2] == "risque impact" else next(lot) for impact in modele.impacts)
+        modele._importances = modele._importances[-(GRILLES_MEMORISEES - 1):] + [(grille, importances)]
+
+
+BIBLIOTHEQUE_STANDARD = [ModeleActivite.depuis_dict(modele) for modele in MODELES_STANDARD]
+
+
+def charger_modeles(repertoire: str = REPERTOIRE_MODELES) -> Tuple[BibliothequeModeles, List[Tuple[str, str]]]:
+    """Bibliothèque (modèles intégrés puis fichiers .json du répertoire) et fichiers rejetés (fichier, motif)
+
+    L'importance selon la grille standard est calculée dès le chargement.
+    """
+    bibliotheque = BibliothequeModeles(BIBLIOTHEQUE_STANDARD)
+    rejets = []
+    if os.path.isdir(repertoire):
+        for fichier in sorted(os.listdir(repertoire)):
+            if not fichier.lower().endswith(".json"):
+                continue
+            try:
+                modeles = lire_modeles(os.path.join(repertoire, fichier))
+            except (ValueError, OSError, AttributeError, TypeError) as e:
+                rejets.append((fichier, str(e)))
+                continue
+            for modele in modeles:
+                bibliotheque.ajouter(modele)
+    precalculer(bibliotheque.modeles.values(), GRILLE_STANDARD)
+    return bibliotheque, rejets
+
+
+def instancier(project: Project, modeles: Iterable[ModeleActivite],
+               phase: Optional[str] = None) -> List[Tuple[str, str, int]]:
+    """Crée dans ``project`` les activités des modèles avec tous leurs impacts
+
+    Chaque modèle est placé dans ``phase``, ou à défaut dans ses phases suggérées. Une
+    activité existante du même nom reçoit les impacts du modèle (remplacés par
+    couple composante/milieu). Retourne (phase, activité, impacts modifiés) par activité.
+    """
+    modeles = list(modeles)
+    precalculer(modeles, project.grille)
+    resultats = []
+    for modele in modeles:
+        for nom_phase in ([phase] if phase else modele.phases or ORDRE_PHASES[:1]):
+            activity = project.add_phase(nom_phase).add_activity(modele.nom)
+            resultats.append((nom_phase, modele.nom, activity.upsert_impacts(modele.creer_impacts(project.grille))))
+    return resultats
@@ -0,0 +1,377 @@
+# projet.py
+# Modèle de données du générateur de matrice (apps/leopold.py).
+# Défini au niveau du module pour que les objets conservés dans st.session_state
+# restent des instances des mêmes classes d'un rerun à l'autre.
+#
+# Chaque mutation incrémente le compteur ``version`` de l'objet modifié et de ses
+# parents (activité -> phase -> projet) ; les impacts ne doivent donc être modifiés
+# qu'au travers de upsert_impact/remove_impact. Les résultats dérivés (DataFrame,
+# HTML, CSV) sont mis en cache contre ces versions.
+#
+# Chaque activité note aussi les clés (composante, milieu) modifiées depuis le dernier
+# enregistrement, pour des écritures incrémentales dans le dépôt (utils/depot.py).
+#
+# La matrice (to_dataframe) est construite colonne par colonne ; les colonnes
+# répétitives sont des Categorical créés directement à partir de leurs codes.
+
+from operator import attrgetter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from utils.diagnostics import mesure
+from utils.grilles import GRILLE_STANDARD, GrilleImportance
+from utils.matrice import ORDRE_COMPOSANTES, ORDRE_PHASES
+from utils.utils1 import NIVEAUX_IMPORTANCE, evaluer_importance
+
+NATURES = ("négatif", "positif", "risque impact")
+NATURES_ATTENUEES = ("négatif", "risque impact")
+
+# Colonnes catégorielles de la matrice -> catégories connues d'avance (les autres
+# valeurs sont ajoutées dans l'ordre d'apparition)
+CATEGORIES_MATRICE = {
+    "Phase": tuple(ORDRE_PHASES),
+    "Composante": tuple(ORDRE_COMPOSANTES),
+    "Milieu": (),
+    "Nature impact": NATURES,
+    "Importance": NIVEAUX_IMPORTANCE + ("risque impact",),
+}
+COLONNES_MATRICE = ["Phase", "OrdreActivité", "Activité", "Composante", "Milieu", "Nature impact", "Importance",
+                    "Impact appréhendé", "Mesure atténuation", "Intensité", "Étendue", "Durée"]
+
+
+def categoriel(valeurs: Sequence, categories: Sequence = ()) -> pd.Categorical:
+    """Construit un Categorical directement à partir de ses codes (None -> valeur manquante)
+
+    Les valeurs hors ``categories`` sont ajoutées dans l'ordre de première apparition.
+    """
+    index = {categorie: code for code, categorie in enumerate(categories)}
+    for valeur in dict.fromkeys(valeurs):
+        if valeur is not None and valeur not in index:
+            index[valeur] = len(index)
+    categories = list(index)
+    index[None] = -1
+    codes = np.fromiter(map(index.__getitem__, valeurs), dtype=np.int32, count=len(valeurs))
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def matrice_phase(nom_phase, colonnes: Dict[str, Sequence]) -> pd.DataFrame:
+    """Assemble la matrice d'une phase à partir de listes alignées (toutes les colonnes sauf Phase)
+
+    ``Mesure atténuation`` est vidée pour les impacts positifs.
+    """
+    n = len(colonnes["Composante"])
+    if not n:
+        return pd.DataFrame()
+    categories_phase = CATEGORIES_MATRICE["Phase"]
+    if nom_phase not in categories_phase:
+        categories_phase += (nom_phase,)
+    natures = colonnes["Nature impact"]
+    donnees = {
+        "Phase": pd.Categorical.from_codes(np.full(n, categories_phase.index(nom_phase), dtype=np.int32),
+                                           categories=list(categories_phase)),
+        "OrdreActivité": np.asarray(colonnes["OrdreActivité"], dtype=np.int64),
+        "Activité": np.asarray(colonnes["Activité"], dtype=object),
+    }
+    for col in ("Composante", "Milieu", "Nature impact", "Importance"):
+        donnees[col] = categoriel(colonnes[col], CATEGORIES_MATRICE[col])
+    donnees["Impact appréhendé"] = colonnes["Impact appréhendé"]
+    donnees["Mesure atténuation"] = [
+        attenuation if nature in NATURES_ATTENUEES else ''
+        for nature, attenuation in zip(natures, colonnes["Mesure atténuation"])
+    ]
+    for col in ("Intensité", "Étendue", "Durée"):
+        donnees[col] = colonnes[col]
+    return pd.DataFrame(donnees)
+
+
+def concat_matrices(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatène des matrices de phase ; les colonnes catégorielles gardent l'union de leurs catégories"""
+    frames = [frame for frame in frames if not frame.empty]
+    if len(frames) <= 1:
+        return frames[0] if frames else pd.DataFrame()
+    colonnes = {}
+    for col in frames[0].columns:
+        series = [frame[col] for frame in frames]
+        if col in CATEGORIES_MATRICE and all(isinstance(serie.dtype, pd.CategoricalDtype) for serie in series):
+            colonnes[col] = union_categoricals([serie.array for serie in series])
+        else:
+            colonnes[col] = pd.concat(series, ignore_index=True)
+    return pd.DataFrame(colonnes)
+
+
+class Impact:
+    __slots__ = ("composante", "milieu", "nature", "impact_apprehende",
+                 "intensite", "etendue", "duree", "attenuation", "importance")
+
+    def __init__(self, composante, milieu, nature, impact_apprehende, intensite=None, etendue=None, duree=None, attenuation=None, importance=None):
+        self.composante = composante
+        self.milieu = milieu
+        self.nature = nature
+        self.impact_apprehende = impact_apprehende
+        self.intensite = intensite
+        self.etendue = etendue
+        self.duree = duree
+        self.attenuation = attenuation
+        # Une importance déjà calculée (import en lot) évite de réévaluer la grille
+        self.importance = importance if importance is not None else self.calculate_importance()
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return (self.composante, self.milieu)
+
+    def calculate_importance(self):
+        if self.nature == 'risque impact':
+            return 'risque impact'
+        return evaluer_importance(self.intensite or '', self.etendue or '', self.duree or '')
+
+    def __eq__(self, other):
+        if not isinstance(other, Impact):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot) for slot in Impact.__slots__)
+
+    __hash__ = None
+
+
+class Activity:
+    __slots__ = ("name", "version", "_impacts", "_parent", "_modifies")
+
+    def __init__(self, name):
+        self.name = name
+        self.version = 0
+        self._impacts: Dict[Tuple[str, str], Impact] = {}
+        self._parent = None
+        self._modifies: Set[Tuple[str, str]] = set()
+
+    def _touch(self):
+        self.version += 1
+        if self._parent is not None:
+            self._parent._touch()
+
+    @property
+    def impacts(self) -> List[Impact]:
+        return list(self._impacts.values())
+
+    def get_impact(self, composante, milieu) -> Optional[Impact]:
+        return self._impacts.get((composante, milieu))
+
+    def upsert_impact(self, impact: Impact):
+        """Ajoute l'impact ou remplace celui du même couple (composante, milieu)
+
+        Un impact identique à celui déjà enregistré ne change pas la version.
+        """
+        if self._impacts.get(impact.key) != impact:
+            self._impacts[impact.key] = impact
+            self._modifies.add(impact.key)
+            self._touch()
+
+    def upsert_impacts(self, impacts: Iterable[Impact]) -> int:
+        """Insère un lot d'impacts avec un seul changement de version ; retourne le nombre de modifiés"""
+        changed = 0
+        for impact in impacts:
+            if self._impacts.get(impact.key) != impact:
+                self._impacts[impact.key] = impact
+                self._modifies.add(impact.key)
+                changed += 1
+        if changed:
+            self._touch()
+        return changed
+
+    def remove_impact(self, composante, milieu) -> Optional[Impact]:
+        impact = self._impacts.pop((composante, milieu), None)
+        if impact is not None:
+            self._modifies.add(impact.key)
+            self._touch()
+        return impact
+
+
+class Phase:
+    __slots__ = ("name", "version", "_activities", "_parent", "_source")
+
+    def __init__(self, name, source=None):
+        self.name = name
+        self.version = 0
+        # Phase ouverte depuis un dépôt : les activités ne sont chargées qu'au premier accès
+        self._activities: Optional[Dict[str, Activity]] = None if source is not None else {}
+        self._parent = None
+        self._source = source
+
+    @property
+    def loaded(self) -> bool:
+        return self._activities is not None
+
+    def _table(self) -> Dict[str, Activity]:
+        if self._activities is None:
+            self._activities = self._source.charger_activites(self)
+        return self._activities
+
+    def _touch(self):
+        self.version += 1
+        if self._parent is not None:
+            self._parent._touch()
+
+    @property
+    def activities(self) -> List[Activity]:
+        return list(self._table().values())
+
+    def get_activity(self, activity_name) -> Optional[Activity]:
+        return self._table().get(activity_name)
+
+    def add_activity(self, activity_name) -> Activity:
+        """Retourne l'activité existante de ce nom, ou la crée en fin de liste"""
+        activities = self._table()
+        activity = activities.get(activity_name)
+        if activity is None:
+            activity = activities[activity_name] = Activity(activity_name)
+            activity._parent = self
+            self._touch()
+        return activity
+
+    def remove_activity(self, activity_name) -> Optional[Activity]:
+        activity = self._table().pop(activity_name, None)
+        if activity is not None:
+            activity._parent = None
+            self._touch()
+        return activity
+
+    def to_dataframe(self):
+        if self._activities is None:
+            # Lecture directe depuis le dépôt, sans construire les objets Activity/Impact
+            return self._source.dataframe(self)
+        activities = list(self._activities.values())
+        tailles = [len(activity._impacts) for activity in activities]
+        impacts = [impact for activity in activities for impact in activity._impacts.values()]
+        if not impacts:
+            return pd.DataFrame()
+        attributs = ("composante", "milieu", "nature", "importance", "impact_apprehende",
+                     "attenuation", "intensite", "etendue", "duree")
+        colonnes = dict(zip(
+            ("Composante", "Milieu", "Nature impact", "Importance", "Impact appréhendé",
+             "Mesure atténuation", "Intensité", "Étendue", "Durée"),
+            zip(*map(attrgetter(*attributs), impacts)),
+        ))
+        colonnes["OrdreActivité"] = np.repeat(np.arange(len(activities)), tailles)
+        colonnes["Activité"] = np.repeat(np.array([activity.name for activity in activities], dtype=object), tailles)
+        return matrice_phase(self.name, colonnes)
+
+
+class Project:
+    # __weakref__ : le dépôt suit chaque copie ouverte sans la garder en vie
+    __slots__ = ("version", "grille", "_phases", "_cache", "_cache_phases", "__weakref__")
+
+    def __init__(self, grille: GrilleImportance = GRILLE_STANDARD):
+        self.version = 0
+        # Grille d'importance du projet (voir utils/grilles.py)
+        self.grille = grille
+        self._phases: Dict[str, Phase] = {}
+        self._cache: Dict[object, Tuple[int, object]] = {}
+        self._cache_phases: Dict[str, Tuple[int, pd.DataFrame]] = {}
+
+    def _touch(self):
+        self.version += 1
+
+    @property
+    def phases(self) -> List[Phase]:
+        return list(self._phases.values())
+
+    def add_phase(self, phase_name) -> Phase:
+        phase = self._phases.get(phase_name)
+        if phase is None:
+            phase = self._phases[phase_name] = Phase(phase_name)
+            phase._parent = self
+            self._touch()
+        return phase
+
+    def get_phase(self, phase_name) -> Optional[Phase]:
+        return self._phases.get(phase_name)
+
+    def remove_phase(self, phase_name) -> Optional[Phase]:
+        phase = self._phases.pop(phase_name, None)
+        if phase is not None:
+            phase._parent = None
+            self._cache_phases.pop(phase_name, None)
+            self._touch()
+        return phase
+
+    def sync_phases(self, phase_names: Iterable[str]):
+        """Conserve uniquement les phases sélectionnées et ajoute les nouvelles"""
+        phase_names = list(phase_names)
+        selection = set(phase_names)
+        for phase_name in [name for name in self._phases if name not in selection]:
+            self.remove_phase(phase_name)
+        for phase_name in phase_names:
+            self.add_phase(phase_name)
+
+    def evaluer(self, nature, intensite, etendue, duree):
+        """Importance d'un nouvel impact selon la grille du projet"""
+        if nature == 'risque impact':
+            return 'risque impact'
+        return self.grille.evaluer(intensite, etendue, duree)
+
+    def changer_grille(self, grille: GrilleImportance) -> int:
+        """Adopte ``grille`` et réévalue tous les impacts ; retourne le nombre d'importances modifiées"""
+        if grille == self.grille and grille.nom == self.grille.nom:
+            return 0
+        self.grille = grille
+        self._touch()
+        return self.recompute_importance()
+
+    def recompute_importance(self) -> int:
+        """Réévalue l'importance de tous les impacts en une seule classification vectorisée
+
+        La grille du projet est appliquée. Retourne le nombre d'impacts dont l'importance a changé.
+        """
+        entries = [
+            (activity, impact)
+            for phase in self._phases.values()
+            for activity in phase._table().values()
+            for impact in activity._impacts.values()
+            if impact.nature != 'risque impact'
+        ]
+        importances = self.grille.evaluer_lot(
+            [impact.intensite or '' for _, impact in entries],
+            [impact.etendue or '' for _, impact in entries],
+            [impact.duree or '' for _, impact in entries],
+        )
+        changed = 0
+        for (activity, impact), importance in zip(entries, importances):
+            if impact.importance != importance:
+                impact.importance = importance
+                activity._modifies.add(impact.key)
+                activity._touch()
+                changed += 1
+        return changed
+
+    def memoize(self, key, builder: Callable[[], object]):
+        """Retourne la valeur calculée par ``builder`` pour la version courante du projet
+
+        Les entrées calculées pour une version antérieure sont purgées au premier recalcul.
+        """
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        value = builder()
+        self._cache = {k: v for k, v in self._cache.items() if v[0] == self.version}
+        self._cache[key] = (self.version, value)
+        return value
+
+    def cached(self, key):
+        """Retourne la valeur mémorisée pour la version courante, sans la calculer (None sinon)"""
+        cached = self._cache.get(key)
+        return cached[1] if cached is not None and cached[0] == self.version else None
+
+    @mesure("projet.to_dataframe")
+    def to_dataframe(self):
+        return self.memoize("dataframe", self._build_dataframe)
+
+    def _build_dataframe(self):
+        # Seules les phases modifiées depuis le dernier appel sont reconstruites
+        frames = []
+        for phase in self._phases.values():
+            cached = self._cache_phases.get(phase.name)
+            if cached is None or cached[0] != phase.version:
+                cached = self._cache_phases[phase.name] = (phase.version, phase.to_dataframe())
+            frames.append(cached[1])
+        return concat_matrices(frames)
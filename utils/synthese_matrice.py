@@ -0,0 +1,129 @@
+# synthese_matrice.py
+# Tableaux croisés de la matrice d'impacts (importance × phase × composante × nature,
+# couverture des mesures d'atténuation) et leurs cartes de chaleur.
+#
+# Chaque colonne est réduite une fois en codes de catégories ; un tableau croisé est
+# alors un simple np.bincount sur le code combiné des deux axes. plotly n'est importé
+# qu'à la construction des figures.
+
+from typing import Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
+from utils.diagnostics import mesure
+from utils.matrice import ORDRE_COMPOSANTES, ORDRE_PHASES
+from utils.projet import NATURES
+from utils.utils1 import COULEURS_IMPORTANCE, NIVEAUX_IMPORTANCE, codes_categories
+
+ORDRE_IMPORTANCES = list(reversed(NIVEAUX_IMPORTANCE)) + ["risque impact"]
+NATURES_ATTENUATION = ("négatif", "risque impact")
+
+# Axes des tableaux : colonne de la matrice -> catégories dans l'ordre d'affichage
+AXES = {
+    "Importance": ORDRE_IMPORTANCES,
+    "Phase": ORDRE_PHASES,
+    "Composante": ORDRE_COMPOSANTES,
+    "Nature impact": list(NATURES),
+}
+
+# Nom du tableau -> (axe des lignes, axe des colonnes, titre)
+TABLEAUX = {
+    "importance_phase": ("Importance", "Phase", "Importance par phase"),
+    "importance_composante": ("Importance", "Composante", "Importance par composante"),
+    "nature_phase": ("Nature impact", "Phase", "Nature des impacts par phase"),
+}
+
+
+class Synthese:
+    """Tableaux croisés d'une matrice : effectifs par couple d'axes et couverture des atténuations"""
+
+    __slots__ = ("impacts", "tableaux", "couverture", "attenuations", "a_attenuer")
+
+    def __init__(self, impacts, tableaux, couverture, attenuations, a_attenuer):
+        self.impacts = impacts
+        self.tableaux: Dict[str, pd.DataFrame] = tableaux
+        # Part (0-1) des impacts négatifs/risques dotés d'une mesure, par composante × phase
+        self.couverture: pd.DataFrame = couverture
+        self.attenuations = attenuations
+        self.a_attenuer = a_attenuer
+
+    @property
+    def taux_attenuation(self):
+        return self.attenuations / self.a_attenuer if self.a_attenuer else None
+
+
+def _codes(serie, categories: Sequence[str]) -> np.ndarray:
+    """Codes de catégorie (-1 hors catégories) d'une colonne"""
+    return codes_categories(serie, categories).astype(np.int64)
+
+
+def _croiser(codes_lignes, codes_colonnes, lignes, colonnes, masque=None) -> np.ndarray:
+    """Effectifs par couple (ligne, colonne) en un seul bincount sur le code combiné"""
+    valides = (codes_lignes >= 0) & (codes_colonnes >= 0)
+    if masque is not None:
+        valides &= masque
+    combines = codes_lignes[valides] * len(colonnes) + codes_colonnes[valides]
+    return np.bincount(combines, minlength=len(lignes) * len(colonnes)).reshape(len(lignes), len(colonnes))
+
+
+@mesure("synthese.synthese_matrice")
+def synthese_matrice(df: pd.DataFrame) -> Synthese:
+    """Calcule tous les tableaux de synthèse de la matrice (sortie de ``Project.to_dataframe``)"""
+    codes = {col: _codes(df[col], categories) for col, categories in AXES.items()}
+
+    tableaux = {}
+    for nom, (ligne, colonne, _) in TABLEAUX.items():
+        effectifs = _croiser(codes[ligne], codes[colonne], AXES[ligne], AXES[colonne])
+        tableaux[nom] = pd.DataFrame(effectifs, index=pd.Index(AXES[ligne], name=ligne),
+                                     columns=pd.Index(AXES[colonne], name=colonne))
+
+    a_attenuer = df["Nature impact"].isin(NATURES_ATTENUATION).to_numpy()
+    attenue = a_attenuer & (df["Mesure atténuation"].fillna("").str.strip() != "").to_numpy()
+    composantes, phases = AXES["Composante"], AXES["Phase"]
+    totaux = _croiser(codes["Composante"], codes["Phase"], composantes, phases, a_attenuer)
+    attenues = _croiser(codes["Composante"], codes["Phase"], composantes, phases, attenue)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        couverture = np.where(totaux > 0, attenues / np.maximum(totaux, 1), np.nan)
+    couverture = pd.DataFrame(couverture, index=pd.Index(composantes, name="Composante"),
+                              columns=pd.Index(phases, name="Phase"))
+
+    return Synthese(len(df), tableaux, couverture, int(attenue.sum()), int(a_attenuer.sum()))
+
+
+def _echelle_importance():
+    """Échelle de couleurs des effectifs, du blanc au rouge des impacts négatifs très forts"""
+    return [[0.0, "#FFFFFF"], [0.5, COULEURS_IMPORTANCE["négatif"]["Moyenne"]],
+            [1.0, COULEURS_IMPORTANCE["négatif"]["Très forte"]]]
+
+
+def figure_carte(tableau: pd.DataFrame, titre: str, pourcentage=False):
+    """Carte de chaleur plotly d'un tableau croisé (effectifs, ou parts 0-1 si ``pourcentage``)"""
+    import plotly.graph_objects as go
+
+    valeurs = tableau.to_numpy(dtype=float)
+    if pourcentage:
+        texte = [["" if np.isnan(v) else f"{v:.0%}" for v in ligne] for ligne in valeurs]
+        echelle = [[0.0, COULEURS_IMPORTANCE["négatif"]["Forte"]], [0.5, COULEURS_IMPORTANCE["négatif"]["Faible"]],
+                   [1.0, COULEURS_IMPORTANCE["positif"]["Forte"]]]
+        bornes = {"zmin": 0, "zmax": 1}
+    else:
+        texte = [[f"{int(v)}" if v else "" for v in ligne] for ligne in valeurs]
+        echelle, bornes = _echelle_importance(), {}
+
+    fig = go.Figure(go.Heatmap(
+        z=valeurs, x=list(tableau.columns), y=list(tableau.index),
+        text=texte, texttemplate="%{text}", colorscale=echelle, showscale=False,
+        hovertemplate=f"{tableau.index.name}: %{{y}}<br>{tableau.columns.name}: %{{x}}<br>%{{text}}<extra></extra>",
+        **bornes,
+    ))
+    fig.update_layout(title=titre, height=320, margin=dict(l=10, r=10, t=40, b=10))
+    fig.update_yaxes(autorange="reversed")
+    return fig
+
+
+def figures_synthese(synthese: Synthese) -> Dict[str, object]:
+    """Figures plotly de tous les tableaux, plus la carte de couverture des atténuations"""
+    figures = {nom: figure_carte(synthese.tableaux[nom], titre) for nom, (_, _, titre) in TABLEAUX.items()}
+    figures["couverture"] = figure_carte(synthese.couverture, "Couverture des mesures d'atténuation", pourcentage=True)
+    return figures
@@ -1,70 +1,173 @@
 # utils.py 
 
+import numpy as np
+import pandas as pd
+
+INTENSITES = ("très forte", "forte", "moyenne", "faible")
+ETENDUES = ("régionale", "locale", "ponctuelle")
+DUREES = ("long terme", "moyen terme", "court terme")
+NIVEAUX_IMPORTANCE = ("Très faible", "Faible", "Moyenne", "Forte", "Très forte")
+IMPORTANCE_PAR_DEFAUT = "Faible"
+
+TABLE_IMPORTANCE = {
+    ("très forte", "régionale", "long terme"): "Très forte",
+    ("très forte", "régionale", "moyen terme"): "Très forte",
+    ("très forte", "régionale", "court terme"): "Forte",
+    ("très forte", "locale", "long terme"): "Forte",
+    ("très forte", "locale", "moyen terme"): "Moyenne",
+    ("très forte", "locale", "court terme"): "Moyenne",
+    ("très forte", "ponctuelle", "long terme"): "Moyenne",
+    ("très forte", "ponctuelle", "moyen terme"): "Faible",
+    ("très forte", "ponctuelle", "court terme"): "Faible",
+    ("forte", "régionale", "long terme"): "Très forte",
+    ("forte", "régionale", "moyen terme"): "Forte",
+    ("forte", "régionale", "court terme"): "Moyenne",
+    ("forte", "locale", "long terme"): "Forte",
+    ("forte", "locale", "moyen terme"): "Moyenne",
+    ("forte", "locale", "court terme"): "Faible",
+    ("forte", "ponctuelle", "long terme"): "Moyenne",
+    ("forte", "ponctuelle", "moyen terme"): "Faible",
+    ("forte", "ponctuelle", "court terme"): "Très faible",
+    ("moyenne", "régionale", "long terme"): "Forte",
+    ("moyenne", "régionale", "moyen terme"): "Moyenne",
+    ("moyenne", "régionale", "court terme"): "Faible",
+    ("moyenne", "locale", "long terme"): "Moyenne",
+    ("moyenne", "locale", "moyen terme"): "Faible",
+    ("moyenne", "locale", "court terme"): "Très faible",
+    ("moyenne", "ponctuelle", "long terme"): "Faible",
+    ("moyenne", "ponctuelle", "moyen terme"): "Faible",
+    ("moyenne", "ponctuelle", "court terme"): "Très faible",
+    ("faible", "régionale", "long terme"): "Moyenne",
+    ("faible", "régionale", "moyen terme"): "Moyenne",
+    ("faible", "régionale", "court terme"): "Faible",
+    ("faible", "locale", "long terme"): "Moyenne",
+    ("faible", "locale", "moyen terme"): "Faible",
+    ("faible", "locale", "court terme"): "Faible",
+    ("faible", "ponctuelle", "long terme"): "Faible",
+    ("faible", "ponctuelle", "moyen terme"): "Très faible",
+    ("faible", "ponctuelle", "court terme"): "Très faible",
+}
+
+
+def compiler_grille(table, defaut=IMPORTANCE_PAR_DEFAUT):
+    """Compile une table {(intensité, étendue, durée): importance} en tableau de codes
+
+    Le tableau a une case supplémentaire sur chaque axe : l'indice -1 (valeur inconnue)
+    y pointe et renvoie ``defaut``.
+    """
+    defaut = NIVEAUX_IMPORTANCE.index(defaut)
+    grille = np.full((len(INTENSITES) + 1, len(ETENDUES) + 1, len(DUREES) + 1), defaut, dtype=np.int8)
+    for (intensite, etendue, duree), importance in table.items():
+        grille[INTENSITES.index(intensite), ETENDUES.index(etendue), DUREES.index(duree)] = \
+            NIVEAUX_IMPORTANCE.index(importance)
+    return grille
+
+
+GRILLE_IMPORTANCE = compiler_grille(TABLE_IMPORTANCE)
+
+
 def evaluer_importance(intensite, etendue, duree):
-    table = {
-        ("très forte", "régionale", "long terme"): "Très forte",
-        ("très forte", "régionale", "moyen terme"): "Très forte",
-        ("très forte", "régionale", "court terme"): "Forte",
-        ("très forte", "locale", "long terme"): "Forte",
-        ("très forte", "locale", "moyen terme"): "Moyenne",
-        ("très forte", "locale", "court terme"): "Moyenne",
-        ("très forte", "ponctuelle", "long terme"): "Moyenne",
-        ("très forte", "ponctuelle", "moyen terme"): "Faible",
-        ("très forte", "ponctuelle", "court terme"): "Faible",
-        ("forte", "régionale", "long terme"): "Très forte",
-        ("forte", "régionale", "moyen terme"): "Forte",
-        ("forte", "régionale", "court terme"): "Moyenne",
-        ("forte", "locale", "long terme"): "Forte",
-        ("forte", "locale", "moyen terme"): "Moyenne",
-        ("forte", "locale", "court terme"): "Faible",
-        ("forte", "ponctuelle", "long terme"): "Moyenne",
-        ("forte", "ponctuelle", "moyen terme"): "Faible",
-        ("forte", "ponctuelle", "court terme"): "Très faible",
-        ("moyenne", "régionale", "long terme"): "Forte",
-        ("moyenne", "régionale", "moyen terme"): "Moyenne",
-        ("moyenne", "régionale", "court terme"): "Faible",
-        ("moyenne", "locale", "long terme"): "Moyenne",
-        ("moyenne", "locale", "moyen terme"): "Faible",
-        ("moyenne", "locale", "court terme"): "Très faible",
-        ("moyenne", "ponctuelle", "long terme"): "Faible",
-        ("moyenne", "ponctuelle", "moyen terme"): "Faible",
-        ("moyenne", "ponctuelle", "court terme"): "Très faible",
-        ("faible", "régionale", "long terme"): "Moyenne",
-        ("faible", "régionale", "moyen terme"): "Moyenne",
-        ("faible", "régionale", "court terme"): "Faible",
-        ("faible", "locale", "long terme"): "Moyenne",
-        ("faible", "locale", "moyen terme"): "Faible",
-        ("faible", "locale", "court terme"): "Faible",
-        ("faible", "ponctuelle", "long terme"): "Faible",
-        ("faible", "ponctuelle", "moyen terme"): "Très faible",
-        ("faible", "ponctuelle", "court terme"): "Très faible",
-    }
     cle = (intensite.lower(), etendue.lower(), duree.lower())
-    return table.get(cle, "Faible")
-
-def get_color(val, nature):
-    if nature == "risque impact":
-        colors = {
-            "risque impact": "#8A2BE2",
-        }
-           
-    if nature == "négatif":
-        colors = {
-            "Très forte": "#8B0000",
-            "Forte": "#FF4500",
-            "Moyenne": "#FFA500",
-            "Faible": "#FFFF66",
-            "Très faible": "#F0E68C"
-        }
-    if nature == "positif":
-        colors = {
-            "Très forte": "#006400",
-            "Forte": "#228B22",
-            "Moyenne": "#7CFC00",
-            "Faible": "#ADFF2F",
-            "Très faible": "#E0FFE0"
-        }
-    return f'background-color: {colors.get(val, "white")}; color: black;'
+    return TABLE_IMPORTANCE.get(cle, IMPORTANCE_PAR_DEFAUT)
+
+
+def importance_codes(codes_intensite, codes_etendue, codes_duree, grille=None):
+    """Classe des tableaux de codes (indices dans INTENSITES, ETENDUES, DUREES ; -1 si inconnu)
+
+    Retourne les codes d'importance (indices dans NIVEAUX_IMPORTANCE) en une seule indexation
+    de ``grille`` (tableau compilé par compiler_grille, GRILLE_IMPORTANCE par défaut).
+    """
+    grille = GRILLE_IMPORTANCE if grille is None else grille
+    return grille[
+        np.asarray(codes_intensite), np.asarray(codes_etendue), np.asarray(codes_duree)
+    ]
+
+
+def codes_categories(valeurs, categories) -> np.ndarray:
+    """Rang de chaque valeur dans ``categories`` (-1 si absente ou hors catégories)
+
+    Remplace pd.Categorical(valeurs, categories=categories).codes, que pandas déconseille
+    dès qu'une valeur est hors catégories. Une colonne catégorielle n'est traduite que
+    catégorie par catégorie.
+    """
+    index = pd.Index(categories)
+    valeurs = pd.Series(valeurs)
+    if isinstance(valeurs.dtype, pd.CategoricalDtype):
+        rangs = np.append(index.get_indexer(valeurs.cat.categories), -1)
+        return rangs[valeurs.cat.codes.to_numpy()]
+    return index.get_indexer(valeurs.astype(object))
+
+
+def categories_completees(valeurs, categories) -> list:
+    """``categories`` suivies des autres valeurs présentes (ordre alphabétique)
+
+    Un Categorical construit sur ces catégories garde les valeurs inconnues au lieu
+    de les remplacer par NaN.
+    """
+    connues = set(categories)
+    autres = {v for v in pd.unique(pd.Series(valeurs, dtype="object").dropna()) if v not in connues}
+    return list(categories) + sorted(autres, key=str)
+
+
+def _codes(valeurs, categories):
+    # Les libellés distincts sont peu nombreux : on normalise les valeurs uniques, pas chaque ligne
+    codes, uniques = pd.factorize(pd.Series(valeurs, dtype="object"))
+    correspondance = np.append(pd.Index(categories).get_indexer([str(u).lower() for u in uniques]), -1)
+    return correspondance[codes]
+
+
+def evaluer_importance_lot(intensites, etendues, durees, grille=None):
+    """Version vectorisée d'evaluer_importance pour des Series (ou séquences) de libellés
+
+    Retourne une Series catégorielle ordonnée selon NIVEAUX_IMPORTANCE, alignée sur
+    l'index de ``intensites`` lorsqu'il s'agit d'une Series. ``grille`` est un tableau
+    compilé (GRILLE_IMPORTANCE par défaut).
+    """
+    codes = importance_codes(_codes(intensites, INTENSITES), _codes(etendues, ETENDUES), _codes(durees, DUREES), grille)
+    index = intensites.index if isinstance(intensites, pd.Series) else None
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=NIVEAUX_IMPORTANCE, ordered=True),
+        index=index,
+        name="Importance"
+    )
+
+COULEURS_IMPORTANCE = {
+    "risque impact": {
+        "risque impact": "#8A2BE2",
+    },
+    "négatif": {
+        "Très forte": "#8B0000",
+        "Forte": "#FF4500",
+        "Moyenne": "#FFA500",
+        "Faible": "#FFFF66",
+        "Très faible": "#F0E68C"
+    },
+    "positif": {
+        "Très forte": "#006400",
+        "Forte": "#228B22",
+        "Moyenne": "#7CFC00",
+        "Faible": "#ADFF2F",
+        "Très faible": "#E0FFE0"
+    },
+}
+
+# Une classe CSS par couple (nature, importance), ex. « imp-negatif-4 » pour négatif / Très forte
+_SUFFIXES_NATURE = {"négatif": "negatif", "positif": "positif", "risque impact": "risque"}
+CLASSE_PAR_DEFAUT = "imp-aucune"
+CLASSES_IMPORTANCE = {
+    (nature, importance): (
+        f"imp-{_SUFFIXES_NATURE[nature]}-{NIVEAUX_IMPORTANCE.index(importance)}"
+        if importance in NIVEAUX_IMPORTANCE else f"imp-{_SUFFIXES_NATURE[nature]}"
+    )
+    for nature, couleurs in COULEURS_IMPORTANCE.items()
+    for importance in couleurs
+}
+STYLE_IMPORTANCE = "\n".join(
+    [f".{CLASSE_PAR_DEFAUT} {{ background-color: white; color: black; }}"]
+    + [f".{classe} {{ background-color: {COULEURS_IMPORTANCE[nature][importance]}; color: black; }}"
+       for (nature, importance), classe in CLASSES_IMPORTANCE.items()]
+)
+
 
 def toggle_icon(is_open: bool) -> str:
     """Retourne ▶️ si fermé, ▼ si ouvert."""